@@ -0,0 +1,520 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from service.encryption import generate_xs_xs_common, sign_pool
+from service.utils import NOTE_DATA_KEY, parse_note_html, sign
+from service.response import RawJSON, ResponseUtil, SUCCESS
+from service.projection import compile_fields
+from urllib.parse import parse_qs, urlsplit
+from curl_cffi.requests import AsyncSession
+from typing import Callable, List, Optional
+from service import signer
+from loguru import logger
+import subprocess
+import tempfile
+import asyncio
+import random
+import typer
+import orjson
+import json
+import time
+import sys
+import os
+import re
+
+STATIC_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STRUCTURE_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "structure")
+
+# 固定随机数和时间戳后调用JS签名，作为纯Python实现的对照
+GOLDEN_SIGN_JS: str = """
+const crypto = require("crypto");
+const sign = require(process.argv[1]);
+let pending = [], now = 0;
+crypto.randomBytes = (n) => Buffer.from(pending.splice(0, n));
+Date.now = () => now;
+Date.prototype.getTime = () => now;
+let input = "";
+process.stdin.on("data", (chunk) => input += chunk);
+process.stdin.on("end", () => {
+  const results = JSON.parse(input).map((c) => {
+    pending = c.random; now = c.timestamp;
+    return sign.get_request_headers_params(c.api, c.data, c.a1, c.method);
+  });
+  process.stdout.write(JSON.stringify(results));
+});
+"""
+
+
+def timeit(func: Callable, rounds: int) -> float:
+    """
+    计算平均耗时
+    :param func: 被测函数
+    :param rounds: 执行次数
+    :return: 单次平均耗时（微秒）
+    """
+    start: float = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def build_sign_cases(count: int, seed: int = 0) -> list:
+    """
+    构造签名对照用例（固定时间戳和随机字节）
+    :param count: 用例数量
+    :param seed: 随机种子
+    :return:
+    """
+    rng: random.Random = random.Random(seed)
+    cases: list = []
+    for index in range(count):
+        a1: str = "".join(rng.choice("0123456789abcdefghijklmnopqrstuvwxyz") for _ in range(52))
+        if index % 2:
+            method, data = "POST", {"source_note_id": f"{index:024x}", "image_formats": ["jpg", "webp", "avif"],
+                                    "extra": {"need_body_topic": "1"}, "xsec_token": "AB中文=" * (index % 5)}
+            api: str = "/api/sns/web/v1/feed"
+        else:
+            method, data = "GET", ""
+            api: str = f"/api/sns/web/v1/user_posted?num=30&cursor=&user_id={index:024x}&xsec_token=AB{index}="
+        cases.append({"api": api, "data": data, "a1": a1, "method": method,
+                      "timestamp": 1700000000000 + rng.randrange(10 ** 11), "random": list(rng.randbytes(16))})
+    return cases
+
+
+def build_note_html(note_data: dict, data_last: bool = True, padding: int = 200000) -> str:
+    """
+    按手机端笔记页面的结构构造HTML（页面数据为JS字面量，含undefined）
+    :param note_data: LAUNCHER_SSR_STORE_PAGE_DATA的内容
+    :param data_last: 笔记数据是否为最后一个键
+    :param padding: 其他脚本、样式的大小（字节）
+    :return:
+    """
+    other: dict = {f"STORE_{index}": {"loading": False, "list": [{"id": f"{index:024x}", "desc": "占位" * 20}] * 20}
+                   for index in range(10)}
+    other_js: str = json.dumps(other, ensure_ascii=False, separators=(",", ":"))[1:-1].replace("false", "undefined")
+    data_js: str = '"LAUNCHER_SSR_STORE_PAGE_DATA":' + json.dumps(note_data, ensure_ascii=False, separators=(",", ":"))
+    state: str = "{" + (other_js + "," + data_js if data_last else data_js + "," + other_js) + "}"
+    head: str = "<script>var noop=function(){};</script><style>.a{color:red}</style>" * (padding // 64)
+    return (f"<!doctype html><html><head>{head}</head><body><div id=\"app\"></div>"
+            f"<script>window.__SETUP_SERVER_STATE__={state}</script></body></html>")
+
+
+def legacy_parse_note_html(html: str) -> dict:
+    """
+    旧版解析（正则截取整段页面数据后完整解析），作为对照
+    :param html: 帖子HTML源码
+    :return:
+    """
+    match = re.search(r"window\.__SETUP_SERVER_STATE__\s*=\s*(.*?)</script>", html, re.DOTALL | re.IGNORECASE)
+    return json.loads(match.group(1)).get("LAUNCHER_SSR_STORE_PAGE_DATA", {})
+
+
+def build_comment_page(note_id: str, cursor: str, pages: int, size: int = 10, sub: bool = False) -> dict:
+    """
+    按评论接口的结构构造一页评论（每页前两条根评论带有更多子评论）
+    :param note_id: 笔记ID
+    :param cursor: 游标，首页为""，后续为页码
+    :param pages: 总页数
+    :param size: 每页条数
+    :param sub: 是否为子评论
+    :return: 评论接口的data
+    """
+    page: int = int(cursor or 0)
+    comments: list = []
+    for index in range(size):
+        comment_id: str = f"{int(note_id[:8] or '0', 16) + page * size + index:08x}{'5' if sub else 'c'}{index:015x}"
+        comment: dict = {"id": comment_id, "note_id": note_id, "content": "基准测试评论" * 5, "like_count": str(index),
+                         "create_time": 1767926762050 - index, "ip_location": "上海", "liked": False,
+                         "user_info": {"user_id": "60ae2ccd000000000101c7bd", "nickname": "基准测试",
+                                       "image": "https://sns-avatar-qc.xhscdn.com/avatar/bench.jpg",
+                                       "xsec_token": "AB_bench="},
+                         "status": 0, "at_users": [], "pictures": [], "show_tags": []}
+        if not sub:
+            comment.update(sub_comment_count=str(index), sub_comments=[], sub_comment_cursor="0",
+                           sub_comment_has_more=index < 2)
+        comments.append(comment)
+    has_more: bool = page + 1 < pages
+    return {"comments": comments, "cursor": str(page + 1) if has_more else "", "has_more": has_more,
+            "time": 1767926762050, "user_id": "60ae2ccd000000000101c7bd", "xsec_token": "AB_bench="}
+
+
+class FakeXhsHandler(BaseHTTPRequestHandler):
+    """
+    本地模拟的小红书接口（edith.xiaohongshu.com）和手机端笔记页面，数据来自structure目录
+    """
+    protocol_version: str = "HTTP/1.1"
+    delay: float = 0
+    pages: int = 3
+    fixtures: dict = {}
+
+    @classmethod
+    def load(cls, delay: float = 0, pages: int = 3) -> None:
+        """
+        加载structure目录中的数据
+        :param delay: 每个请求的模拟延迟（秒）
+        :param pages: 分页接口的总页数
+        :return:
+        """
+        cls.delay, cls.pages = delay, pages
+        for name in ("note", "user_notes", "note_by_html"):
+            with open(os.path.join(STRUCTURE_DIR, f"{name}.json"), "r", encoding="utf-8") as f:
+                cls.fixtures[name] = json.load(f)
+        cls.fixtures["html"] = build_note_html(cls.fixtures["note_by_html"]).encode("utf-8")
+
+    def _reply(self, body: bytes, content_type: str = "application/json; charset=utf-8", status: int = 200) -> None:
+        """
+        返回响应
+        :param body: 响应体
+        :param content_type: 响应类型
+        :param status: 状态码
+        :return:
+        """
+        if self.delay:
+            time.sleep(self.delay)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply_data(self, data: dict) -> None:
+        """
+        按小红书接口格式返回data
+        :param data: 接口数据
+        :return:
+        """
+        self._reply(orjson.dumps({"code": 0, "success": True, "msg": "成功", "data": data}))
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query: dict = {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        cursor: str = query.get("cursor", "")
+        if url.path == "/api/sns/web/v1/user_posted":
+            page: int = int(cursor or 0)
+            has_more: bool = page + 1 < self.pages
+            self._reply_data(dict(self.fixtures["user_notes"], cursor=str(page + 1) if has_more else "",
+                                  has_more=has_more))
+        elif url.path == "/api/sns/web/v2/comment/page":
+            self._reply_data(build_comment_page(query.get("note_id", ""), cursor, self.pages))
+        elif url.path == "/api/sns/web/v2/comment/sub/page":
+            self._reply_data(build_comment_page(query.get("root_comment_id", ""), cursor, self.pages, sub=True))
+        elif url.path.startswith("/discovery/item/"):
+            self._reply(self.fixtures["html"], content_type="text/html; charset=utf-8")
+        else:
+            self._reply(b"{}", status=404)
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlsplit(self.path).path == "/api/sns/web/v1/feed":
+            self._reply_data(self.fixtures["note"])
+        else:
+            self._reply(b"{}", status=404)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def percentile(values: list, q: int) -> float:
+    """
+    百分位数
+    :param values: 已排序的数值
+    :param q: 百分位，例：95
+    :return:
+    """
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    """
+    等待服务可以响应请求
+    :param url: 探测地址
+    :param process: 服务进程（提前退出时报错）
+    :param timeout: 超时时间（秒）
+    :return:
+    """
+    from curl_cffi import requests
+    deadline: float = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务进程已退出：{process.args}")
+        try:
+            requests.get(url, timeout=1)
+            return None
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"等待服务启动超时：{url}")
+
+
+def bench_routes_cases(pages: int) -> list:
+    """
+    controller中的各个路由（不含登录、账号池管理等会修改状态的路由）
+    :param pages: 分页接口的总页数
+    :return: [(名称, 请求方式, 路径, 参数, 请求JSON)]
+    """
+    with open(os.path.join(STRUCTURE_DIR, "note.json"), "r", encoding="utf-8") as f:
+        note_id: str = json.load(f)["items"][0]["id"]
+    user_id: str = "60ae2ccd000000000101c7bd"
+    token: str = "AB_bench="
+    comment_id: str = build_comment_page(note_id, "", 1)["comments"][0]["id"]
+    note: dict = {"note_id": note_id, "xsec_token": token}
+    sub: dict = {"note_id": note_id, "comment_id": comment_id, "xsec_token": token}
+    return [
+        ("get_user_notes", "GET", "/get_user_notes", {"user_id": user_id, "xsec_token": token}, None),
+        ("get_user_notes raw", "GET", "/get_user_notes", {"user_id": user_id, "xsec_token": token, "raw": "true"},
+         None),
+        ("get_user_notes fields", "GET", "/get_user_notes",
+         {"user_id": user_id, "xsec_token": token, "fields": "cursor,notes.note_id,notes.display_title"}, None),
+        ("get_note_by_id", "GET", "/get_note_by_id", note, None),
+        ("get_note_by_id raw", "GET", "/get_note_by_id", dict(note, raw="true"), None),
+        ("get_note_by_html", "GET", "/get_note_by_html", note, None),
+        ("get_comment_list", "GET", "/get_comment_list", note, None),
+        ("get_sub_comment_list", "GET", "/get_sub_comment_list", sub, None),
+        ("batch/get_notes", "POST", "/batch/get_notes", {}, {"items": [note] * 10}),
+        ("batch/get_notes html", "POST", "/batch/get_notes", {"source": "html"}, {"items": [note] * 10}),
+        ("get_comment_tree", "GET", "/get_comment_tree", note, None),
+        ("stream/user_notes", "GET", "/stream/user_notes", {"user_id": user_id, "xsec_token": token}, None),
+        ("stream/comment_list", "GET", "/stream/comment_list", note, None),
+        ("stream/sub_comment_list", "GET", "/stream/sub_comment_list", sub, None),
+        ("cache/stats", "GET", "/cache/stats", {}, None),
+        ("limiter/stats", "GET", "/limiter/stats", {}, None),
+        ("metrics", "GET", "/metrics", {}, None),
+    ]
+
+
+async def drive_route(host: str, method: str, path: str, params: dict, body: Optional[dict], concurrency: int,
+                      requests: int, duration: float) -> dict:
+    """
+    以固定并发请求一个路由
+    :param host: 服务地址
+    :param method: 请求方式
+    :param path: 路由
+    :param params: 请求参数
+    :param body: 请求JSON
+    :param concurrency: 并发数
+    :param requests: 请求总数
+    :param duration: 最长持续时间（秒），0为不限
+    :return: {"requests", "errors", "rps", "p50", "p95", "p99"}，延迟单位为毫秒
+    """
+    latencies: list = []
+    errors: int = 0
+    remaining: int = requests
+    start: float = time.perf_counter()
+    deadline: float = start + duration if duration else float("inf")
+
+    async def worker(session: AsyncSession) -> None:
+        nonlocal remaining, errors
+        while remaining > 0 and time.perf_counter() < deadline:
+            remaining -= 1
+            begin: float = time.perf_counter()
+            try:
+                response = await session.request(method, host + path, params=params, json=body, timeout=60)
+                ok: bool = response.status_code == 200 and b'"code":4000' not in response.content[:64]
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - begin)
+            errors += not ok
+
+    async with AsyncSession(max_clients=concurrency) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    elapsed: float = time.perf_counter() - start
+    latencies.sort()
+    return {"requests": len(latencies), "errors": errors, "rps": len(latencies) / elapsed,
+            **{f"p{q}": percentile(latencies, q) * 1000 for q in (50, 95, 99)}}
+
+
+app = typer.Typer(help="XHS服务基准测试 - UodRad")
+
+
+@app.callback()
+def main():
+    """
+    XHS服务基准测试 - UodRad
+    """
+
+
+@app.command(name="sign")
+def bench_sign(
+    rounds: int = typer.Option(2000, help="每种签名引擎的执行次数"),
+    cases: int = typer.Option(200, help="与JS对照的用例数量，0为不对照")
+):
+    """
+    签名对照测试及各签名引擎耗时
+    """
+    if cases:
+        sign_cases: list = build_sign_cases(cases)
+        output: str = subprocess.run(["node", "-e", GOLDEN_SIGN_JS, os.path.join(STATIC_DIR, "xhs_xs_xsc_56.js")],
+                                     input=json.dumps(sign_cases), capture_output=True, text=True,
+                                     check=True).stdout
+        mismatches: int = 0
+        for case, expected in zip(sign_cases, json.loads(output)):
+            actual: dict = signer.get_request_headers_params(
+                case["api"], case["data"], case["a1"], case["method"], timestamp=case["timestamp"],
+                random_bytes=lambda n, pending=bytearray(case["random"]): bytes(pending.pop(0) for _ in range(n))
+            )
+            if actual != expected:
+                mismatches += 1
+                logger.error(f"签名不一致：{case}\nJS：{expected}\nPython：{actual}")
+        if mismatches:
+            raise typer.Exit(code=1)
+        logger.success(f"纯Python签名与JS签名逐字节一致（{cases} 个用例）")
+    api: str = "/api/sns/web/v1/user_posted?num=30&cursor=&user_id=60ae2ccd000000000101c7bd"
+    a1: str = "19b979bfaccv9xzo6lown20n129b5ztl398ci2v9q40000101067"
+    generate_xs_xs_common(a1, api, "", "GET", engine="pool")  # 预热进程池
+    for engine, engine_rounds in (("native", rounds), ("pool", rounds), ("execjs", max(1, rounds // 100))):
+        cost: float = timeit(lambda: generate_xs_xs_common(a1, api, "", "GET", engine=engine), engine_rounds)
+        logger.info(f"签名引擎 {engine:<6}：{cost:>10.1f} μs/次（{engine_rounds} 次）")
+    sign_pool.close()
+
+
+@app.command(name="parse-html")
+def bench_parse_html(
+    rounds: int = typer.Option(500, help="每种解析方式的执行次数"),
+    fixture: str = typer.Option(os.path.join(STRUCTURE_DIR, "note_by_html.json"), help="笔记数据JSON文件")
+):
+    """
+    笔记HTML解析耗时（旧版正则+完整解析 vs 定位+只解析所需部分）
+    """
+    with open(fixture, "r", encoding="utf-8") as f:
+        note_data: dict = json.load(f)
+    # 笔记数据本身含有undefined，且字符串内容中也有undefined（不能被替换）
+    string_case: dict = dict(note_data, desc=":undefined,[undefined undefined")
+    for data_last in (True, False):
+        html: str = build_note_html(note_data, data_last=data_last)
+        html_bytes: bytes = html.encode("utf-8")
+        case_html: str = build_note_html(string_case, data_last=data_last).replace(
+            NOTE_DATA_KEY + ":{", NOTE_DATA_KEY + ':{"missing":undefined,')
+        if parse_note_html(html) != note_data or parse_note_html(html_bytes) != note_data or \
+                parse_note_html(case_html) != dict(string_case, missing=None):
+            logger.error("解析结果与fixture不一致！")
+            raise typer.Exit(code=1)
+        legacy_html: str = html.replace("undefined", "null")  # 旧版遇到undefined会报错
+        layout: str = "笔记数据在最后" if data_last else "笔记数据在最前"
+        logger.info(f"【{layout}】页面大小 {len(html_bytes) / 1024:.0f} KB")
+        for name, func in (("旧版（已去掉undefined）", lambda: legacy_parse_note_html(legacy_html)),
+                           ("新版 str", lambda: parse_note_html(html)),
+                           ("新版 bytes", lambda: parse_note_html(html_bytes))):
+            logger.info(f"  {name:<16}：{timeit(func, rounds):>10.1f} μs/次")
+    # 只解析笔记数据部分时，orjson与json.raw_decode的对比
+    subtree: str = json.dumps(note_data, ensure_ascii=False, separators=(",", ":"))
+    decoder: json.JSONDecoder = json.JSONDecoder()
+    logger.info(f"笔记数据 {len(subtree.encode()) / 1024:.0f} KB："
+                f"orjson {timeit(lambda: orjson.loads(subtree), rounds):.1f} μs/次，"
+                f"json.raw_decode {timeit(lambda: decoder.raw_decode(subtree), rounds):.1f} μs/次")
+
+
+@app.command(name="upstream")
+def bench_upstream(
+    port: int = typer.Option(9001, help="监听端口"),
+    delay: float = typer.Option(0, help="每个请求的模拟延迟（秒）"),
+    pages: int = typer.Option(3, help="分页接口（用户笔记、评论、子评论）的总页数")
+):
+    """
+    启动本地模拟的小红书接口和手机端笔记页面（服务设置XHS_BASE_HOST、XHS_HTML_HOST指向该地址）
+    """
+    FakeXhsHandler.load(delay, pages)
+    server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", port), FakeXhsHandler)
+    server.daemon_threads = True
+    logger.info(f"模拟接口已启动：http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+@app.command(name="routes")
+def bench_routes(
+    workers: List[int] = typer.Option([1], help="服务worker数（可多次指定，逐个测试）"),
+    concurrency: List[int] = typer.Option([16], help="客户端并发数（可多次指定，逐个测试）"),
+    requests: int = typer.Option(500, help="每个路由的请求数"),
+    duration: float = typer.Option(0, help="每个路由最长持续时间（秒），0为不限"),
+    route: Optional[List[str]] = typer.Option(None, help="只测试指定名称的路由（可多次指定）"),
+    delay: float = typer.Option(0, help="模拟接口每个请求的延迟（秒）"),
+    pages: int = typer.Option(3, help="分页接口的总页数"),
+    cache: bool = typer.Option(False, help="是否使用响应缓存（默认关闭，每次都请求模拟接口）"),
+    port: int = typer.Option(9000, help="服务端口（模拟接口使用port+1）")
+):
+    """
+    启动模拟接口和服务，以不同worker数、并发数压测controller中的路由，输出每秒请求数和p50/p95/p99延迟
+    """
+    cases: list = [case for case in bench_routes_cases(pages) if not route or case[0] in route]
+    if not cases:
+        logger.error(f"没有匹配的路由：{route}")
+        raise typer.Exit(code=1)
+    root: str = os.path.dirname(os.path.abspath(__file__))
+    upstream_host: str = f"http://127.0.0.1:{port + 1}"
+    host: str = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cookies_path: str = os.path.join(temp_dir, "cookies.json")
+        with open(cookies_path, "w", encoding="utf-8") as f:
+            json.dump({"a1": "19b979bfaccv9xzo6lown20n129b5ztl398ci2v9q40000101067", "web_session": "bench"}, f)
+        env: dict = dict(os.environ, XHS_BASE_HOST=upstream_host, XHS_HTML_HOST=upstream_host,
+                         XHS_COOKIES_PATH=cookies_path, XHS_ACCOUNTS_DB=os.path.join(temp_dir, "accounts.db"),
+                         XHS_METRICS_DIR=os.path.join(temp_dir, "metrics"), XHS_CACHE_DISK="",
+                         XHS_RATE="1000000", XHS_RATE_BURST="1000000", XHS_RATE_MAX="1000000")
+        upstream: subprocess.Popen = subprocess.Popen(
+            [sys.executable, os.path.join(root, "benchmark.py"), "upstream", "--port", str(port + 1),
+             "--delay", str(delay), "--pages", str(pages)], cwd=root, stdout=subprocess.DEVNULL
+        )
+        try:
+            wait_ready(upstream_host + "/", upstream)
+            for worker_count in workers:
+                service: subprocess.Popen = subprocess.Popen(
+                    [sys.executable, "-m", "uvicorn", "service:app", "--host", "127.0.0.1", "--port", str(port),
+                     "--workers", str(worker_count), "--log-level", "warning", "--no-access-log"],
+                    cwd=root, env=env
+                )
+                try:
+                    wait_ready(host + "/cache/stats", service)
+                    for client_count in concurrency:
+                        logger.info(f"【workers={worker_count} concurrency={client_count}】")
+                        for name, method, path, params, body in cases:
+                            params = dict(params, cache=str(cache).lower())
+                            asyncio.run(drive_route(host, method, path, params, body, client_count,
+                                                    client_count, 0))  # 预热连接
+                            result: dict = asyncio.run(drive_route(host, method, path, params, body, client_count,
+                                                                   requests, duration))
+                            log = logger.warning if result["errors"] else logger.info
+                            log(f"  {name:<24}：{result['rps']:>8.1f} 次/秒  p50 {result['p50']:>7.1f} ms  "
+                                f"p95 {result['p95']:>7.1f} ms  p99 {result['p99']:>7.1f} ms  "
+                                f"失败 {result['errors']}/{result['requests']}")
+                finally:
+                    service.terminate()
+                    service.wait()
+        finally:
+            upstream.terminate()
+            upstream.wait()
+
+
+@app.command(name="micro")
+def bench_micro(
+    rounds: int = typer.Option(2000, help="每项的执行次数")
+):
+    """
+    签名、笔记HTML解析、响应序列化（ResponseUtil）的单次耗时
+    """
+    fixtures: dict = {}
+    for name in ("note", "user_notes", "note_by_html"):
+        with open(os.path.join(STRUCTURE_DIR, f"{name}.json"), "r", encoding="utf-8") as f:
+            fixtures[name] = json.load(f)
+    cookies: dict = {"a1": "19b979bfaccv9xzo6lown20n129b5ztl398ci2v9q40000101067"}
+    params: dict = {"num": "30", "cursor": "", "user_id": "60ae2ccd000000000101c7bd",
+                    "image_formats": "jpg,webp,avif", "xsec_token": "AB_bench=", "xsec_source": "pc_note"}
+    feed: dict = {"source_note_id": fixtures["note"]["items"][0]["id"], "image_formats": ["jpg", "webp", "avif"],
+                  "extra": {"need_body_topic": "1"}, "xsec_source": "pc_user", "xsec_token": "AB_bench="}
+    html: bytes = build_note_html(fixtures["note_by_html"]).encode("utf-8")
+    raw: RawJSON = RawJSON(orjson.dumps(fixtures["user_notes"]))
+    projector: Callable = compile_fields("cursor,notes.note_id,notes.display_title")
+    for name, func in (
+            ("sign GET", lambda: sign("/api/sns/web/v1/user_posted", cookies, params=params, method="GET")),
+            ("sign POST", lambda: sign("/api/sns/web/v1/feed", cookies, data=feed, method="POST")),
+            (f"parse_note_html {len(html) // 1024}KB", lambda: parse_note_html(html)),
+            ("ResponseUtil dict", lambda: ResponseUtil(*SUCCESS, data=fixtures["user_notes"]).success()),
+            ("ResponseUtil RawJSON", lambda: ResponseUtil(*SUCCESS, data=raw).success()),
+            ("ResponseUtil fields", lambda: ResponseUtil(*SUCCESS, data=fixtures["user_notes"],
+                                                         projector=projector).success()),
+    ):
+        func()  # 预热
+        logger.info(f"{name:<24}：{timeit(func, rounds):>10.1f} μs/次")
+    sign_pool.close()
+
+
+if __name__ == "__main__":
+    app()
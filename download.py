@@ -1,11 +1,18 @@
 from urllib.parse import urlparse, parse_qs
-from curl_cffi import Response, requests
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from service.manifest import DownloadManifest, link_or_copy
+from service.session import SessionPool, session_options
+from service.sync import SyncState
+from curl_cffi import Response
 from service.logic import XhsLogic
-from typing import Optional
+from typing import Callable, List, Optional
 from loguru import logger
-from random import choice
 from tqdm import tqdm
+import threading
+import tempfile
+import hashlib
 import typer
+import json
 import time
 import os
 import re
@@ -22,18 +29,45 @@ def parse_url_params(url: str) -> dict:
     return {k: v[0] if len(v) == 1 else v for k, v in params.items()}
 
 
+def media_key_from_url(url: str) -> str:
+    """
+    从图片URL中提取媒体键（URL中的签名、时间戳会变化，文件ID不变）
+    :param url: 图片URL，例：http://sns-webpic-qc.xhscdn.com/202601091634/7d4b.../1040g2sg31gl69ark3s7049m0pkbfegqtaanhmpo!h5_1080jpg
+    :return: 例：1040g2sg31gl69ark3s7049m0pkbfegqtaanhmpo
+    """
+    return urlparse(url).path.rsplit("/", 1)[-1].split("!")[0]
+
+
+VIDEO_HOST: str = "http://sns-video-hs.xhscdn.com/"
+MANIFEST_NAME: str = "manifest.db"
+SYNC_STATE_NAME: str = "sync.db"
+
+
 class Download(object):
-    def __init__(self, proxy: str = None, save_dir: str = "downloads") -> None:
+    def __init__(self, proxy: str = None, save_dir: str = "downloads", concurrency: int = 8, segments: int = 4,
+                 chunk_size: int = 1024 * 1024, manifest: Optional[DownloadManifest] = None) -> None:
         """
         XHS下载工具
-        :param proxy: 设置代理，例：http://127.0.0.1:7897
+        :param proxy: 设置代理（用于获取笔记数据），例：http://127.0.0.1:7897，pool为使用代理池
         :param save_dir: 文件保存目录
+        :param concurrency: 同时下载的文件数量
+        :param segments: 视频分段下载的连接数
+        :param chunk_size: 视频下载每次读取的字节数
+        :param manifest: 下载清单，设置后跳过已下载的文件，并对相同文件去重
         """
         self.headers: dict = {
             "user-agent": "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Mobile Safari/537.36"
         }
         self.xhs_logic: XhsLogic = XhsLogic(proxy=proxy)
         self.save_dir: str = save_dir
+        self.concurrency: int = concurrency
+        self.segments: int = segments
+        self.chunk_size: int = chunk_size
+        self.manifest: Optional[DownloadManifest] = manifest
+        self._media_locks: dict = {}  # 媒体键 -> 锁，同一媒体同时只下载一次，其余等待后直接链接
+        self._media_locks_lock: threading.Lock = threading.Lock()
+        # 下载文件用的会话池（复用连接），大小与并发数一致
+        self.pool: SessionPool = SessionPool(**dict(session_options, size=max(concurrency, segments), read_timeout=600))
         os.makedirs(self.save_dir, exist_ok=True)
 
     def sanitize_filename(self, filename: str) -> str:
@@ -51,9 +85,180 @@ class Download(object):
         return cleaned.strip() or "Untitled"
 
 
+    @staticmethod
+    def _save_state(state_path: str, state: dict) -> None:
+        """
+        原子写入分段下载进度
+        :param state_path: 进度文件路径
+        :param state: 进度
+        :return:
+        """
+        fd, temp_path = tempfile.mkstemp(prefix=".state-", suffix=".tmp", dir=os.path.dirname(os.path.abspath(state_path)))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp_path, state_path)
+
+    def _probe(self, url: str) -> tuple:
+        """
+        探测文件大小以及CDN是否支持Range请求
+        :param url: 文件URL
+        :return: (文件大小, 校验标识ETag/Last-Modified)，不支持Range时文件大小为0
+        """
+        with self.pool.session() as session:
+            response: Response = session.get(url=url, headers=dict(self.headers, range="bytes=0-0"), stream=True)
+            response.close()
+        content_range: str = response.headers.get("content-range", "")
+        if response.status_code != 206 or "/" not in content_range or content_range.endswith("/*"):
+            return 0, ""
+        return int(content_range.rsplit("/", 1)[1]), response.headers.get("etag") or response.headers.get("last-modified") or ""
+
+    @staticmethod
+    def _sync_segment(f, segment: list, written: int, lock: threading.Lock) -> None:
+        """
+        先把.part文件刷到磁盘，再更新分段进度（保存的进度不会超过磁盘上实际写入的位置）
+        :param f: .part文件
+        :param segment: 分段
+        :param written: 已写入文件的字节数
+        :param lock: 进度锁
+        :return:
+        """
+        f.flush()
+        os.fsync(f.fileno())
+        with lock:
+            segment[2] = written
+
+    def _download_segment(self, url: str, part_path: str, segment: list, lock: threading.Lock, pbar: tqdm,
+                          on_progress: Callable[[], None], retries: int = 3) -> None:
+        """
+        下载一个分段（写入.part文件的对应位置），中断后从已下载位置继续
+        :param url: 文件URL
+        :param part_path: .part文件路径
+        :param segment: [起始位置, 结束位置（含）, 已写入磁盘的字节数]，下载过程中原地更新
+        :param lock: 进度锁
+        :param pbar: 进度条
+        :param on_progress: 进度更新后的回调（定期保存进度）
+        :param retries: 失败重试次数
+        :return:
+        """
+        start, end = segment[0], segment[1]
+        for attempt in range(retries + 1):
+            if start + segment[2] > end:
+                return None
+            try:
+                with self.pool.session() as session, open(part_path, "r+b") as f:
+                    written: int = segment[2]
+                    synced_at: float = time.monotonic()
+                    f.seek(start + written)
+                    response: Response = session.get(
+                        url=url, headers=dict(self.headers, range=f"bytes={start + written}-{end}"), stream=True
+                    )
+                    try:
+                        if response.status_code != 206:
+                            raise RuntimeError(f"分段请求失败，状态码：{response.status_code}")
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            chunk = chunk[:end + 1 - start - written]
+                            f.write(chunk)
+                            written += len(chunk)
+                            pbar.update(len(chunk))
+                            if time.monotonic() - synced_at >= 1:
+                                self._sync_segment(f, segment, written, lock)
+                                synced_at = time.monotonic()
+                                on_progress()
+                    finally:
+                        response.close()
+                        self._sync_segment(f, segment, written, lock)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"分段 {start}-{end} 下载中断，第 {attempt + 1} 次重试：{e}")
+                time.sleep(attempt + 1)
+        if start + segment[2] <= end:
+            raise RuntimeError(f"分段 {start}-{end} 未下载完整")
+
+    def _download_stream(self, url: str, part_path: str) -> None:
+        """
+        单连接流式下载（CDN不支持Range时使用，无法续传）
+        :param url: 文件URL
+        :param part_path: .part文件路径
+        :return:
+        """
+        with self.pool.session() as session:
+            response: Response = session.get(url=url, headers=self.headers, stream=True)
+            try:
+                if response.status_code != 200:
+                    raise RuntimeError(f"下载失败，状态码：{response.status_code}")
+                total_size: int = int(response.headers.get("content-length", 0))
+                with open(part_path, "wb") as f, tqdm(total=total_size, unit="B", unit_scale=True, desc="下载进度") as pbar:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            pbar.update(len(chunk))
+            finally:
+                response.close()
+
+    def download_file(self, url: str, save_path: str) -> None:
+        """
+        下载大文件：支持Range时多连接分段下载，写入.part文件并在旁边保存进度（.part.json），
+        中断后重新运行从断点继续，全部完成后原子重命名为目标文件；不支持Range时回退为单连接下载
+        :param url: 文件URL
+        :param save_path: 保存路径
+        :return:
+        """
+        part_path: str = save_path + ".part"
+        state_path: str = part_path + ".json"
+        size, validator = self._probe(url)
+        if not size:
+            logger.info("CDN不支持Range请求，使用单连接下载")
+            self._download_stream(url, part_path)
+            os.replace(part_path, save_path)
+            return None
+        state: Optional[dict] = None
+        if os.path.exists(state_path) and os.path.exists(part_path):
+            try:
+                with open(state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = None
+            if not state or (state.get("url"), state.get("size"), state.get("validator")) != (url, size, validator):
+                state = None  # 文件已变化，重新下载
+        if state is None:
+            count: int = max(1, min(self.segments, size // (1024 * 1024) or 1))  # 每段至少1MB
+            step: int = -(-size // count)
+            state = {"url": url, "size": size, "validator": validator,
+                     "segments": [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]}
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+            self._save_state(state_path, state)
+        downloaded: int = sum(segment[2] for segment in state["segments"])
+        if downloaded:
+            logger.info(f"从断点继续下载：{downloaded / size:.1%}")
+        lock: threading.Lock = threading.Lock()
+        saved_at: list = [time.monotonic()]
+
+        def save_progress(force: bool = False) -> None:
+            with lock:
+                if force or time.monotonic() - saved_at[0] >= 1:
+                    saved_at[0] = time.monotonic()
+                    self._save_state(state_path, state)
+
+        pending: list = [segment for segment in state["segments"] if segment[0] + segment[2] <= segment[1]]
+        errors: list = []
+        with tqdm(total=size, initial=downloaded, unit="B", unit_scale=True, desc="下载进度") as pbar, \
+                ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+            futures: list[Future] = [executor.submit(self._download_segment, url, part_path, segment, lock, pbar,
+                                                     save_progress) for segment in pending]
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    errors.append(future.exception())
+        save_progress(force=True)
+        if errors:
+            raise RuntimeError(f"下载未完成（重新运行可从断点继续）：{errors[0]}")
+        os.replace(part_path, save_path)
+        os.remove(state_path)
+
     def note_veideo(self, url: str) -> None:
         """
-        下载笔记原画视频
+        下载笔记原画视频（分段下载，支持断点续传）
         :param url: 笔记完整URL，例：https://www.xiaohongshu.com/explore/64565216000000002702b26b?xsec_token=ABcnmyqK0A3I-Ij84SirZ0QbSVnd9SuWIv0Y00JRvMm4s=&xsec_source=pc_feed
         :return:
         """
@@ -69,65 +274,183 @@ class Download(object):
         if not video_key:
             logger.error("笔记中未找到视频！")
             return None
-        logger.info(f"【{note_info.get('title')}】已获取到笔记数据，正在下载视频...")
-        response: Response = requests.get(
-            url="http://sns-video-hs.xhscdn.com/" + video_key,
-            headers=self.headers,
-            timeout=600,  # 10分钟超时，适合大文件
-            stream=True   # 启用流式下载
-        )
-        if response.status_code != 200:
-            logger.error(f"视频下载失败，状态码：{response.status_code}")
+        note_id: str = url.split("?")[0].split("/")[-1]
+        nickname: str = note_info.get("user", {}).get("nickName", "NONE")  # 作者
+        if self.manifest is not None and self.manifest.is_done(note_id, video_key):
+            logger.info(f"作者：{nickname}【{note_info.get('title')}】视频已下载过，跳过")
             return None
-        # 获取文件总大小
-        total_size = int(response.headers.get('content-length', 0))
+        logger.info(f"【{note_info.get('title')}】已获取到笔记数据，正在下载视频...")
         save_dir: str = os.path.join(self.save_dir, "video")
         os.makedirs(save_dir, exist_ok=True)
-        nickname: str = note_info.get("user", {}).get("nickName", "NONE")  # 作者
         filename: str = self.sanitize_filename(f"【{nickname}】{note_info.get('title')}.mp4")
         save_path: str = os.path.join(save_dir, filename)
-        # 使用tqdm显示下载进度
-        with open(save_path, "wb") as f:
-            with tqdm(total=total_size, unit='B', unit_scale=True, desc="下载进度") as pbar:
-                for chunk in response.iter_content(chunk_size=8192):  # 每次读取8KB
-                    if chunk:  # 过滤掉空的chunks
-                        f.write(chunk)
-                        pbar.update(len(chunk))  # 更新进度条
+        existing: Optional[dict] = self.manifest.find_media(video_key) if self.manifest is not None else None
+        if existing is not None:  # 其他笔记已下载过同一视频
+            link_or_copy(existing["path"], save_path)
+        else:
+            self.download_file(url=VIDEO_HOST + video_key, save_path=save_path)
+        if self.manifest is not None:
+            self.manifest.record(note_id, video_key, save_path, existing["sha256"] if existing else None)
         logger.success(f"作者：{nickname}【{note_info.get('title')}】视频保存成功：{os.path.abspath(save_path)}")
 
-    def note_images(self, url: str) -> None:
+    def _note_image_tasks(self, url: str) -> list:
         """
-        下载笔记无水印图片
-        :param url: 笔记完整URL，例：https://www.xiaohongshu.com/explore/64565216000000002702b26b?xsec_token=ABcnmyqK0A3I-Ij84SirZ0QbSVnd9SuWIv0Y00JRvMm4s=&xsec_source=pc_feed
-        :return:
+        获取笔记数据，整理出需要下载的图片
+        :param url: 笔记完整URL
+        :return: [(笔记ID, 媒体键, 图片URL, 保存路径, 序号, 标题)]
         """
         params: dict = parse_url_params(url)
+        note_id: str = url.split("?")[0].split("/")[-1]
         result_json: dict = self.xhs_logic.get_note_by_html(
-            note_id=url.split("?")[0].split("/")[-1],
+            note_id=note_id,
             xsec_token=params.get("xsec_token"),
             xsec_source=params.get("xsec_source")
         )
-        # 获取图片URL列表
         note_info: dict = result_json.get("noteData", {})
-        image_urls: list = [image.get("url", "") for image in note_info.get("imageList", [])]
+        images: list = [(image.get("fileId") or media_key_from_url(image.get("url", "")), image.get("url", ""))
+                        for image in note_info.get("imageList", [])]
         nickname: str = note_info.get("user", {}).get("nickName", "NONE")  # 作者
         save_dir: str = os.path.join(self.save_dir, "image", nickname)
         os.makedirs(save_dir, exist_ok=True)
-        logger.info(f"作者：{nickname}【{note_info.get('title')}】已获取到笔记数据，开始下载图片...")
-        for index, image_url in enumerate(image_urls, 1):
-            response: Response = requests.get(
-                url=image_url,
-                headers=self.headers
-            )
-            if response.status_code != 200:
-                logger.warning(f"第 {index} 张图片下载失败！")
+        logger.info(f"作者：{nickname}【{note_info.get('title')}】已获取到笔记数据，共 {len(images)} 张图片")
+        return [(note_id, media_key, image_url,
+                 os.path.join(save_dir, self.sanitize_filename(f"【{index}】{note_info.get('title')}.jpg")),
+                 index, note_info.get("title")) for index, (media_key, image_url) in enumerate(images, 1)]
+
+    def _download_image(self, note_id: str, media_key: str, image_url: str, save_path: str, index: int, title: str,
+                        pbar: tqdm) -> bool:
+        """
+        下载单张图片（使用会话池中的连接），其他笔记已下载过同一图片时直接链接
+        :param note_id: 笔记ID
+        :param media_key: 媒体键
+        :param image_url: 图片URL
+        :param save_path: 保存路径
+        :param index: 图片序号
+        :param title: 笔记标题
+        :param pbar: 总进度条
+        :return: 是否成功
+        """
+        with self._media_locks_lock:
+            media_lock: threading.Lock = self._media_locks.setdefault(media_key, threading.Lock())
+        try:
+            with media_lock:
+                existing: Optional[dict] = self.manifest.find_media(media_key) if self.manifest is not None else None
+                if existing is not None:
+                    link_or_copy(existing["path"], save_path)
+                    self.manifest.record(note_id, media_key, save_path, existing["sha256"])
+                    return True
+                with self.pool.session() as session:
+                    response: Response = session.get(url=image_url, headers=self.headers)
+                if response.status_code != 200:
+                    logger.warning(f"【{title}】第 {index} 张图片下载失败，状态码：{response.status_code}")
+                    return False
+                with open(save_path, "wb") as f:
+                    f.write(response.content)
+                if self.manifest is not None:
+                    self.manifest.record(note_id, media_key, save_path, hashlib.sha256(response.content).hexdigest())
+            return True
+        except Exception as e:
+            logger.warning(f"【{title}】第 {index} 张图片下载失败：{e}")
+            return False
+        finally:
+            pbar.update(1)
+
+    def batch_images(self, urls: list) -> dict:
+        """
+        并发下载多篇笔记的无水印图片：笔记数据与图片同时下载，共用一个总进度条
+        :param urls: 笔记完整URL列表
+        :return: {"notes": 成功笔记数, "failed_notes": [失败的笔记URL], "images": 成功图片数, "failed_images": 失败图片数,
+                  "skipped": 已下载过而跳过的图片数}
+        """
+        stats: dict = {"notes": 0, "failed_notes": [], "images": 0, "failed_images": 0, "skipped": 0}
+        note_concurrency: int = max(1, min(4, self.concurrency))  # 笔记数据请求受限流控制，无需太多线程
+        with ThreadPoolExecutor(max_workers=note_concurrency) as note_executor, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as image_executor, \
+                tqdm(total=0, unit="张", desc="下载进度") as pbar:
+            note_futures: dict = {note_executor.submit(self._note_image_tasks, url): url for url in urls}
+            image_futures: list[Future] = []
+            for future in as_completed(note_futures):
+                try:
+                    tasks: list = future.result()
+                except Exception as e:
+                    logger.error(f"当前笔记下载失败，待会重新跑一次试试，笔记URL：{note_futures[future]}\n报错信息：{e}")
+                    stats["failed_notes"].append(note_futures[future])
+                    continue
+                stats["notes"] += 1
+                if self.manifest is not None:
+                    pending: list = [task for task in tasks if not self.manifest.is_done(task[0], task[1])]
+                    stats["skipped"] += len(tasks) - len(pending)
+                    tasks = pending
+                pbar.total += len(tasks)
+                pbar.refresh()
+                image_futures += [image_executor.submit(self._download_image, *task, pbar) for task in tasks]
+            for future in image_futures:
+                stats["images" if future.result() else "failed_images"] += 1
+        logger.success(f"图片下载完毕：笔记 {stats['notes']} 篇，图片 {stats['images']} 张，跳过 {stats['skipped']} 张，"
+                       f"失败 {stats['failed_images']} 张：{os.path.abspath(os.path.join(self.save_dir, 'image'))}")
+        return stats
+
+    def note_images(self, url: str) -> None:
+        """
+        下载笔记无水印图片
+        :param url: 笔记完整URL，例：https://www.xiaohongshu.com/explore/64565216000000002702b26b?xsec_token=ABcnmyqK0A3I-Ij84SirZ0QbSVnd9SuWIv0Y00JRvMm4s=&xsec_source=pc_feed
+        :return:
+        """
+        stats: dict = self.batch_images([url])
+        if stats["failed_notes"]:
+            raise RuntimeError(f"笔记数据获取失败：{url}")
+
+    def sync_user(self, url: str, state: SyncState, max_pages: int = 0) -> dict:
+        """
+        增量同步用户笔记：只翻页到上次同步过的笔记为止，只下载新笔记的视频和图片，全部成功后才更新高水位
+        :param url: 用户主页完整URL，例：https://www.xiaohongshu.com/user/profile/60ae2ccd000000000101c7bd?xsec_token=ABWmyxguRSEPAC9GK04l453BxNIXXt4eqJfc9W1mc1fc4=&xsec_source=pc_note
+        :param state: 高水位存储
+        :param max_pages: 最多请求页数，0为不限
+        :return: {"user_id", "new": 新笔记数, "pages": 请求页数, "failed": [下载失败的笔记URL]}
+        """
+        params: dict = parse_url_params(url)
+        user_id: str = url.split("?")[0].rstrip("/").split("/")[-1]
+        result: dict = self.xhs_logic.sync_user_notes(
+            user_id=user_id,
+            xsec_token=params.get("xsec_token"),
+            xsec_source=params.get("xsec_source") or "pc_note",
+            since=(state.get(user_id) or {}).get("note_id"),
+            max_pages=max_pages
+        )
+        note_urls: list = [
+            (note.get("type"), f"https://www.xiaohongshu.com/explore/{note.get('note_id')}?"
+                               f"xsec_token={note.get('xsec_token', '')}&xsec_source=pc_user")
+            for note in result["notes"]
+        ]
+        failed: list = []
+        for note_type, note_url in note_urls:
+            if note_type != "video":
                 continue
-            filename: str = self.sanitize_filename(f"【{index}】{note_info.get('title')}.jpg")
-            save_path: str = os.path.join(save_dir, filename)
-            with open(save_path, "wb") as f:
-                f.write(response.content)
-            logger.info(f"作者：{nickname}【{note_info.get('title')}】第 {index} 张图片保存成功：{os.path.abspath(save_path)}")
-        logger.success(f"作者：{nickname}【{note_info.get('title')}】图片下载完毕：{os.path.abspath(save_dir)}")
+            try:
+                self.note_veideo(note_url)
+            except Exception as e:
+                logger.error(f"当前笔记下载失败，待会重新跑一次试试，笔记URL：{note_url}\n报错信息：{e}")
+                failed.append(note_url)
+        image_urls: list = [note_url for note_type, note_url in note_urls if note_type != "video"]
+        if image_urls:
+            failed += self.batch_images(image_urls)["failed_notes"]
+        if failed:
+            logger.warning(f"用户 {user_id} 有 {len(failed)} 篇笔记下载失败，本次不更新同步位置")
+        elif not result["complete"]:
+            logger.warning(f"用户 {user_id} 未翻到上次同步的位置（已达到最大页数），本次不更新同步位置")
+        elif result["newest"]:
+            state.set(user_id, result["newest"])
+        return {"user_id": user_id, "new": len(result["notes"]), "pages": result["pages"], "failed": failed}
+
+
+def open_manifest(save_dir: str, enabled: bool = True) -> Optional[DownloadManifest]:
+    """
+    打开保存目录中的下载清单
+    :param save_dir: 文件保存目录
+    :param enabled: 是否启用
+    :return:
+    """
+    return DownloadManifest(os.path.join(save_dir, MANIFEST_NAME)) if enabled else None
 
 
 app = typer.Typer(help="XHS下载工具 - UodRad")
@@ -136,14 +459,18 @@ app = typer.Typer(help="XHS下载工具 - UodRad")
 @app.command(name="video")
 def download_video(
     url: str = typer.Argument(..., help="笔记完整URL，例：https://www.xiaohongshu.com/explore/64565216000000002702b26b?xsec_token=ABcnmyqK0A3I-Ij84SirZ0QbSVnd9SuWIv0Y00JRvMm4s=&xsec_source=pc_feed"),
-    proxy: Optional[str] = typer.Option(None, help="设置代理，例：http://127.0.0.1:7897"),
-    save_dir: str = typer.Option("downloads", help="文件保存目录")
+    proxy: Optional[str] = typer.Option(None, help="设置代理，例：http://127.0.0.1:7897，pool为使用代理池"),
+    save_dir: str = typer.Option("downloads", help="文件保存目录"),
+    segments: int = typer.Option(4, min=1, help="分段下载的连接数"),
+    chunk_size: int = typer.Option(1024, min=8, help="每次读取的大小（KB）"),
+    manifest: bool = typer.Option(True, "--manifest/--no-manifest", help="使用下载清单跳过已下载的文件")
 ):
     """
-    下载笔记原画视频
+    下载笔记原画视频（中断后重新运行可断点续传）
     """
     try:
-        Download(proxy=proxy, save_dir=save_dir).note_veideo(url)
+        Download(proxy=proxy, save_dir=save_dir, segments=segments, chunk_size=chunk_size * 1024,
+                 manifest=open_manifest(save_dir, manifest)).note_veideo(url)
     except Exception:
         import traceback
         logger.error(f"下载失败，报错信息：{traceback.format_exc()}")
@@ -152,41 +479,48 @@ def download_video(
 @app.command(name="batch-video")
 def download_batch_video(
     url_file: str = typer.Argument(..., help="笔记URL列表TXT文件，每行一个笔记URL，例：https://www.xiaohongshu.com/explore/64565216000000002702b26b?xsec_token=ABcnmyqK0A3I-Ij84SirZ0QbSVnd9SuWIv0Y00JRvMm4s=&xsec_source=pc_feed"),
-    proxy: Optional[str] = typer.Option()
+    proxy: Optional[str] = typer.Option(None, help="设置代理，例：http://127.0.0.1:7897，pool为使用代理池"),
+    save_dir: str = typer.Option("downloads", help="文件保存目录"),
+    segments: int = typer.Option(4, min=1, help="分段下载的连接数"),
+    chunk_size: int = typer.Option(1024, min=8, help="每次读取的大小（KB）"),
+    manifest: bool = typer.Option(True, "--manifest/--no-manifest", help="使用下载清单跳过已下载的文件")
 ):
     """
     批量下载笔记原画视频
     """
     try:
         with open(url_file, "r", encoding="utf-8") as f:
-            urls: list = [url.strip() for url in f.readlines()]
-        for url in urls:
-            logger.info(f"开始下载：{url}")
-            try:
-                Download(proxy=proxy).note_veideo(url)
-            except Exception:
-                import traceback
-                logger.error(f"当前笔记下载失败，待会重新跑一次试试，笔记URL：{url}\n报错信息：{traceback.format_exc()}")
-                continue
-            logger.info("防止过度采集，随机休眠1-3秒...")
-            time.sleep(choice([1, 3]))  # 随机休眠1-3秒
-            print()
+            urls: list = [url.strip() for url in f.readlines() if url.strip()]
     except Exception:
         logger.error("读取笔记URL列表文件失败，请检查文件路径或内容是否正确！")
         return None
+    download: Download = Download(proxy=proxy, save_dir=save_dir, segments=segments, chunk_size=chunk_size * 1024,
+                                  manifest=open_manifest(save_dir, manifest))
+    for url in urls:
+        logger.info(f"开始下载：{url}")
+        try:
+            download.note_veideo(url)
+        except Exception:
+            import traceback
+            logger.error(f"当前笔记下载失败，待会重新跑一次试试，笔记URL：{url}\n报错信息：{traceback.format_exc()}")
+            continue
+        print()
 
 
 @app.command(name="images")
 def download_images(
     url: str = typer.Argument(..., help="笔记完整URL，例：https://www.xiaohongshu.com/explore/64565216000000002702b26b?xsec_token=ABcnmyqK0A3I-Ij84SirZ0QbSVnd9SuWIv0Y00JRvMm4s=&xsec_source=pc_feed"),
-    proxy: Optional[str] = typer.Option(None, help="设置代理，例：http://127.0.0.1:7897"),
-    save_dir: str = typer.Option("downloads", help="文件保存目录")
+    proxy: Optional[str] = typer.Option(None, help="设置代理，例：http://127.0.0.1:7897，pool为使用代理池"),
+    save_dir: str = typer.Option("downloads", help="文件保存目录"),
+    concurrency: int = typer.Option(8, min=1, help="同时下载的图片数量"),
+    manifest: bool = typer.Option(True, "--manifest/--no-manifest", help="使用下载清单跳过已下载的文件")
 ):
     """
     下载笔记无水印图片
     """
     try:
-        Download(proxy=proxy, save_dir=save_dir).note_images(url)
+        Download(proxy=proxy, save_dir=save_dir, concurrency=concurrency,
+                 manifest=open_manifest(save_dir, manifest)).note_images(url)
     except Exception:
         logger.error("下载失败，重新跑一次试试，嘿嘿~")
 
@@ -194,27 +528,87 @@ def download_images(
 @app.command(name="batch-images")
 def download_batch_images(
     url_file: str = typer.Argument(..., help="笔记URL列表TXT文件，每行一个笔记URL，例：https://www.xiaohongshu.com/explore/64565216000000002702b26b?xsec_token=ABcnmyqK0A3I-Ij84SirZ0QbSVnd9SuWIv0Y00JRvMm4s=&xsec_source=pc_feed"),
-    proxy: Optional[str] = typer.Option()
+    proxy: Optional[str] = typer.Option(None, help="设置代理，例：http://127.0.0.1:7897，pool为使用代理池"),
+    save_dir: str = typer.Option("downloads", help="文件保存目录"),
+    concurrency: int = typer.Option(8, min=1, help="同时下载的图片数量"),
+    manifest: bool = typer.Option(True, "--manifest/--no-manifest", help="使用下载清单跳过已下载的文件")
 ):
     """
-    批量下载笔记无水印图片
+    批量下载笔记无水印图片（多篇笔记、多张图片并发下载）
     """
     try:
         with open(url_file, "r", encoding="utf-8") as f:
-            urls: list = [url.strip() for url in f.readlines()]
-        for url in urls:
-            logger.info(f"开始下载：{url}")
-            try:
-                Download(proxy=proxy).note_images(url)
-            except Exception:
-                logger.error(f"当前笔记下载失败，待会重新跑一次试试，笔记URL：{url}")
-                continue
-            logger.info("防止过度采集，随机休眠1-3秒...")
-            time.sleep(choice([1, 3]))  # 随机休眠1-3秒
-            print()
+            urls: list = [url.strip() for url in f.readlines() if url.strip()]
     except Exception:
         logger.error("读取笔记URL列表文件失败，请检查文件路径或内容是否正确！")
         return None
+    stats: dict = Download(proxy=proxy, save_dir=save_dir, concurrency=concurrency,
+                           manifest=open_manifest(save_dir, manifest)).batch_images(urls)
+    if stats["failed_notes"]:
+        logger.warning("以下笔记下载失败，待会重新跑一次试试：\n" + "\n".join(stats["failed_notes"]))
+
+
+@app.command(name="sync")
+def sync_users(
+    urls: Optional[List[str]] = typer.Argument(None, help="用户主页完整URL，可传多个，例：https://www.xiaohongshu.com/user/profile/60ae2ccd000000000101c7bd?xsec_token=ABWmyxguRSEPAC9GK04l453BxNIXXt4eqJfc9W1mc1fc4=&xsec_source=pc_note"),
+    url_file: Optional[str] = typer.Option(None, help="用户主页URL列表TXT文件，每行一个"),
+    proxy: Optional[str] = typer.Option(None, help="设置代理，例：http://127.0.0.1:7897，pool为使用代理池"),
+    save_dir: str = typer.Option("downloads", help="文件保存目录"),
+    concurrency: int = typer.Option(8, min=1, help="同时下载的图片数量"),
+    segments: int = typer.Option(4, min=1, help="视频分段下载的连接数"),
+    max_pages: int = typer.Option(0, min=0, help="每个用户最多请求页数，0为不限（首次同步为全量）"),
+    manifest: bool = typer.Option(True, "--manifest/--no-manifest", help="使用下载清单跳过已下载的文件")
+):
+    """
+    增量同步用户笔记：只下载上次同步之后发布的笔记
+    """
+    urls = list(urls or [])
+    if url_file:
+        try:
+            with open(url_file, "r", encoding="utf-8") as f:
+                urls += [url.strip() for url in f.readlines() if url.strip()]
+        except Exception:
+            logger.error("读取用户URL列表文件失败，请检查文件路径或内容是否正确！")
+            return None
+    if not urls:
+        logger.error("请传入用户主页URL或--url-file！")
+        raise typer.Exit(1)
+    download: Download = Download(proxy=proxy, save_dir=save_dir, concurrency=concurrency, segments=segments,
+                                  manifest=open_manifest(save_dir, manifest))
+    state: SyncState = SyncState(os.path.join(save_dir, SYNC_STATE_NAME))
+    for url in urls:
+        logger.info(f"开始同步：{url}")
+        try:
+            result: dict = download.sync_user(url, state, max_pages=max_pages)
+        except Exception as e:
+            logger.error(f"当前用户同步失败，待会重新跑一次试试，用户URL：{url}\n报错信息：{e}")
+            continue
+        logger.success(f"用户 {result['user_id']} 同步完毕：新笔记 {result['new']} 篇，请求 {result['pages']} 页，"
+                       f"失败 {len(result['failed'])} 篇")
+
+
+@app.command(name="verify")
+def verify_downloads(
+    save_dir: str = typer.Option("downloads", help="文件保存目录"),
+    rehash: bool = typer.Option(False, help="重新计算SHA-256校验内容（否则只比较文件大小）"),
+    prune: bool = typer.Option(False, help="删除校验失败的记录，下次运行重新下载")
+):
+    """
+    按下载清单校验已下载的文件
+    """
+    manifest_path: str = os.path.join(save_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        logger.error(f"下载清单不存在：{os.path.abspath(manifest_path)}")
+        raise typer.Exit(1)
+    result: dict = DownloadManifest(manifest_path).verify(rehash=rehash, prune=prune)
+    for item in result["missing"]:
+        logger.warning(f"文件缺失：{item['path']}")
+    for item in result["mismatch"]:
+        logger.warning(f"文件不一致：{item['path']}")
+    logger.info(f"校验完毕：正常 {result['ok']} 个，缺失 {len(result['missing'])} 个，不一致 {len(result['mismatch'])} 个"
+                + ("，已删除失败记录" if prune and (result["missing"] or result["mismatch"]) else ""))
+    if result["missing"] or result["mismatch"]:
+        raise typer.Exit(1)
 
 
 if __name__ == "__main__":
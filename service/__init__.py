@@ -1,12 +1,81 @@
+from service.startup import startup_tracker, FirstRequestMiddleware  # 最先导入，用于统计导入耗时
 from loguru import logger
 from traceback import format_exc
+from typing import AsyncIterator
+from service.xray import xray_pool
 from service.controller import router
 from starlette.requests import Request
+from contextlib import asynccontextmanager
+from service.encryption import sign_pool, warm_up
+from service.session import session_pool, async_session_pool
 from fastapi_offline import FastAPIOffline
 from service.response import FAIL, ResponseUtil
+from service.browser import cookie_minter
+from service.xray import trace_id_buffer
+from service.cache import response_cache
+from service.limiter import rate_limiter
+from service.metrics import metrics, MetricsMiddleware
+from service.logic import COOKIES_PATH
+from service.cassette import cassette_store
+from service.proxy import proxy_pool
+import os
 
-app: FastAPIOffline = FastAPIOffline(title="XHS采集API - UodRad")
+# 上游请求录制/回放（record：录制；replay：只从录制中返回，不联网、不签名）
+cassette_store.configure(os.getenv("XHS_CASSETTE_MODE", "off"), os.getenv("XHS_CASSETTE_DIR", "cassettes"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPIOffline) -> AsyncIterator[None]:
+    """
+    应用生命周期：后台预热签名、启动Cookie后台刷新，关闭时释放会话池、Node进程和常驻浏览器
+    :param app: 应用对象
+    :return:
+    """
+    if cassette_store.replaying:  # 回放不签名，无需预热
+        startup_tracker.ready.set()
+    else:
+        startup_tracker.start_warm_up(warm_up)
+    cookie_minter.start_renewal(cookies_path=COOKIES_PATH)
+    metrics.start()
+    yield
+    proxy_pool.close()
+    startup_tracker.close()
+    metrics.close()
+    cassette_store.close()
+    cookie_minter.close()
+    await async_session_pool.close()
+    session_pool.close()
+    sign_pool.close()
+    xray_pool.close()
+
+
+app: FastAPIOffline = FastAPIOffline(title="XHS采集API - UodRad", lifespan=lifespan)
 app.include_router(prefix="", router=router)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+app.add_middleware(FirstRequestMiddleware, startup=startup_tracker)
+
+# 已有的统计信息同时输出到/metrics
+metrics.register_stats("xhs_cookie", lambda: cookie_minter.stats, counters=("launches", "refreshes", "shared"),
+                       gauges=("startup_seconds", "refresh_seconds"), description="Cookie获取")
+metrics.register_stats("xhs_trace_id", trace_id_buffer.stats, gauges=("buffered",), description="traceid缓冲区",
+                       counters=("hits", "misses", "refills", "generated", "expired"))
+metrics.register_stats("xhs_cache", response_cache.stats, gauges=("size",), description="响应缓存",
+                       counters=("hits", "misses", "disk_hits", "coalesced", "evictions"))
+metrics.register_stats("xhs_startup", startup_tracker.status, counters=("warmup_failures",), description="启动",
+                       gauges=("import_seconds", "warmup_seconds", "first_request_seconds", "ready"))
+metrics.register_stats("xhs_cassette", cassette_store.stats, counters=("recorded", "replayed", "misses"),
+                       gauges=("entries",), description="上游请求录制/回放")
+# 限流键已在RateLimiter.stats中脱敏（a1只保留前8位，代理去掉账号密码），不能换成原始的桶键
+metrics.register(lambda: [
+    (f"xhs_limiter_{field}", "gauge", "限流器当前速率（次/秒）、剩余退避秒数", {"key": key}, value[field])
+    for key, value in rate_limiter.stats().items() for field in ("rate", "backoff")
+])
+metrics.register(lambda: [
+    (f"xhs_proxy_{field}", "gauge", "代理池：延迟滑动平均（秒）、错误率、是否熔断",
+     {"id": proxy_id, "proxy": value["proxy"]},
+     float(value["state"] != "closed") if field == "open" else value[field] or 0)
+    for proxy_id, value in proxy_pool.stats().items() for field in ("latency", "error_rate", "open")
+])
 
 
 async def low_exception_handler(request: Request, exception: Exception):
@@ -21,4 +90,6 @@ async def low_exception_handler(request: Request, exception: Exception):
 
 
 # 全局异常处理
-app.add_exception_handler(exc_class_or_status_code=Exception, handler=low_exception_handler)
\ No newline at end of file
+app.add_exception_handler(exc_class_or_status_code=Exception, handler=low_exception_handler)
+
+startup_tracker.imported()
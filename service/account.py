@@ -0,0 +1,168 @@
+from fastapi import Header, HTTPException
+from service.database import SQLiteStore
+from typing import Optional
+from loguru import logger
+import secrets
+import sqlite3
+import json
+import time
+import os
+
+# 账号相关的错误码（登录失效、风控、频次异常），出现时该账号进入冷却
+ACCOUNT_ERROR_CODES: set = {-100, -101, -104, 300011, 300012, 300013, 300015}
+# 账号被限制时的HTTP状态码
+ACCOUNT_ERROR_STATUS: set = {429, 461, 471}
+# 管理接口的令牌（请求头X-Admin-Token），为空则禁用管理接口
+ADMIN_TOKEN: str = os.getenv("XHS_ADMIN_TOKEN", "")
+
+
+class AccountPool(SQLiteStore):
+    schema: tuple = ("""
+        CREATE TABLE IF NOT EXISTS accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL DEFAULT '',
+            cookies TEXT NOT NULL,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            score INTEGER NOT NULL DEFAULT 100,
+            fail_streak INTEGER NOT NULL DEFAULT 0,
+            cooldown_until REAL NOT NULL DEFAULT 0,
+            last_used REAL NOT NULL DEFAULT 0,
+            success_count INTEGER NOT NULL DEFAULT 0,
+            fail_count INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT NOT NULL DEFAULT ''
+        )
+    """,)
+
+    def __init__(self, path: str = "accounts.db", cooldown: float = 60, max_cooldown: float = 3600,
+                 score_penalty: float = 6) -> None:
+        """
+        多账号Cookie池，存储在SQLite中，多个uvicorn worker共用
+        :param path: SQLite文件路径
+        :param cooldown: 首次出错的冷却时间（秒），连续出错时翻倍
+        :param max_cooldown: 最长冷却时间（秒）
+        :param score_penalty: 选择账号时每少1分相当于晚使用多少秒（分数低的账号轮换得更少）
+        """
+        super().__init__(path)
+        self.cooldown: float = cooldown
+        self.max_cooldown: float = max_cooldown
+        self.score_penalty: float = score_penalty
+
+    def add(self, cookies: dict, name: str = "") -> int:
+        """
+        添加账号
+        :param cookies: cookie字典，至少包含a1
+        :param name: 账号备注
+        :return: 账号ID
+        """
+        if not cookies.get("a1"):
+            raise RuntimeError("cookie中缺少a1！")
+        cursor: sqlite3.Cursor = self._connect().execute(
+            "INSERT INTO accounts (name, cookies) VALUES (?, ?)", (name, json.dumps(cookies, ensure_ascii=False))
+        )
+        logger.info(f"【AccountPool】已添加账号：{cursor.lastrowid}（{name}）")
+        return cursor.lastrowid
+
+    def list_accounts(self) -> list:
+        """
+        列出所有账号（cookie只显示a1和web_session的前几位）
+        :return:
+        """
+        accounts: list = []
+        for row in self._connect().execute("SELECT * FROM accounts ORDER BY id"):
+            account: dict = dict(row)
+            cookies: dict = json.loads(account.pop("cookies"))
+            account["a1"] = cookies.get("a1", "")[:8] + "***"
+            account["web_session"] = bool(cookies.get("web_session"))
+            account["enabled"] = bool(account["enabled"])
+            accounts.append(account)
+        return accounts
+
+    def set_enabled(self, account_id: int, enabled: bool) -> None:
+        """
+        启用/禁用账号（启用时清除冷却状态）
+        :param account_id: 账号ID
+        :param enabled: 是否启用
+        :return:
+        """
+        cursor: sqlite3.Cursor = self._connect().execute(
+            "UPDATE accounts SET enabled = ?, fail_streak = 0, cooldown_until = 0 WHERE id = ?",
+            (int(enabled), account_id)
+        )
+        if not cursor.rowcount:
+            raise RuntimeError(f"账号不存在：{account_id}")
+
+    def acquire(self) -> Optional[dict]:
+        """
+        取出可用账号（已启用且不在冷却中）：按上次使用时间加扣分惩罚排序，分数低的账号被选中的间隔更长
+        选择和更新使用时间在同一条UPDATE语句中完成（单条语句本身是原子的，不需要显式事务）
+        :return: {"id": ..., "name": ..., "cookies": {...}}，没有可用账号返回None
+        """
+        if not self._initialized and not os.path.exists(self.path):
+            return None
+        now: float = time.time()
+        row: Optional[sqlite3.Row] = self._connect().execute(
+            "UPDATE accounts SET last_used = ? WHERE id = ("
+            "SELECT id FROM accounts WHERE enabled = 1 AND cooldown_until <= ? "
+            "ORDER BY last_used + (100 - score) * ? ASC LIMIT 1"
+            ") RETURNING id, name, cookies", (now, now, self.score_penalty)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row["id"], "name": row["name"], "cookies": json.loads(row["cookies"])}
+
+    def report(self, account_id: int, ok: bool, error: str = "") -> None:
+        """
+        上报账号请求结果：成功加分，出错扣分并按连续出错次数指数冷却
+        :param account_id: 账号ID
+        :param ok: 是否成功
+        :param error: 错误信息
+        :return:
+        """
+        conn: sqlite3.Connection = self._connect()
+        if ok:
+            conn.execute(
+                "UPDATE accounts SET score = MIN(100, score + 1), fail_streak = 0, success_count = success_count + 1 "
+                "WHERE id = ?", (account_id,)
+            )
+            return None
+        row: Optional[sqlite3.Row] = conn.execute("SELECT fail_streak FROM accounts WHERE id = ?",
+                                                  (account_id,)).fetchone()
+        if row is None:
+            return None
+        cooldown: float = min(self.max_cooldown, self.cooldown * 2 ** row["fail_streak"])
+        conn.execute(
+            "UPDATE accounts SET score = MAX(0, score - 10), fail_streak = fail_streak + 1, "
+            "fail_count = fail_count + 1, cooldown_until = ?, last_error = ? WHERE id = ?",
+            (time.time() + cooldown, error[:200], account_id)
+        )
+        logger.warning(f"【AccountPool】账号 {account_id} 出错，冷却 {cooldown:.0f} 秒：{error}")
+
+
+def check_account_response(status_code: int, result_json: dict) -> tuple:
+    """
+    判断响应是否说明账号出了问题（参数错误等与账号无关的失败不算）
+    :param status_code: HTTP状态码
+    :param result_json: 响应JSON
+    :return: (是否正常, 错误信息)
+    """
+    if status_code in ACCOUNT_ERROR_STATUS:
+        return False, f"HTTP {status_code}"
+    if isinstance(result_json, dict) and result_json.get("code") in ACCOUNT_ERROR_CODES:
+        return False, f"{result_json.get('code')}：{result_json.get('msg', '')}"
+    return True, ""
+
+
+def verify_admin_token(x_admin_token: Optional[str] = Header(default=None, description="管理令牌（XHS_ADMIN_TOKEN）")
+                       ) -> None:
+    """
+    校验管理接口的令牌（/admin路由的依赖）
+    :param x_admin_token: X-Admin-Token请求头
+    :return:
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="未设置环境变量XHS_ADMIN_TOKEN，管理接口已禁用！")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="管理令牌错误！")
+
+
+account_pool: AccountPool = AccountPool(path=os.getenv("XHS_ACCOUNTS_DB", "accounts.db"))
@@ -0,0 +1,205 @@
+from service.utils import parse_cookie, get_cookie_store
+from typing import Optional, TYPE_CHECKING
+from loguru import logger
+from pathlib import Path
+import threading
+import platform
+import time
+import os
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+if TYPE_CHECKING:  # DrissionPage导入较慢，只在启动浏览器时导入
+    from DrissionPage import Chromium
+
+
+class FileLock:
+    def __init__(self, path: str) -> None:
+        """
+        跨进程文件锁（多个uvicorn worker之间互斥）
+        :param path: 锁文件路径
+        """
+        self.path: str = path
+        self._file = None
+
+    def __enter__(self) -> "FileLock":
+        self._file = open(self.path, "a+")
+        if os.name == "nt":
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK重试10秒后仍失败会抛异常，继续等待
+                    continue
+        else:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args) -> None:
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class CookieMinter:
+    def __init__(self, browser_path: str = None, renew_interval: float = 0) -> None:
+        """
+        Cookie获取服务：常驻一个无头浏览器，刷新请求跨进程串行化，并发调用方共享同一次刷新结果
+        :param browser_path: 浏览器执行路径，为空则自动查找
+        :param renew_interval: Cookie文件超过该秒数未更新时后台主动刷新，0为不刷新
+        """
+        self.browser_path: Optional[str] = browser_path
+        self.renew_interval: float = renew_interval
+        self._browser_instance: Optional["Chromium"] = None
+        self._browser_options: tuple = (None, None)  # 常驻浏览器的(代理, 浏览器路径)
+        self._lock: threading.Lock = threading.Lock()
+        self._stopped: threading.Event = threading.Event()
+        self.stats: dict = {"launches": 0, "refreshes": 0, "shared": 0, "startup_seconds": 0.0,
+                            "refresh_seconds": 0.0}
+
+    def _launch(self, proxy: str = None, browser_path: str = None) -> "Chromium":
+        """
+        启动无头浏览器（找不到Chrome时尝试Brave）
+        :param proxy: 代理，示例：http://127.0.0.1:7897
+        :param browser_path: 浏览器执行路径，为空则自动查找
+        :return:
+        """
+        from DrissionPage import Chromium, ChromiumOptions
+        start: float = time.perf_counter()
+        options: ChromiumOptions = ChromiumOptions()
+        options.set_browser_path(browser_path or self.browser_path)
+        options.headless(True)
+        if proxy:
+            logger.warning(f"【DrissionPage】注意已使用代理：{proxy}")
+            options.set_proxy(proxy)
+        logger.info("【DrissionPage】启动无头浏览器...")
+        try:
+            browser: Chromium = Chromium(options)
+        except Exception:  # 找不到chrome，尝试使用brave-browser
+            logger.warning("【DrissionPage】未找到Chrome浏览器，尝试使用Brave浏览器...")
+            if platform.system() == "Linux":
+                options.set_browser_path("brave-browser")
+            elif platform.system() == "Windows":
+                options.set_browser_path(f"{str(Path.home())}/AppData/Local/BraveSoftware/Brave-Browser/Application/brave.exe")
+            browser = Chromium(options)
+        self.stats["launches"] += 1
+        self.stats["startup_seconds"] = time.perf_counter() - start
+        logger.info(f"【DrissionPage】无头浏览器启动完成，耗时 {self.stats['startup_seconds']:.2f}s")
+        return browser
+
+    def _browser(self, proxy: str = None, browser_path: str = None) -> "Chromium":
+        """
+        获取常驻浏览器（只常驻一个），已退出则重新启动，代理或浏览器路径变化时关闭后按新配置启动（调用方持有锁）
+        :param proxy: 代理
+        :param browser_path: 浏览器执行路径
+        :return:
+        """
+        browser: Optional["Chromium"] = self._browser_instance
+        if browser is not None:
+            if self._browser_options == (proxy, browser_path):
+                try:
+                    if browser.states.is_alive:
+                        return browser
+                except Exception:
+                    pass
+                logger.warning("【DrissionPage】常驻浏览器已退出，重新启动...")
+            else:
+                logger.info("【DrissionPage】代理或浏览器路径已变化，重新启动常驻浏览器...")
+                self._quit(browser)
+        self._browser_instance = None
+        browser = self._launch(proxy=proxy, browser_path=browser_path)
+        self._browser_instance, self._browser_options = browser, (proxy, browser_path)
+        return browser
+
+    @staticmethod
+    def _quit(browser: "Chromium") -> None:
+        """
+        关闭浏览器
+        :param browser: 浏览器
+        :return:
+        """
+        try:
+            browser.quit()
+        except Exception as e:
+            logger.warning(f"【DrissionPage】关闭浏览器失败：{e}")
+
+    def mint(self, proxy: str = None, cookies_path: str = "cookies.json", browser_path: str = None) -> dict:
+        """
+        获取新的Cookie并写入cookies.json；等锁期间如果其他线程/进程已刷新，直接返回其结果
+        :param proxy: 代理，示例：http://127.0.0.1:7897
+        :param cookies_path: cookies.json文件路径
+        :param browser_path: 浏览器执行路径，为空则自动查找
+        :return: cookie字典
+        """
+        requested_at: float = time.time()
+        with self._lock, FileLock(os.path.abspath(cookies_path) + ".lock"):
+            try:
+                refreshed: bool = os.path.getmtime(cookies_path) >= requested_at
+            except OSError:
+                refreshed = False
+            cookies: Optional[dict] = get_cookie_store(cookies_path).get() if refreshed else None
+            if cookies:
+                self.stats["shared"] += 1
+                logger.info("【DrissionPage】Cookie已被其他请求刷新，直接使用")
+                return cookies
+            start: float = time.perf_counter()
+            tab = self._browser(proxy=proxy, browser_path=browser_path).latest_tab
+            logger.info("【DrissionPage】访问小红书主页，获取Cookie...")
+            tab.get("https://www.xiaohongshu.com")
+            cookies = parse_cookie(tab.cookies())
+            get_cookie_store(cookies_path).save(cookies)
+            self.stats["refreshes"] += 1
+            self.stats["refresh_seconds"] = time.perf_counter() - start
+        logger.info(f"【DrissionPage】Cookie获取成功（耗时 {self.stats['refresh_seconds']:.2f}s）：{cookies}")
+        logger.info(f"【DrissionPage】Cookie已写入文件：{os.path.abspath(cookies_path)}")
+        return cookies
+
+    def start_renewal(self, cookies_path: str = "cookies.json", proxy: str = None, check_interval: float = 60) -> None:
+        """
+        后台主动刷新：Cookie文件超过renew_interval未更新时刷新（多进程下由文件锁保证只刷新一次）
+        :param cookies_path: cookies.json文件路径
+        :param proxy: 代理
+        :param check_interval: 检查间隔（秒）
+        :return:
+        """
+        if self.renew_interval <= 0:
+            return None
+        self._stopped.clear()
+
+        def renew_loop() -> None:
+            while not self._stopped.wait(check_interval):
+                try:
+                    if time.time() - os.path.getmtime(cookies_path) < self.renew_interval:
+                        continue
+                except OSError:
+                    pass
+                try:
+                    logger.info("【DrissionPage】Cookie即将过期，后台主动刷新...")
+                    self.mint(proxy=proxy, cookies_path=cookies_path)
+                except Exception as e:
+                    logger.error(f"【DrissionPage】后台刷新Cookie失败：{e}")
+
+        threading.Thread(target=renew_loop, daemon=True).start()
+
+    def close(self) -> None:
+        """
+        停止后台刷新并关闭常驻浏览器
+        :return:
+        """
+        self._stopped.set()
+        with self._lock:
+            browser, self._browser_instance = self._browser_instance, None
+        if browser is not None:
+            self._quit(browser)
+
+
+cookie_minter: CookieMinter = CookieMinter(renew_interval=float(os.getenv("XHS_COOKIE_RENEW_INTERVAL", "0")))
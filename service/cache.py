@@ -0,0 +1,296 @@
+from typing import Any, Awaitable, Callable, Optional
+from service.database import SQLiteStore
+from collections import OrderedDict
+from service.response import RawJSON
+from loguru import logger
+import functools
+import threading
+import inspect
+import asyncio
+import sqlite3
+import orjson
+import time
+import os
+
+# 各接口默认缓存时间（秒）
+DEFAULT_TTLS: dict = {
+    "get_note_by_id": 300,
+    "get_note_by_html": 300,
+    "get_user_notes": 60,
+    "get_comment_list": 30,
+    "get_sub_comment_list": 30
+}
+
+
+class DiskCache(SQLiteStore):
+    schema: tuple = ("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL, "
+                     "raw INTEGER NOT NULL DEFAULT 0)",)
+
+    def __init__(self, path: str) -> None:
+        """
+        SQLite磁盘缓存，多个uvicorn worker共用
+        :param path: SQLite文件路径
+        """
+        super().__init__(path, timeout=5)
+
+    def get(self, key: str) -> tuple:
+        """
+        读取缓存
+        :param key: 缓存键
+        :return: (是否命中, 值, 剩余秒数)
+        """
+        row: Optional[tuple] = self._connect().execute("SELECT value, expires, raw FROM cache WHERE key = ?",
+                                                       (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return False, None, 0
+        return True, RawJSON(row[0]) if row[2] else orjson.loads(row[0]), row[1] - time.time()
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """
+        写入缓存（顺带清理过期数据）
+        :param key: 缓存键
+        :param value: 值，需可JSON序列化（RawJSON原样存储）
+        :param ttl: 缓存时间（秒）
+        :return:
+        """
+        conn: sqlite3.Connection = self._connect()
+        now: float = time.time()
+        raw: bool = isinstance(value, RawJSON)
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires, raw) VALUES (?, ?, ?, ?)",
+                     (key, bytes(value) if raw else orjson.dumps(value), now + ttl, int(raw)))
+        if hash(key) % 100 == 0:
+            conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+
+
+class _Flight:
+    def __init__(self) -> None:
+        """
+        进行中的回源请求（同步调用方等待用）
+        """
+        self.event: threading.Event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = 1024, ttls: dict = None, disk_path: str = None) -> None:
+        """
+        接口响应缓存：内存LRU + 可选磁盘缓存，相同请求并发未命中时只回源一次
+        :param max_size: 内存中最多缓存的条数
+        :param ttls: 各接口缓存时间（秒），为0则不缓存
+        :param disk_path: 磁盘缓存SQLite文件路径，为空则只使用内存缓存
+        """
+        self.max_size: int = max_size
+        self.ttls: dict = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.disk: Optional[DiskCache] = DiskCache(disk_path) if disk_path else None
+        self._memory: OrderedDict = OrderedDict()  # key -> (过期时间, 值)
+        self._lock: threading.Lock = threading.Lock()
+        self._flights: dict = {}
+        self._async_flights: dict = {}
+        self._stats: dict = {"hits": 0, "misses": 0, "disk_hits": 0, "coalesced": 0, "evictions": 0}
+
+    def _get_memory(self, key: str) -> tuple:
+        """
+        读取内存缓存（调用方需持有锁）
+        :param key: 缓存键
+        :return: (是否命中, 值)
+        """
+        item: Optional[tuple] = self._memory.get(key)
+        if item is None:
+            return False, None
+        if item[0] <= time.monotonic():
+            del self._memory[key]
+            return False, None
+        self._memory.move_to_end(key)
+        return True, item[1]
+
+    def _set_memory(self, key: str, value: Any, ttl: float) -> None:
+        """
+        写入内存缓存，超出数量淘汰最久未使用的
+        :param key: 缓存键
+        :param value: 值
+        :param ttl: 缓存时间（秒）
+        :return:
+        """
+        with self._lock:
+            self._memory[key] = (time.monotonic() + ttl, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _load_disk(self, key: str) -> tuple:
+        """
+        读取磁盘缓存，命中则回填内存
+        :param key: 缓存键
+        :return: (是否命中, 值)
+        """
+        if self.disk is None:
+            return False, None
+        try:
+            hit, value, remaining = self.disk.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"【ResponseCache】读取磁盘缓存失败：{e}")
+            return False, None
+        if hit:
+            self._set_memory(key, value, remaining)
+            with self._lock:
+                self._stats["disk_hits"] += 1
+        return hit, value
+
+    def _store(self, key: str, value: Any, ttl: float) -> None:
+        """
+        写入内存和磁盘缓存（空结果不缓存，通常是接口报错）
+        :param key: 缓存键
+        :param value: 值
+        :param ttl: 缓存时间（秒）
+        :return:
+        """
+        if not value or (isinstance(value, RawJSON) and value in (b"{}", b"[]")):
+            return None
+        self._set_memory(key, value, ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, ttl)
+            except (sqlite3.Error, TypeError) as e:
+                logger.warning(f"【ResponseCache】写入磁盘缓存失败：{e}")
+
+    def get_or_load(self, endpoint: str, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        读取缓存，未命中则调用loader回源（同一key并发未命中只调用一次）
+        :param endpoint: 接口名称，用于确定缓存时间
+        :param key: 缓存键
+        :param loader: 回源函数
+        :return:
+        """
+        ttl: float = self.ttls.get(endpoint, 0)
+        if ttl <= 0:
+            return loader()
+        with self._lock:
+            hit, value = self._get_memory(key)
+            if hit:
+                self._stats["hits"] += 1
+                return value
+            flight: Optional[_Flight] = self._flights.get(key)
+            leader: bool = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            hit, value = self._load_disk(key)
+            if not hit:
+                value = loader()
+                self._store(key, value, ttl)
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    async def aget_or_load(self, endpoint: str, key: str, loader: Callable[[], Awaitable]) -> Any:
+        """
+        读取缓存，未命中则await loader()回源（同一key并发未命中只回源一次）
+        :param endpoint: 接口名称，用于确定缓存时间
+        :param key: 缓存键
+        :param loader: 返回协程的回源函数
+        :return:
+        """
+        ttl: float = self.ttls.get(endpoint, 0)
+        if ttl <= 0:
+            return await loader()
+        flight_key: tuple = (asyncio.get_running_loop(), key)
+        while True:
+            with self._lock:
+                hit, value = self._get_memory(key)
+                if hit:
+                    self._stats["hits"] += 1
+                    return value
+                future: Optional[asyncio.Future] = self._async_flights.get(flight_key)
+                leader: bool = future is None
+                if leader:
+                    future = self._async_flights[flight_key] = asyncio.get_running_loop().create_future()
+                    self._stats["misses"] += 1
+                else:
+                    self._stats["coalesced"] += 1
+            if leader:
+                break
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():  # 等待方自身被取消
+                    raise
+                # 回源的请求被取消（如客户端断开），不影响等待方：重新检查缓存，由其中一个等待方回源
+        try:
+            hit, value = await asyncio.to_thread(self._load_disk, key) if self.disk else (False, None)
+            if not hit:
+                value = await loader()
+                self._store(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 没有其他等待方时避免“exception was never retrieved”警告
+            raise
+        finally:
+            with self._lock:
+                self._async_flights.pop(flight_key, None)
+
+    def stats(self) -> dict:
+        """
+        缓存统计信息
+        :return: 命中、未命中、合并、淘汰次数等
+        """
+        with self._lock:
+            return dict(self._stats, size=len(self._memory), max_size=self.max_size, disk=bool(self.disk))
+
+    def clear(self) -> None:
+        """
+        清空内存缓存
+        :return:
+        """
+        with self._lock:
+            self._memory.clear()
+
+
+def cached(endpoint: str) -> Callable:
+    """
+    XhsLogic接口方法缓存装饰器，被装饰方法多一个use_cache参数（默认True）
+    :param endpoint: 接口名称，用于确定缓存时间
+    :return:
+    """
+    def decorator(func: Callable) -> Callable:
+        signature: inspect.Signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, use_cache: bool = True, **kwargs) -> Any:
+            cache: Optional[ResponseCache] = getattr(self, "cache", None)
+            if not use_cache or cache is None:
+                return func(self, *args, **kwargs)
+            bound: inspect.BoundArguments = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key: str = endpoint + ":" + orjson.dumps(list(bound.arguments.values())[1:]).decode()
+            if self.is_async:
+                return cache.aget_or_load(endpoint, key, lambda: func(self, *args, **kwargs))
+            return cache.get_or_load(endpoint, key, lambda: func(self, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+response_cache: ResponseCache = ResponseCache(
+    max_size=int(os.getenv("XHS_CACHE_SIZE", "1024")),
+    disk_path=os.getenv("XHS_CACHE_DISK") or None
+)
@@ -0,0 +1,188 @@
+from service.browser import FileLock
+from typing import Optional
+from loguru import logger
+import threading
+import hashlib
+import orjson
+import mmap
+import zlib
+import json
+import time
+import os
+
+# 录制/回放模式
+CASSETTE_MODES: tuple = ("off", "record", "replay")
+
+
+def cassette_key(method: str, endpoint: str, params: dict = None, data: dict = None) -> str:
+    """
+    请求的归一化键：请求方式、接口路径、按键排序的查询参数和JSON参数（与签名、Cookie、代理无关）
+    :param method: 请求方式
+    :param endpoint: 接口路径，例：/api/sns/web/v1/feed
+    :param params: GET查询参数
+    :param data: POST JSON参数
+    :return: 十六进制摘要
+    """
+    normalized: str = f"{method.upper()} {endpoint}?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    if data is not None:
+        normalized += "\n" + json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CassetteResponse:
+    def __init__(self, status_code: int, content: bytes, url: str) -> None:
+        """
+        回放的响应（只实现XhsLogic用到的属性）
+        :param status_code: 状态码
+        :param content: 响应体
+        :param url: 录制时的请求URL
+        """
+        self.status_code: int = status_code
+        self.content: bytes = content
+        self.url: str = url
+
+    def json(self) -> dict:
+        try:
+            return orjson.loads(self.content)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(str(e)) from e
+
+
+class CassetteStore:
+    def __init__(self, directory: str = "cassettes", mode: str = "off", compress_level: int = 6) -> None:
+        """
+        上游请求录制/回放：响应体追加写入responses.bin（zlib压缩），索引追加写入index.jsonl，
+        回放时索引全部加载为字典（O(1)查找），响应体从mmap中读取，不联网、不签名
+        :param directory: 存储目录
+        :param mode: off：关闭；record：请求小红书并录制；replay：只从录制中返回，未录制的请求报错
+        :param compress_level: zlib压缩级别
+        """
+        self.directory: str = directory
+        self.mode: str = "off"
+        self.compress_level: int = compress_level
+        self._index: dict = {}
+        self._data_file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._lock: threading.Lock = threading.Lock()
+        self._stats: dict = {"recorded": 0, "replayed": 0, "misses": 0}
+        self.configure(mode, directory)
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.directory, "responses.bin")
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, "index.jsonl")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def configure(self, mode: str, directory: str = None) -> None:
+        """
+        切换模式（进程启动时调用）
+        :param mode: off、record、replay
+        :param directory: 存储目录，为空则不变
+        :return:
+        """
+        mode = (mode or "off").lower()
+        if mode not in CASSETTE_MODES:
+            raise RuntimeError(f"录制模式错误：{mode}，可选：{'、'.join(CASSETTE_MODES)}")
+        self.close()
+        self.directory = directory or self.directory
+        self.mode = mode
+        if mode == "off":
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        if self.replaying:
+            self._load()
+        logger.info(f"【Cassette】{'录制' if self.recording else '回放'}模式：{os.path.abspath(self.directory)}"
+                    f"{f'（{len(self._index)} 条）' if self.replaying else ''}")
+
+    def _load(self) -> None:
+        """
+        加载索引（同一请求录制多次时以最后一次为准），映射响应体文件
+        :return:
+        """
+        if not os.path.exists(self.index_path) or not os.path.exists(self.data_path) or \
+                not os.path.getsize(self.data_path):  # 空文件无法映射
+            return None
+        self._data_file = open(self.data_path, "rb")
+        self._mmap = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        size: int = len(self._mmap)
+        with open(self.index_path, "rb") as f:
+            for line in f:
+                try:
+                    entry: dict = orjson.loads(line)
+                except orjson.JSONDecodeError:  # 录制中断时最后一行可能不完整
+                    continue
+                if entry["offset"] + entry["length"] <= size:
+                    self._index[entry["key"]] = (entry["offset"], entry["length"], entry["status"], entry["url"])
+
+    def record(self, method: str, endpoint: str, params: dict, data: Optional[dict], url: str, status_code: int,
+               content: bytes) -> None:
+        """
+        录制一次请求（多个worker同时录制时用文件锁互斥）
+        :param method: 请求方式
+        :param endpoint: 接口路径
+        :param params: GET查询参数
+        :param data: POST JSON参数
+        :param url: 实际请求的URL（含签名后的查询参数）
+        :param status_code: 状态码
+        :param content: 响应体
+        :return:
+        """
+        body: bytes = zlib.compress(content, self.compress_level)
+        entry: dict = {"key": cassette_key(method, endpoint, params, data), "method": method, "endpoint": endpoint,
+                       "url": url, "status": status_code, "length": len(body), "time": time.time()}
+        with self._lock, FileLock(os.path.abspath(self.data_path) + ".lock"):
+            with open(self.data_path, "ab") as f:
+                entry["offset"] = f.tell()
+                f.write(body)
+            with open(self.index_path, "ab") as f:
+                f.write(orjson.dumps(entry) + b"\n")
+            self._stats["recorded"] += 1
+
+    def replay(self, method: str, endpoint: str, params: dict = None, data: dict = None) -> CassetteResponse:
+        """
+        回放录制的响应
+        :param method: 请求方式
+        :param endpoint: 接口路径
+        :param params: GET查询参数
+        :param data: POST JSON参数
+        :return:
+        """
+        entry: Optional[tuple] = self._index.get(cassette_key(method, endpoint, params, data))
+        if entry is None:
+            self._stats["misses"] += 1
+            raise RuntimeError(f"【Cassette】未录制的请求：{method} {endpoint} {params or data or ''}")
+        offset, length, status_code, url = entry
+        self._stats["replayed"] += 1
+        return CassetteResponse(status_code, zlib.decompress(self._mmap[offset:offset + length]), url)
+
+    def stats(self) -> dict:
+        """
+        统计信息
+        :return:
+        """
+        return dict(self._stats, mode=self.mode, entries=len(self._index))
+
+    def close(self) -> None:
+        """
+        关闭映射的文件
+        :return:
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._data_file.close()
+        self._mmap, self._data_file = None, None
+        self._index = {}
+
+
+# 全局录制/回放存储（模式在service/__init__.py中按环境变量XHS_CASSETTE_MODE设置）
+cassette_store: CassetteStore = CassetteStore()
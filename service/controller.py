@@ -1,40 +1,102 @@
-from service.logic import XhsLogic, get_xhs_logic
-from fastapi.responses import ORJSONResponse
-from fastapi import Query, Depends, APIRouter
-from service.response import ResponseUtil, SUCCESS
+from service.logic import AsyncXhsLogic, get_async_xhs_logic, get_use_cache, get_projector
+from fastapi.responses import ORJSONResponse, StreamingResponse, PlainTextResponse
+from typing import AsyncIterator, Callable, Literal, Optional
+from fastapi import Body, Query, Depends, Response, APIRouter
+from service.account import account_pool, verify_admin_token
+from service.response import ResponseUtil, SUCCESS, FAIL
+from service.startup import startup_tracker
+from service.cache import response_cache
+from service.limiter import rate_limiter
+from pydantic import BaseModel, Field
+from service.proxy import proxy_pool
+from service.metrics import metrics
+import time
 
 
 router: APIRouter = APIRouter(prefix="")
 
 
+class NoteItem(BaseModel):
+    note_id: str = Field(description="笔记ID")
+    xsec_token: str = Field(description="xsec_token")
+    xsec_source: Optional[str] = Field(default=None, description="xsec_source，为空则使用接口默认值")
+
+
 @router.get("/send_phone_code", summary="发送手机验证码")
-def send_phone_code(phone: str, xhs_logic: XhsLogic = Depends(get_xhs_logic)) -> ORJSONResponse:
-    return ResponseUtil(*SUCCESS, data=xhs_logic.send_phone_code(phone)).success()
+async def send_phone_code(phone: str, xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic)) -> ORJSONResponse:
+    return ResponseUtil(*SUCCESS, data=await xhs_logic.send_phone_code(phone)).success()
 
 
 @router.get("/phone_login", summary="手机号登录（自动更新cookie.json）")
-def phone_login(phone: str, code: str, xhs_logic: XhsLogic = Depends(get_xhs_logic)) -> ORJSONResponse:
-    return ResponseUtil(*SUCCESS, data=xhs_logic.phone_login(phone, code)).success()
+async def phone_login(phone: str, code: str,
+                      xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic)) -> ORJSONResponse:
+    return ResponseUtil(*SUCCESS, data=await xhs_logic.phone_login(phone, code)).success()
 
 
 @router.get("/get_user_notes", summary="获取用户笔记列表",
             description="数据示例：{'cursor':'','has_more':false,notes:[]}")
-def get_user_notes(user_id: str, xsec_token: str, xsec_source: str = Query(default="pc_note"),
-                   cursor: str = Query(default="", description="游标，首页为''，后续用返回数据的cursor字段填充"),
-                   xhs_logic: XhsLogic = Depends(get_xhs_logic)) -> ORJSONResponse:
-    return ResponseUtil(*SUCCESS, data=xhs_logic.get_user_notes(user_id, xsec_token, xsec_source, cursor)).success()
+async def get_user_notes(user_id: str, xsec_token: str, xsec_source: str = Query(default="pc_note"),
+                         cursor: str = Query(default="", description="游标，首页为''，后续用返回数据的cursor字段填充"),
+                         raw: bool = Query(default=False, description="透传模式：小红书返回的data不经解析直接返回，响应更快"),
+                         xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                         use_cache: bool = Depends(get_use_cache),
+                         projector: Optional[Callable] = Depends(get_projector)) -> ORJSONResponse:
+    data: dict = await xhs_logic.get_user_notes(user_id, xsec_token, xsec_source, cursor, raw, use_cache=use_cache)
+    return ResponseUtil(*SUCCESS, data=data, projector=projector).success()
 
 
 @router.get("/get_note_by_id", summary="获取笔记详情")
-def get_note_by_id(note_id: str, xsec_token: str, xsec_source: str = Query(default="pc_user"),
-                   xhs_logic: XhsLogic = Depends(get_xhs_logic)) -> ORJSONResponse:
-    return ResponseUtil(*SUCCESS, data=xhs_logic.get_note_by_id(note_id, xsec_token, xsec_source)).success()
+async def get_note_by_id(note_id: str, xsec_token: str, xsec_source: str = Query(default="pc_user"),
+                         raw: bool = Query(default=False, description="透传模式：小红书返回的data不经解析直接返回，响应更快"),
+                         xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                         use_cache: bool = Depends(get_use_cache),
+                         projector: Optional[Callable] = Depends(get_projector)) -> ORJSONResponse:
+    data: dict = await xhs_logic.get_note_by_id(note_id, xsec_token, xsec_source, raw, use_cache=use_cache)
+    return ResponseUtil(*SUCCESS, data=data, projector=projector).success()
 
 
 @router.get("/get_note_by_html", summary="获取笔记详情（从手机端HTML中拿，无需Cookie，好像也不会风控）")
-def get_note_by_html(note_id: str, xsec_token: str, xsec_source: str = Query(default="pc_feed"),
-                     xhs_logic: XhsLogic = Depends(get_xhs_logic)) -> ORJSONResponse:
-    return ResponseUtil(*SUCCESS, data=xhs_logic.get_note_by_html(note_id, xsec_token, xsec_source)).success()
+async def get_note_by_html(note_id: str, xsec_token: str, xsec_source: str = Query(default="pc_feed"),
+                           xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                           use_cache: bool = Depends(get_use_cache),
+                           projector: Optional[Callable] = Depends(get_projector)) -> ORJSONResponse:
+    data: dict = await xhs_logic.get_note_by_html(note_id, xsec_token, xsec_source, use_cache=use_cache)
+    return ResponseUtil(*SUCCESS, data=data, projector=projector).success()
+
+
+@router.post("/batch/get_notes", summary="批量获取笔记详情（并发请求，单条失败不影响其他笔记）",
+             description="数据示例：{'results':[{'index':0,'note_id':'','ok':true,'data':{},'error':''}],"
+                         "'ok':1,'failed':0,'elapsed':0.0}；stream=true时以NDJSON按完成顺序逐条返回")
+async def batch_get_notes(items: list[NoteItem] = Body(embed=True, min_length=1, max_length=200),
+                          source: Literal["api", "html"] = Query(default="api",
+                                                                description="api：接口获取；html：从手机端HTML中获取"),
+                          concurrency: int = Query(default=8, ge=1, le=32, description="最大并发请求数"),
+                          stream: bool = Query(default=False, description="是否按完成顺序流式返回（NDJSON）"),
+                          xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                          use_cache: bool = Depends(get_use_cache),
+                          projector: Optional[Callable] = Depends(get_projector)) -> Response:
+    notes: list = [item.model_dump() for item in items]
+
+    def project_result(result: dict) -> dict:  # fields作用于每条笔记的data
+        if projector is None or not result["data"]:
+            return result
+        return dict(result, data=projector(result["data"]))
+
+    if stream:
+        summary: dict = {"items": 0, "ok": 0, "failed": 0}
+
+        async def records() -> AsyncIterator[dict]:
+            async for result in xhs_logic.iter_notes(notes, source, concurrency, use_cache):
+                summary["ok" if result["ok"] else "failed"] += 1
+                yield project_result(result)
+        return ResponseUtil.ndjson(records(), summary)
+    start: float = time.perf_counter()
+    results: list = [project_result(result) for result in await xhs_logic.get_notes(notes, source, concurrency,
+                                                                                     use_cache)]
+    ok: int = sum(result["ok"] for result in results)
+    data: dict = {"results": results, "ok": ok, "failed": len(results) - ok,
+                  "elapsed": round(time.perf_counter() - start, 3)}
+    return ResponseUtil(*SUCCESS, data=data).success()
 
 
 @router.get("/get_comment_list", summary="获取评论列表",
@@ -45,10 +107,14 @@ def get_note_by_html(note_id: str, xsec_token: str, xsec_source: str = Query(def
                         "'user_id':'6432b3eb000000001002a725',"
                         "'xsec_token':'ABTykFBOaHZH02_-StM7QSgOlQgI5vtdFrFUz4KUvhpJ0=',"
                         "comments:[]}")
-def get_comment_list(note_id: str, xsec_token: str,
-                     cursor: str = Query(default="", description="游标，首页为''，后续用返回数据的cursor字段填充"),
-                     xhs_logic: XhsLogic = Depends(get_xhs_logic)) -> ORJSONResponse:
-    return ResponseUtil(*SUCCESS, data=xhs_logic.get_comment_list(note_id, xsec_token, cursor)).success()
+async def get_comment_list(note_id: str, xsec_token: str,
+                           cursor: str = Query(default="", description="游标，首页为''，后续用返回数据的cursor字段填充"),
+                           raw: bool = Query(default=False, description="透传模式：小红书返回的data不经解析直接返回，响应更快"),
+                           xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                           use_cache: bool = Depends(get_use_cache),
+                           projector: Optional[Callable] = Depends(get_projector)) -> ORJSONResponse:
+    data: dict = await xhs_logic.get_comment_list(note_id, xsec_token, cursor, raw, use_cache=use_cache)
+    return ResponseUtil(*SUCCESS, data=data, projector=projector).success()
 
 
 @router.get("/get_sub_comment_list", summary="获取子评论列表",
@@ -59,8 +125,120 @@ def get_comment_list(note_id: str, xsec_token: str,
                         "'user_id':'6432b3eb000000001002a725',"
                         "'xsec_token':'ABTykFBOaHZH02_-StM7QSgOlQgI5vtdFrFUz4KUvhpJ0=',"
                         "comments:[]}")
-def get_sub_comment_list(note_id: str, comment_id: str, xsec_token: str,
-                        cursor: str = Query(default="", description="游标，首页为''，后续用返回数据的cursor字段填充"),
-                        xhs_logic: XhsLogic = Depends(get_xhs_logic)) -> ORJSONResponse:
-    params: list = [note_id, comment_id, xsec_token, cursor]
-    return ResponseUtil(*SUCCESS, data=xhs_logic.get_sub_comment_list(*params)).success()
\ No newline at end of file
+async def get_sub_comment_list(note_id: str, comment_id: str, xsec_token: str,
+                              cursor: str = Query(default="", description="游标，首页为''，后续用返回数据的cursor字段填充"),
+                              raw: bool = Query(default=False, description="透传模式：小红书返回的data不经解析直接返回，响应更快"),
+                              xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                              use_cache: bool = Depends(get_use_cache),
+                              projector: Optional[Callable] = Depends(get_projector)) -> ORJSONResponse:
+    params: list = [note_id, comment_id, xsec_token, cursor, raw]
+    data: dict = await xhs_logic.get_sub_comment_list(*params, use_cache=use_cache)
+    return ResponseUtil(*SUCCESS, data=data, projector=projector).success()
+
+
+@router.get("/get_comment_tree", summary="获取笔记完整评论树（并发补全所有子评论）",
+            description="数据示例：{'note_id':'','comments':[],'root_count':0,'sub_count':0,'root_pages':0,"
+                        "'sub_pages':0,'errors':[],'elapsed':0.0}")
+async def get_comment_tree(note_id: str, xsec_token: str,
+                           concurrency: int = Query(default=8, ge=1, le=32, description="最大并发请求数"),
+                           max_pages: int = Query(default=0, ge=0, description="根评论最多请求页数，0为不限"),
+                           xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                           use_cache: bool = Depends(get_use_cache),
+                           projector: Optional[Callable] = Depends(get_projector)) -> ORJSONResponse:
+    data: dict = await xhs_logic.get_comment_tree(note_id, xsec_token, concurrency, max_pages, use_cache)
+    return ResponseUtil(*SUCCESS, data=data, projector=projector).success()
+
+
+@router.get("/stream/user_notes", summary="流式获取用户全部笔记（NDJSON，每行一条笔记，最后一行为汇总）")
+async def stream_user_notes(user_id: str, xsec_token: str, xsec_source: str = Query(default="pc_note"),
+                            cursor: str = Query(default="", description="起始游标，首页为''"),
+                            max_pages: int = Query(default=0, ge=0, description="最多请求页数，0为不限"),
+                            max_items: int = Query(default=0, ge=0, description="最多返回条数，0为不限"),
+                            xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                            use_cache: bool = Depends(get_use_cache),
+                            projector: Optional[Callable] = Depends(get_projector)) -> StreamingResponse:
+    pages = xhs_logic.iter_user_notes(user_id, xsec_token, xsec_source, cursor, max_pages, max_items, use_cache)
+    return ResponseUtil.stream(pages, "notes", projector)
+
+
+@router.get("/stream/comment_list", summary="流式获取笔记全部评论（NDJSON，每行一条评论，最后一行为汇总）")
+async def stream_comment_list(note_id: str, xsec_token: str,
+                              cursor: str = Query(default="", description="起始游标，首页为''"),
+                              max_pages: int = Query(default=0, ge=0, description="最多请求页数，0为不限"),
+                              max_items: int = Query(default=0, ge=0, description="最多返回条数，0为不限"),
+                              xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                              use_cache: bool = Depends(get_use_cache),
+                              projector: Optional[Callable] = Depends(get_projector)) -> StreamingResponse:
+    pages = xhs_logic.iter_comments(note_id, xsec_token, cursor, max_pages, max_items, use_cache)
+    return ResponseUtil.stream(pages, "comments", projector)
+
+
+@router.get("/stream/sub_comment_list", summary="流式获取评论全部子评论（NDJSON，每行一条子评论，最后一行为汇总）")
+async def stream_sub_comment_list(note_id: str, comment_id: str, xsec_token: str,
+                                  cursor: str = Query(default="", description="起始游标，首页为''"),
+                                  max_pages: int = Query(default=0, ge=0, description="最多请求页数，0为不限"),
+                                  max_items: int = Query(default=0, ge=0, description="最多返回条数，0为不限"),
+                                  xhs_logic: AsyncXhsLogic = Depends(get_async_xhs_logic),
+                                  use_cache: bool = Depends(get_use_cache),
+                                  projector: Optional[Callable] = Depends(get_projector)) -> StreamingResponse:
+    pages = xhs_logic.iter_sub_comments(note_id, comment_id, xsec_token, cursor, max_pages, max_items, use_cache)
+    return ResponseUtil.stream(pages, "comments", projector)
+
+
+@router.get("/healthz", summary="存活探针（进程能响应请求即返回成功）")
+def healthz() -> ORJSONResponse:
+    return ResponseUtil(*SUCCESS, data=startup_tracker.status()).success()
+
+
+@router.get("/readyz", summary="就绪探针（签名预热完成前返回503）")
+def readyz() -> ORJSONResponse:
+    if not startup_tracker.ready.is_set():
+        return ResponseUtil(*FAIL, data=startup_tracker.status()).fail(status_code=503)
+    return ResponseUtil(*SUCCESS, data=startup_tracker.status()).success()
+
+
+@router.get("/cache/stats", summary="响应缓存统计（命中、未命中、合并、淘汰次数）")
+def cache_stats() -> ORJSONResponse:
+    return ResponseUtil(*SUCCESS, data=response_cache.stats()).success()
+
+
+@router.get("/limiter/stats", summary="限流器状态（各账号、代理当前速率和剩余退避时间）")
+def limiter_stats() -> ORJSONResponse:
+    return ResponseUtil(*SUCCESS, data=rate_limiter.stats()).success()
+
+
+@router.get("/proxy/stats", summary="代理池状态（各代理熔断状态、延迟和错误率滑动平均、绑定账号数）")
+def proxy_stats() -> ORJSONResponse:
+    return ResponseUtil(*SUCCESS, data=proxy_pool.stats()).success()
+
+
+@router.get("/metrics", summary="Prometheus指标（合并所有worker）", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/admin/accounts", summary="账号池：账号列表",
+             dependencies=[Depends(verify_admin_token)])
+def list_accounts() -> ORJSONResponse:
+    return ResponseUtil(*SUCCESS, data=account_pool.list_accounts()).success()
+
+
+@router.post("/admin/accounts", summary="账号池：添加账号",
+              dependencies=[Depends(verify_admin_token)])
+def add_account(cookies: dict = Body(description="cookie字典，至少包含a1"),
+                name: str = Body(default="", description="账号备注")) -> ORJSONResponse:
+    return ResponseUtil(*SUCCESS, data={"id": account_pool.add(cookies, name)}).success()
+
+
+@router.post("/admin/accounts/{account_id}/enable", summary="账号池：启用账号（同时清除冷却）",
+              dependencies=[Depends(verify_admin_token)])
+def enable_account(account_id: int) -> ORJSONResponse:
+    account_pool.set_enabled(account_id, True)
+    return ResponseUtil(*SUCCESS).success()
+
+
+@router.post("/admin/accounts/{account_id}/disable", summary="账号池：禁用账号",
+              dependencies=[Depends(verify_admin_token)])
+def disable_account(account_id: int) -> ORJSONResponse:
+    account_pool.set_enabled(account_id, False)
+    return ResponseUtil(*SUCCESS).success()
@@ -0,0 +1,36 @@
+from typing import Optional
+import threading
+import sqlite3
+
+
+class SQLiteStore:
+    # 建表、建索引语句，首次连接时执行
+    schema: tuple = ()
+
+    def __init__(self, path: str, timeout: float = 10) -> None:
+        """
+        SQLite存储基类：每个线程一个连接（WAL模式，自动提交），多个uvicorn worker、下载线程共用同一个文件
+        :param path: SQLite文件路径
+        :param timeout: 等待其他连接释放写锁的超时（秒）
+        """
+        self.path: str = path
+        self.timeout: float = timeout
+        self._local: threading.local = threading.local()
+        self._initialized: bool = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        获取当前线程的数据库连接（首次连接时建表）
+        :return:
+        """
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        if not self._initialized:
+            for statement in self.schema:
+                conn.execute(statement)
+            self._initialized = True
+        return conn
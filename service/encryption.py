@@ -1,17 +1,45 @@
+import os
 import json
 import math
 import random
-import execjs
+import functools
+from loguru import logger
+from service import signer
+from service.node_pool import NodePool
+from service.xray import trace_id_buffer
+from service.metrics import metrics
 
-try:
-    js = execjs.compile(open(r'../static/xhs_xs_xsc_56.js', 'r', encoding='utf-8').read())
-except:
-    js = execjs.compile(open(r'static/xhs_xs_xsc_56.js', 'r', encoding='utf-8').read())
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
 
-try:
-    xray_js = execjs.compile(open(r'../static/xhs_xray.js', 'r', encoding='utf-8').read())
-except:
-    xray_js = execjs.compile(open(r'static/xhs_xray.js', 'r', encoding='utf-8').read())
+# 签名引擎：native（纯Python实现，默认）、pool（常驻Node进程池）、execjs（每次调用启动新进程）
+SIGN_ENGINE = os.getenv("XHS_SIGN_ENGINE", "native")
+# 签名进程池，首次签名时启动，进程数默认为CPU核数
+sign_pool = NodePool(
+    script_path=os.path.join(STATIC_DIR, "xhs_xs_xsc_56.js"),
+    size=int(os.getenv("XHS_SIGN_WORKERS", "0")) or None
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_js():
+    """
+    编译签名脚本（execjs引擎，首次使用时才导入execjs并编译）
+    """
+    import execjs
+    with open(os.path.join(STATIC_DIR, "xhs_xs_xsc_56.js"), 'r', encoding='utf-8') as f:
+        return execjs.compile(f.read())
+
+
+def warm_up():
+    """
+    预热签名：按签名引擎启动Node进程池或编译脚本，并启动xray进程填充traceid缓冲区
+    """
+    if SIGN_ENGINE == "pool":
+        sign_pool.start()
+    elif SIGN_ENGINE == "execjs":
+        get_js()
+    generate_xs_xs_common("0" * 52, "/api/sns/web/v1/user_posted?num=30&cursor=", "", "GET")
+    trace_id_buffer.refill()
 
 def generate_x_b3_traceid(len=16):
     x_b3_traceid = ""
@@ -19,18 +47,30 @@ def generate_x_b3_traceid(len=16):
         x_b3_traceid += "abcdef0123456789"[math.floor(16 * random.random())]
     return x_b3_traceid
 
-def generate_xs_xs_common(a1, api, data='', method='POST'):
-    ret = js.call('get_request_headers_params', api, data, a1, method)
+def generate_xs_xs_common(a1, api, data='', method='POST', engine=None):
+    engine = engine or SIGN_ENGINE
+    if engine == "native":
+        try:
+            ret = signer.get_request_headers_params(api, data, a1, method)
+            return ret['xs'], ret['xt'], ret['xs_common']
+        except Exception as e:  # 纯Python实现异常时回退到JS签名
+            logger.warning(f"【签名】纯Python签名失败，回退到Node进程池：{e}")
+            engine = "pool"
+    if engine == "execjs":
+        ret = get_js().call('get_request_headers_params', api, data, a1, method)
+    else:
+        ret = sign_pool.call('get_request_headers_params', api, data, a1, method)
     xs, xt, xs_common = ret['xs'], ret['xt'], ret['xs_common']
     return xs, xt, xs_common
 
 def generate_xs(a1, api, data=''):
-    ret = js.call('get_xs', api, data, a1)
+    ret = get_js().call('get_xs', api, data, a1)
     xs, xt = ret['X-s'], ret['X-t']
     return xs, xt
 
 def generate_xray_traceid():
-    return xray_js.call('traceId')
+    with metrics.timer("xhs_stage_seconds", stage="xray"):
+        return trace_id_buffer.get()
 def get_common_headers():
     return {
         "authority": "www.xiaohongshu.com",
@@ -74,8 +114,8 @@ def get_request_headers_template():
         "x-xray-traceid": generate_xray_traceid()
     }
 
-def generate_headers(a1, api, data='', method='POST'):
-    xs, xt, xs_common = generate_xs_xs_common(a1, api, data, method)
+def generate_headers(a1, api, data='', method='POST', engine=None):
+    xs, xt, xs_common = generate_xs_xs_common(a1, api, data, method, engine)
     x_b3_traceid = generate_x_b3_traceid()
     headers = get_request_headers_template()
     headers['x-s'] = xs
@@ -0,0 +1,212 @@
+from service.metrics import mask_account, mask_proxy
+from collections import OrderedDict
+from itertools import islice
+from typing import Optional
+from loguru import logger
+import threading
+import asyncio
+import random
+import time
+import os
+
+# 限流、风控相关的HTTP状态码和错误码（300012：IP存在风险；300013：访问频次异常）
+THROTTLE_STATUS: set = {429, 461, 471}
+THROTTLE_CODES: set = {300012, 300013}
+
+
+class TokenBucket:
+    def __init__(self, rate: float = 2, burst: float = 5, min_rate: float = 0.2, max_rate: float = 10,
+                 increase: float = 0.1, decrease: float = 0.5, backoff: float = 2, max_backoff: float = 300) -> None:
+        """
+        自适应令牌桶：成功时速率线性增加，被限流时速率减半并指数退避（带随机抖动）
+        :param rate: 初始速率（次/秒）
+        :param burst: 桶容量（允许的突发请求数）
+        :param min_rate: 最低速率
+        :param max_rate: 最高速率
+        :param increase: 每次成功增加的速率
+        :param decrease: 被限流时速率乘以该系数
+        :param backoff: 首次被限流的退避时间（秒），连续被限流时翻倍
+        :param max_backoff: 最长退避时间（秒）
+        """
+        self.rate: float = rate
+        self.burst: float = burst
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.increase: float = increase
+        self.decrease: float = decrease
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        self.tokens: float = burst
+        self.updated: float = time.monotonic()
+        self.blocked_until: float = 0
+        self.streak: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        预占一个令牌
+        :return: 需要等待的秒数
+        """
+        with self._lock:
+            now: float = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait: float = -self.tokens / self.rate if self.tokens < 0 else 0
+            return max(wait, self.blocked_until - now)
+
+    def report(self, throttled: bool) -> float:
+        """
+        上报请求结果，调整速率
+        :param throttled: 是否被限流/风控
+        :return: 本次退避秒数（未被限流为0）
+        """
+        with self._lock:
+            if not throttled:
+                self.streak = 0
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                return 0
+            if time.monotonic() < self.blocked_until:  # 已在退避中（并发请求同时被限流），只计一次
+                return 0
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            delay: float = min(self.max_backoff, self.backoff * 2 ** self.streak) * random.uniform(0.5, 1)
+            self.streak += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.tokens = min(self.tokens, 0)
+            return delay
+
+
+class RateLimiter:
+    def __init__(self, max_buckets: int = 1024, **bucket_options) -> None:
+        """
+        按账号、代理分别限流（每个进程独立计数）
+        :param max_buckets: 最多保留的令牌桶数量（代理来自请求参数，需限制），超出时淘汰最久未使用的（优先不在退避中的）
+        :param bucket_options: TokenBucket参数
+        """
+        self.max_buckets: int = max_buckets
+        self.bucket_options: dict = bucket_options
+        self._buckets: OrderedDict = OrderedDict()  # (类型, 键) -> TokenBucket，按最近使用排序
+        self._lock: threading.Lock = threading.Lock()
+
+    def _bucket(self, key: tuple) -> TokenBucket:
+        """
+        获取（或创建）令牌桶
+        :param key: (类型, 键)，例：("account", a1)、("proxy", proxy)
+        :return:
+        """
+        with self._lock:
+            bucket: Optional[TokenBucket] = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets.move_to_end(key)
+                return bucket
+            bucket = self._buckets[key] = TokenBucket(**self.bucket_options)
+            if len(self._buckets) > self.max_buckets:
+                self._evict()
+            return bucket
+
+    def _evict(self) -> None:
+        """
+        淘汰最久未使用的令牌桶：跳过退避中的桶（淘汰后会丢失退避状态），都在退避中时淘汰最久未使用的（调用方持有锁）
+        :return:
+        """
+        now: float = time.monotonic()
+        for key, bucket in islice(self._buckets.items(), len(self._buckets) - 1):  # 不淘汰刚创建的桶
+            if bucket.blocked_until <= now:
+                break
+        else:
+            key = next(iter(self._buckets))
+        del self._buckets[key]
+
+    @staticmethod
+    def keys(account: Optional[str] = None, proxy: Optional[str] = None) -> list:
+        """
+        请求对应的限流键：有代理时按代理限流，有账号时按账号限流
+        不使用代理的请求不共用一个代理令牌桶（否则所有账号的直连请求都挤在同一个桶里），
+        只有既无账号又无代理的请求（如直连的HTML）才使用直连桶
+        :param account: 账号标识（a1）
+        :param proxy: 代理
+        :return:
+        """
+        keys: list = [("proxy", proxy)] if proxy else []
+        if account:
+            keys.append(("account", account))
+        return keys or [("proxy", "")]
+
+    def _reserve(self, keys: list) -> float:
+        """
+        在所有令牌桶中预占令牌
+        :param keys: 限流键列表
+        :return: 需要等待的秒数
+        """
+        return max(self._bucket(key).reserve() for key in keys)
+
+    def acquire(self, keys: list) -> None:
+        """
+        等待到允许发送请求
+        :param keys: 限流键列表
+        :return:
+        """
+        wait: float = self._reserve(keys)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def async_acquire(self, keys: list) -> None:
+        """
+        等待到允许发送请求（异步）
+        :param keys: 限流键列表
+        :return:
+        """
+        wait: float = self._reserve(keys)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report(self, keys: list, throttled: bool) -> None:
+        """
+        上报请求结果
+        :param keys: 限流键列表
+        :param throttled: 是否被限流/风控
+        :return:
+        """
+        for key in keys:
+            delay: float = self._bucket(key).report(throttled)
+            if delay:
+                logger.warning(f"【RateLimiter】{key[0]} 被限流，速率降至 {self._bucket(key).rate:.2f}/s，"
+                               f"退避 {delay:.1f} 秒")
+
+    def stats(self) -> dict:
+        """
+        各令牌桶当前速率和退避状态（不暴露完整a1和代理账号密码，只有账号密码不同的代理加序号区分）
+        :return:
+        """
+        now: float = time.monotonic()
+        stats: dict = {}
+        with self._lock:
+            buckets: list = list(self._buckets.items())
+        for (kind, key), bucket in buckets:
+            name: str = f"{kind}:{mask_account(key) if kind == 'account' else mask_proxy(key) or 'direct'}"
+            if name in stats:
+                name += f"#{sum(existing.split('#')[0] == name for existing in stats) + 1}"
+            stats[name] = {"rate": round(bucket.rate, 3), "backoff": round(max(0, bucket.blocked_until - now), 1)}
+        return stats
+
+
+def is_throttled(status_code: int, result_json: Optional[dict] = None, url: str = "") -> bool:
+    """
+    判断响应是否说明请求被限流或触发验证码
+    :param status_code: HTTP状态码
+    :param result_json: 响应JSON
+    :param url: 最终URL（被重定向到验证码页面时包含captcha）
+    :return:
+    """
+    if status_code in THROTTLE_STATUS or "captcha" in url:
+        return True
+    return isinstance(result_json, dict) and result_json.get("code") in THROTTLE_CODES
+
+
+rate_limiter: RateLimiter = RateLimiter(
+    rate=float(os.getenv("XHS_RATE", "2")),
+    burst=float(os.getenv("XHS_RATE_BURST", "5")),
+    min_rate=float(os.getenv("XHS_RATE_MIN", "0.2")),
+    max_rate=float(os.getenv("XHS_RATE_MAX", "10")),
+    max_buckets=int(os.getenv("XHS_RATE_BUCKETS", "1024"))
+)
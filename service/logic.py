@@ -1,49 +1,220 @@
-from service.utils import sign, refresh_cookie, format_json_dict, read_cookie, parse_note_html
-from curl_cffi import requests, Response
-from typing import Optional
-from fastapi import Query
+from service.utils import sign, async_sign, refresh_cookie, format_json_dict, parse_note_html
+from service.utils import CookieStore, get_cookie_store
+from service.session import SessionPool, AsyncSessionPool, session_pool, async_session_pool
+from service.account import AccountPool, account_pool, check_account_response
+from service.cache import ResponseCache, response_cache, cached
+from service.limiter import RateLimiter, rate_limiter, is_throttled
+from service.response import RawJSON
+from service.projection import compile_fields
+from service.sync import SyncState, note_order
+from service.metrics import metrics, mask_account, mask_proxy
+from service.cassette import CassetteStore, cassette_store
+from service.proxy import ProxyPool, proxy_pool, is_proxy_failure, PROXY_POOL
+from curl_cffi import Response
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from collections import OrderedDict
+from loguru import logger
+from typing import Any, Callable, Iterator, AsyncIterator, Optional
+from fastapi import Query, Header
+import threading
+import asyncio
 import json
+import time
+import os
+
+
+# 小红书接口、手机端笔记页面的地址（基准测试时指向本地模拟服务）
+BASE_HOST: str = os.getenv("XHS_BASE_HOST", "https://edith.xiaohongshu.com")
+HTML_HOST: str = os.getenv("XHS_HTML_HOST", "https://www.xiaohongshu.com")
+# 默认Cookie文件路径
+COOKIES_PATH: str = os.getenv("XHS_COOKIES_PATH", "cookies.json")
+# 手机端笔记页面请求头
+NOTE_HTML_HEADERS: dict = {
+    "user-agent": "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Mobile Safari/537.36"
+}
+# 笔记HTML请求在指标中的接口名（URL中含笔记ID，不直接作为标签）
+NOTE_HTML_ENDPOINT: str = "/discovery/item"
 
 
 class XhsLogic:
-    def __init__(self, proxy: str = None, cookies_path: str = "cookies.json") -> None:
+    is_async: bool = False
+
+    def __init__(self, proxy: str = None, cookies_path: str = COOKIES_PATH, pool: SessionPool = None,
+                 accounts: AccountPool = None, cache: ResponseCache = None, limiter: RateLimiter = None,
+                 cassette: CassetteStore = None, proxies: ProxyPool = None) -> None:
         """
-        XHS接口封装
-        :param proxy: 代理，示例：http://127.0.0.1:7897
-        :param cookies_path: Cookie文件路径
+        XHS接口封装，读接口结果带缓存（调用时传use_cache=False可跳过）
+        :param proxy: 代理，示例：http://127.0.0.1:7897，为pool时每次请求从代理池中选择
+        :param cookies_path: Cookie文件路径（账号池为空时使用）
+        :param pool: 会话池，为空则使用全局会话池
+        :param accounts: 账号池，为空则使用全局账号池
+        :param cache: 响应缓存，为空则使用全局响应缓存
+        :param limiter: 限流器，为空则使用全局限流器
+        :param cassette: 录制/回放存储，为空则使用全局存储
+        :param proxies: 代理池，为空则使用全局代理池
         """
         self.proxy: str = proxy
+        self.pool: SessionPool = pool or session_pool
+        self.accounts: AccountPool = accounts or account_pool
+        self.cache: ResponseCache = cache or response_cache
+        self.limiter: RateLimiter = limiter or rate_limiter
+        self.cassette: CassetteStore = cassette or cassette_store
+        self.proxies: ProxyPool = proxies or proxy_pool
         self.cookies_path: str = cookies_path
-        self.cookies: dict = read_cookie(path=cookies_path) or refresh_cookie(cookies_path=cookies_path,
-                                                                              proxy=self.proxy)
-        self.base_host: str = "https://edith.xiaohongshu.com"
+        self.cookie_store: CookieStore = get_cookie_store(cookies_path)
+        if not self.cookie_store.get() and not self.cassette.replaying:  # 回放不需要Cookie
+            refresh_cookie(cookies_path=cookies_path, proxy=self._pick_proxy(self.proxy))
+        self.base_host: str = BASE_HOST
+        self.html_host: str = HTML_HOST
+
+    @property
+    def cookies(self) -> dict:
+        """
+        当前Cookie（cookies.json变化时自动重新读取）
+        :return:
+        """
+        return self.cookie_store.get() or {}
+
+    def _build_request(self, method: str, uri: str, params: dict = None, data: dict = None,
+                       cookies: dict = None, sign_header: dict = None) -> tuple:
+        """
+        拼接请求URL和请求参数（同步、异步请求共用）
+        :param method: 请求方法GET或POST
+        :param uri: 请求接口
+        :param params: GET查询参数
+        :param data: POST JSON参数
+        :param cookies: cookie
+        :param sign_header: 签名请求头
+        :return: (url, 请求参数字典)
+        """
+        if method == "GET":
+            url: str = self.base_host + uri + "?" + "&".join([f"{k}={v}" for k, v in params.items()])
+            return url, dict(headers=sign_header, cookies=cookies, verify=False, quote=False)
+        sign_header.update({"Content-Type": "application/json"})
+        return self.base_host + uri, dict(data=json.dumps(data, separators=(",", ":"), ensure_ascii=False),
+                                          headers=sign_header, cookies=cookies)
 
     def _request(self, method: str, uri: str, params: dict = None, data: dict = None, cookies: dict = None,
-                 proxy: str = None) -> dict:
+                 proxy: str = None, raw: bool = False) -> dict:
         """
         内部请求封装
         :param method: 请求方法GET或POST
         :param uri: 请求接口
         :param params: GET查询参数
         :param data: POST JSON参数
-        :param cookies: 自定义cookie，为空则使用内置cookie
-        :param proxy: 代理，示例：http://127.0.0.1:7897
+        :param cookies: 自定义cookie，为空则从账号池中取，账号池为空则使用内置cookie
+        :param proxy: 代理，示例：http://127.0.0.1:7897，为空则使用实例代理
+        :param raw: 透传模式，data保留为原始JSON字节（RawJSON）
         :return: 返回JSON字典
         """
-        if method.upper() == "GET":
-            sign_header: dict = sign(cookies=cookies or self.cookies, uri=uri, params=params, method=method)
-            url: str = self.base_host + uri + "?" + "&".join([f"{k}={v}" for k, v in params.items()])
-            response: Response = requests.get(url, headers=sign_header, cookies=cookies or self.cookies, verify=False,
-                                              quote=False, proxy=proxy)
-        elif method.upper() == "POST":
-            sign_header: dict = sign(cookies=cookies or self.cookies, uri=uri, method=method, data=data)
-            sign_header.update({"Content-Type": "application/json"})
-            response: Response = requests.post(url=self.base_host + uri,
-                                               data=json.dumps(data, separators=(",", ":"), ensure_ascii=False),
-                                               headers=sign_header, cookies=cookies or self.cookies, proxy=proxy)
-        else:
+        method = method.upper()
+        if method not in ("GET", "POST"):
             raise RuntimeError("请求方法错误！")
-        return response.json()
+        if self.cassette.replaying:
+            return self._replay(method, uri, params, data, raw)
+        account: Optional[dict] = None if cookies else self.accounts.acquire()
+        cookies = cookies or (account or {}).get("cookies") or self.cookies
+        proxy = self._pick_proxy(proxy or self.proxy, cookies.get("a1"))
+        limit_keys: list = self.limiter.keys(cookies.get("a1"), proxy)
+        self.limiter.acquire(limit_keys)
+        with self.pool.session(proxy) as session:  # 限流和等待空闲会话之后再签名，避免x-t过期
+            sign_header: dict = sign(cookies=cookies, uri=uri, params=params, data=data, method=method)
+            url, kwargs = self._build_request(method, uri, params, data, cookies, sign_header)
+            start: float = time.perf_counter()
+            try:
+                response: Response = session.request(method, url, **kwargs)
+            except Exception as e:
+                self._record_upstream(uri, start, cookies.get("a1"), proxy, error=e)
+                raise
+        if self.cassette.recording:
+            self.cassette.record(method, uri, params, data, url, response.status_code, response.content)
+        result_json, ok, error = self._check_response(response, raw)
+        self._record_upstream(uri, start, cookies.get("a1"), proxy, response, result_json)
+        self.limiter.report(limit_keys, is_throttled(response.status_code, result_json))
+        if account:
+            self.accounts.report(account["id"], ok, error)
+        if result_json is None:
+            raise RuntimeError(f"响应解析失败：{error}")
+        return result_json
+
+    def _replay(self, method: str, uri: str, params: dict = None, data: dict = None, raw: bool = False) -> dict:
+        """
+        从录制中返回响应（不签名、不联网，同步、异步请求共用）
+        :param method: 请求方法GET或POST
+        :param uri: 请求接口
+        :param params: GET查询参数
+        :param data: POST JSON参数
+        :param raw: 透传模式
+        :return: 返回JSON字典
+        """
+        result_json, _, error = self._check_response(self.cassette.replay(method, uri, params, data), raw)
+        if result_json is None:
+            raise RuntimeError(f"响应解析失败：{error}")
+        return result_json
+
+    def _pick_proxy(self, proxy: Optional[str], account: Optional[str] = None) -> Optional[str]:
+        """
+        确定本次请求使用的代理
+        :param proxy: 代理，为pool时从代理池中选择
+        :param account: 账号标识（a1），代理池按账号固定代理
+        :return:
+        """
+        return self.proxies.select(account) if proxy == PROXY_POOL else proxy
+
+    def _record_upstream(self, endpoint: str, start: float, a1: Optional[str], proxy: Optional[str],
+                         response: Optional[Response] = None, result_json: Optional[dict] = None,
+                         error: Optional[Exception] = None) -> None:
+        """
+        记录请求小红书的耗时，按账号、代理统计状态码和业务code（或异常类型），并上报代理池
+        :param endpoint: 接口路径
+        :param start: 请求开始时间（perf_counter）
+        :param a1: 账号a1
+        :param proxy: 代理
+        :param response: 响应对象
+        :param result_json: 响应JSON
+        :param error: 请求异常
+        :return:
+        """
+        elapsed: float = time.perf_counter() - start
+        metrics.observe("xhs_stage_seconds", elapsed, stage="upstream")
+        self.proxies.report(proxy, error is None and not is_proxy_failure(response.status_code), elapsed)
+        labels: dict = dict(endpoint=endpoint, account=mask_account(a1), proxy=mask_proxy(proxy))
+        if error is not None:
+            metrics.inc("xhs_upstream_errors_total", error=type(error).__name__, **labels)
+            return None
+        code: Any = result_json.get("code", "") if isinstance(result_json, dict) else ""
+        metrics.inc("xhs_upstream_responses_total", status=response.status_code, code=code, **labels)
+
+    @staticmethod
+    def _check_response(response: Response, raw: bool = False) -> tuple:
+        """
+        解析响应并判断账号是否正常
+        :param response: 响应对象
+        :param raw: 透传模式，只解析data之前的字段，data保留为原始JSON字节（无法拆分时完整解析）
+        :return: (响应JSON，无法解析为None；账号是否正常；错误信息)
+        """
+        result_json: Optional[dict] = RawJSON.split(response.content) if raw else None
+        if result_json is not None:
+            ok, error = check_account_response(response.status_code, result_json)
+            return result_json, ok, error
+        try:
+            result_json = response.json()
+        except ValueError:
+            return None, response.status_code < 400, f"HTTP {response.status_code}"
+        ok, error = check_account_response(response.status_code, result_json)
+        return result_json, ok, error
+
+    def _request_data(self, method: str, uri: str, params: dict = None, data: dict = None, raw: bool = False) -> dict:
+        """
+        请求并返回data字段（AsyncXhsLogic中为协程，因此只拼参数的接口方法可直接复用）
+        :param method: 请求方法GET或POST
+        :param uri: 请求接口
+        :param params: GET查询参数
+        :param data: POST JSON参数
+        :param raw: 透传模式，返回RawJSON（无法拆分时仍为字典）
+        :return: data字典
+        """
+        return self._request(method=method, uri=uri, params=params, data=data, raw=raw).get("data", {})
 
     def set_web_session(self) -> None:
         """
@@ -51,10 +222,15 @@ class XhsLogic:
         :return:
         """
         uri: str = "/api/sns/web/v1/login/activate"
-        self._request(method="POST", uri=uri, data={})
-        # 写入cookies.json
-        with open(self.cookies_path, "w", encoding="utf-8") as f:
-            f.write(format_json_dict(self.cookies))
+        self._request(method="POST", uri=uri, data={}, cookies=self.cookies)
+        self._save_cookies()
+
+    def _save_cookies(self) -> None:
+        """
+        写入cookies.json（原子写入）
+        :return:
+        """
+        self.cookie_store.save(self.cookies)
 
     def send_phone_code(self, phone: str) -> dict:
         """
@@ -64,7 +240,7 @@ class XhsLogic:
         """
         uri: str = "/api/sns/web/v2/login/send_code"
         params: dict = {"phone": phone, "zone": "86", "type": "login"}
-        result_json: dict = self._request(method="GET", uri=uri, params=params)
+        result_json: dict = self._request(method="GET", uri=uri, params=params, cookies=self.cookies)
         if not result_json.get("success"):
             raise RuntimeError(format_json_dict(result_json))
         return result_json
@@ -79,26 +255,27 @@ class XhsLogic:
         # 检查验证码
         uri: str = "/api/sns/web/v1/login/check_code"
         params: dict = {"phone": phone, "zone": "86", "code": code}
-        result_json: dict = self._request(method="GET", uri=uri, params=params)
+        result_json: dict = self._request(method="GET", uri=uri, params=params, cookies=self.cookies)
         if not result_json.get("success"):
             raise RuntimeError(format_json_dict(result_json))
         # 登录
         mobile_token: str = result_json.get("data", {}).get("mobile_token", "")
         uri = "/api/sns/web/v1/login/code"
         data: dict = {"mobile_token": mobile_token, "zone": "86", "phone": phone}
-        result_json: dict = self._request(method="POST", uri=uri, data=data)
-        # 写入cookies.json
-        with open(self.cookies_path, "w", encoding="utf-8") as f:
-            f.write(format_json_dict(self.cookies))
+        result_json: dict = self._request(method="POST", uri=uri, data=data, cookies=self.cookies)
+        self._save_cookies()
         return result_json
 
-    def get_user_notes(self, user_id: str, xsec_token: str, xsec_source: str = "pc_note", cursor: str = "") -> dict:
+    @cached("get_user_notes")
+    def get_user_notes(self, user_id: str, xsec_token: str, xsec_source: str = "pc_note", cursor: str = "",
+                       raw: bool = False) -> dict:
         """
         获取用户笔记列表
         :param user_id: 用户ID
         :param xsec_token: xsec_token
         :param xsec_source: xsec_source
         :param cursor: 游标，首页为""
+        :param raw: 透传模式，返回RawJSON
         :return:
         """
         uri: str = "/api/sns/web/v1/user_posted"
@@ -110,15 +287,16 @@ class XhsLogic:
             "xsec_token": xsec_token,
             "xsec_source": xsec_source
         }
-        result_json: dict = self._request(method="GET", uri=uri, params=params)
-        return result_json.get("data", {})
+        return self._request_data(method="GET", uri=uri, params=params, raw=raw)
 
-    def get_note_by_id(self, note_id: str, xsec_token: str, xsec_source: str = "pc_user") -> dict:
+    @cached("get_note_by_id")
+    def get_note_by_id(self, note_id: str, xsec_token: str, xsec_source: str = "pc_user", raw: bool = False) -> dict:
         """
         获取笔记详情
         :param note_id: 笔记ID
         :param xsec_token: xsec_token
         :param xsec_source: xsec_source
+        :param raw: 透传模式，返回RawJSON
         :return:
         """
         data: dict = {
@@ -134,9 +312,30 @@ class XhsLogic:
             "xsec_source": xsec_source,
             "xsec_token": xsec_token
         }
-        result_json: dict = self._request(uri="/api/sns/web/v1/feed", data=data, method="POST")
-        return result_json.get("data", {})
+        return self._request_data(uri="/api/sns/web/v1/feed", data=data, method="POST", raw=raw)
+
+    def _note_html_url(self, note_id: str, xsec_token: str, xsec_source: str) -> str:
+        """
+        手机端笔记页面URL
+        :param note_id: 笔记ID
+        :param xsec_token: xsec_token
+        :param xsec_source: xsec_source
+        :return:
+        """
+        return f"{self.html_host}/discovery/item/{note_id}?xsec_token={xsec_token}&xsec_source={xsec_source}"
 
+    @staticmethod
+    def _note_html_cassette_args(note_id: str, xsec_token: str, xsec_source: str) -> tuple:
+        """
+        手机端笔记页面在录制/回放存储中的请求参数
+        :param note_id: 笔记ID
+        :param xsec_token: xsec_token
+        :param xsec_source: xsec_source
+        :return: (请求方式, 接口路径, 查询参数)
+        """
+        return "GET", f"{NOTE_HTML_ENDPOINT}/{note_id}", {"xsec_token": xsec_token, "xsec_source": xsec_source}
+
+    @cached("get_note_by_html")
     def get_note_by_html(self, note_id: str, xsec_token: str, xsec_source: str = "pc_feed") -> dict:
         """
         获取笔记详情（从HTML中拿，无需Cookie）
@@ -145,19 +344,35 @@ class XhsLogic:
         :param xsec_source: xsec_source
         :return:
         """
-        response: Response = requests.get(
-            proxy=self.proxy,
-            headers={"user-agent": "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Mobile Safari/537.36"},
-            url=f"https://www.xiaohongshu.com/discovery/item/{note_id}?xsec_token={xsec_token}&xsec_source={xsec_source}"
-        )
-        return parse_note_html(html=response.text)
+        cassette_args: tuple = self._note_html_cassette_args(note_id, xsec_token, xsec_source)
+        if self.cassette.replaying:
+            return parse_note_html(html=self.cassette.replay(*cassette_args).content)
+        proxy: Optional[str] = self._pick_proxy(self.proxy)
+        limit_keys: list = self.limiter.keys(proxy=proxy)
+        self.limiter.acquire(limit_keys)
+        with self.pool.session(proxy) as session:
+            start: float = time.perf_counter()
+            try:
+                response: Response = session.get(self._note_html_url(note_id, xsec_token, xsec_source),
+                                                 headers=NOTE_HTML_HEADERS)
+            except Exception as e:
+                self._record_upstream(NOTE_HTML_ENDPOINT, start, None, proxy, error=e)
+                raise
+        self._record_upstream(NOTE_HTML_ENDPOINT, start, None, proxy, response)
+        if self.cassette.recording:
+            self.cassette.record(*cassette_args, None, response.url, response.status_code, response.content)
+        self.limiter.report(limit_keys, is_throttled(response.status_code, url=response.url))
+        with metrics.timer("xhs_stage_seconds", stage="parse_html"):
+            return parse_note_html(html=response.content)
 
-    def get_comment_list(self, note_id: str, xsec_token: str, cursor: str = "") -> dict:
+    @cached("get_comment_list")
+    def get_comment_list(self, note_id: str, xsec_token: str, cursor: str = "", raw: bool = False) -> dict:
         """
         获取评论列表
         :param note_id: 笔记ID
         :param xsec_token: xsec_token
         :param cursor: 游标，首页为""
+        :param raw: 透传模式，返回RawJSON
         :return:
         """
         uri: str = "/api/sns/web/v2/comment/page"
@@ -168,16 +383,18 @@ class XhsLogic:
             "image_formats": "jpg,webp,avif",
             "xsec_token": xsec_token
         }
-        result_json: dict = self._request(method="GET", uri=uri, params=params)
-        return result_json.get("data", {})
+        return self._request_data(method="GET", uri=uri, params=params, raw=raw)
 
-    def get_sub_comment_list(self, note_id: str, comment_id: str, xsec_token: str, cursor: str = "") -> dict:
+    @cached("get_sub_comment_list")
+    def get_sub_comment_list(self, note_id: str, comment_id: str, xsec_token: str, cursor: str = "",
+                             raw: bool = False) -> dict:
         """
         获取子评论列表
         :param note_id: 笔记ID
         :param comment_id: 评论ID
         :param xsec_token: xsec_token
         :param cursor: 游标，首页为""
+        :param raw: 透传模式，返回RawJSON
         :return:
         """
         uri: str = "/api/sns/web/v2/comment/sub/page"
@@ -190,15 +407,672 @@ class XhsLogic:
             "top_comment_id": "",
             "xsec_token": xsec_token
         }
-        result_json: dict = self._request(method="GET", uri=uri, params=params)
-        return result_json.get("data", {})
+        return self._request_data(method="GET", uri=uri, params=params, raw=raw)
 
+    @staticmethod
+    def _iter_pages(fetch: Callable, items_key: str, cursor: str = "", max_pages: int = 0,
+                    max_items: int = 0) -> Iterator[dict]:
+        """
+        沿游标逐页请求（AsyncXhsLogic中为异步生成器，因此iter_*方法可直接复用）
+        :param fetch: 按游标请求一页的函数
+        :param items_key: 每页数据中列表字段名，例：notes、comments
+        :param cursor: 起始游标，首页为""
+        :param max_pages: 最多请求页数，0为不限
+        :param max_items: 最多返回条数，0为不限（超出部分从最后一页截掉）
+        :return: 每页data字典
+        """
+        pages: int = 0
+        items: int = 0
+        while True:
+            page: dict = fetch(cursor)
+            pages += 1
+            if max_items and items + len(page.get(items_key, [])) >= max_items:
+                page = dict(page, **{items_key: page.get(items_key, [])[:max_items - items]})  # 不修改缓存中的对象
+                yield page
+                return None
+            items += len(page.get(items_key, []))
+            yield page
+            next_cursor: str = page.get("cursor", "")
+            if not page.get("has_more") or not next_cursor or next_cursor == cursor or pages == max_pages:
+                return None
+            cursor = next_cursor
+
+    def iter_user_notes(self, user_id: str, xsec_token: str, xsec_source: str = "pc_note", cursor: str = "",
+                        max_pages: int = 0, max_items: int = 0, use_cache: bool = True) -> Iterator[dict]:
+        """
+        逐页获取用户全部笔记
+        :param user_id: 用户ID
+        :param xsec_token: xsec_token
+        :param xsec_source: xsec_source
+        :param cursor: 起始游标，首页为""
+        :param max_pages: 最多请求页数，0为不限
+        :param max_items: 最多返回条数，0为不限
+        :param use_cache: 是否使用响应缓存
+        :return: 每页data字典
+        """
+        return self._iter_pages(
+            lambda page_cursor: self.get_user_notes(user_id, xsec_token, xsec_source, page_cursor, use_cache=use_cache),
+            "notes", cursor, max_pages, max_items
+        )
+
+    def iter_comments(self, note_id: str, xsec_token: str, cursor: str = "", max_pages: int = 0, max_items: int = 0,
+                      use_cache: bool = True) -> Iterator[dict]:
+        """
+        逐页获取笔记全部评论
+        :param note_id: 笔记ID
+        :param xsec_token: xsec_token
+        :param cursor: 起始游标，首页为""
+        :param max_pages: 最多请求页数，0为不限
+        :param max_items: 最多返回条数，0为不限
+        :param use_cache: 是否使用响应缓存
+        :return: 每页data字典
+        """
+        return self._iter_pages(
+            lambda page_cursor: self.get_comment_list(note_id, xsec_token, page_cursor, use_cache=use_cache),
+            "comments", cursor, max_pages, max_items
+        )
+
+    def iter_sub_comments(self, note_id: str, comment_id: str, xsec_token: str, cursor: str = "", max_pages: int = 0,
+                          max_items: int = 0, use_cache: bool = True) -> Iterator[dict]:
+        """
+        逐页获取评论的全部子评论
+        :param note_id: 笔记ID
+        :param comment_id: 评论ID
+        :param xsec_token: xsec_token
+        :param cursor: 起始游标，首页为""
+        :param max_pages: 最多请求页数，0为不限
+        :param max_items: 最多返回条数，0为不限
+        :param use_cache: 是否使用响应缓存
+        :return: 每页data字典
+        """
+        return self._iter_pages(
+            lambda page_cursor: self.get_sub_comment_list(note_id, comment_id, xsec_token, page_cursor,
+                                                          use_cache=use_cache),
+            "comments", cursor, max_pages, max_items
+        )
+
+    @staticmethod
+    def _comment_tree_node(comment: dict) -> dict:
+        """
+        复制根评论，子评论列表单独一份（不修改缓存中的对象）
+        :param comment: 根评论
+        :return:
+        """
+        return dict(comment, sub_comments=list(comment.get("sub_comments") or []))
+
+    @staticmethod
+    def _comment_tree_result(note_id: str, comments: list, root_pages: int, sub_pages: int, errors: list,
+                             start: float) -> dict:
+        """
+        汇总评论树结果
+        :param note_id: 笔记ID
+        :param comments: 根评论列表（已填充全部子评论）
+        :param root_pages: 根评论请求页数
+        :param sub_pages: 子评论请求页数
+        :param errors: 子评论请求失败的根评论
+        :param start: 开始时间（perf_counter）
+        :return:
+        """
+        elapsed: float = time.perf_counter() - start
+        sub_count: int = sum(len(comment["sub_comments"]) for comment in comments)
+        logger.info(f"【XhsLogic】评论树 {note_id}：根评论 {len(comments)} 条，子评论 {sub_count} 条，"
+                    f"请求 {root_pages + sub_pages} 页，耗时 {elapsed:.2f}s")
+        return {
+            "note_id": note_id,
+            "comments": comments,
+            "root_count": len(comments),
+            "sub_count": sub_count,
+            "root_pages": root_pages,
+            "sub_pages": sub_pages,
+            "errors": errors,
+            "elapsed": round(elapsed, 3)
+        }
+
+    def get_comment_tree(self, note_id: str, xsec_token: str, concurrency: int = 8, max_pages: int = 0,
+                         use_cache: bool = True) -> dict:
+        """
+        获取笔记完整评论树：逐页请求根评论，同时并发翻页补全各根评论的子评论
+        :param note_id: 笔记ID
+        :param xsec_token: xsec_token
+        :param concurrency: 子评论最大并发数
+        :param max_pages: 根评论最多请求页数，0为不限
+        :param use_cache: 是否使用响应缓存
+        :return: {"comments": [根评论（sub_comments为全部子评论）], "errors": [...], "elapsed": 耗时秒数, ...}
+        """
+        start: float = time.perf_counter()
+        comments: list = []
+        errors: list = []
+
+        def expand(comment: dict) -> int:
+            pages: int = 0
+            try:
+                for page in self.iter_sub_comments(note_id, comment["id"], xsec_token,
+                                                   comment.get("sub_comment_cursor", ""), use_cache=use_cache):
+                    pages += 1
+                    comment["sub_comments"].extend(page.get("comments", []))
+            except Exception as e:
+                errors.append({"comment_id": comment["id"], "message": str(e)})
+            return pages
 
-def get_xhs_logic(proxy: Optional[str] = Query(default=None,
-                                               description="代理，示例：http://127.0.0.1:7897")) -> XhsLogic:
+        root_pages: int = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures: list[Future] = []
+            for page in self.iter_comments(note_id, xsec_token, max_pages=max_pages, use_cache=use_cache):
+                root_pages += 1
+                for comment in page.get("comments", []):
+                    comments.append(self._comment_tree_node(comment))
+                    if comment.get("sub_comment_has_more"):
+                        futures.append(executor.submit(expand, comments[-1]))
+            sub_pages: int = sum(future.result() for future in futures)
+        return self._comment_tree_result(note_id, comments, root_pages, sub_pages, errors, start)
+
+    def _fetch_batch_note(self, index: int, item: dict, source: str, use_cache: bool) -> dict:
+        """
+        批量获取中的单条笔记（异常不抛出，记录在结果中）
+        :param index: 在请求列表中的位置
+        :param item: {"note_id": ..., "xsec_token": ..., "xsec_source": ...（可选）}
+        :param source: api（接口）或html（手机端HTML）
+        :param use_cache: 是否使用响应缓存
+        :return: {"index": ..., "note_id": ..., "ok": ..., "data": ..., "error": ...}
+        """
+        fetch: Callable = self.get_note_by_html if source == "html" else self.get_note_by_id
+        kwargs: dict = {k: v for k, v in item.items() if k in ("note_id", "xsec_token", "xsec_source") and v}
+        try:
+            data: dict = fetch(**kwargs, use_cache=use_cache)
+        except Exception as e:
+            return {"index": index, "note_id": item.get("note_id"), "ok": False, "data": None, "error": str(e)}
+        return {"index": index, "note_id": item.get("note_id"), "ok": bool(data), "data": data,
+                "error": "" if data else "返回数据为空"}
+
+    def iter_notes(self, items: list, source: str = "api", concurrency: int = 8,
+                   use_cache: bool = True) -> Iterator[dict]:
+        """
+        并发批量获取笔记详情，按完成顺序返回（单条失败不影响其他笔记）
+        :param items: [{"note_id": ..., "xsec_token": ..., "xsec_source": ...（可选）}]
+        :param source: api（get_note_by_id）或html（get_note_by_html）
+        :param concurrency: 最大并发数
+        :param use_cache: 是否使用响应缓存
+        :return: 每条笔记的结果，index为在items中的位置
+        """
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures: list[Future] = [executor.submit(self._fetch_batch_note, index, item, source, use_cache)
+                                     for index, item in enumerate(items)]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def get_notes(self, items: list, source: str = "api", concurrency: int = 8, use_cache: bool = True) -> list:
+        """
+        并发批量获取笔记详情，按items顺序返回
+        :param items: [{"note_id": ..., "xsec_token": ..., "xsec_source": ...（可选）}]
+        :param source: api（get_note_by_id）或html（get_note_by_html）
+        :param concurrency: 最大并发数
+        :param use_cache: 是否使用响应缓存
+        :return: 每条笔记的结果
+        """
+        return sorted(self.iter_notes(items, source, concurrency, use_cache), key=lambda result: result["index"])
+
+    @staticmethod
+    def _sync_page(result: dict, page: dict) -> bool:
+        """
+        处理增量同步的一页笔记：收集比高水位新的笔记（置顶笔记不按时间排序，只收集不作为停止条件）
+        :param result: 同步结果，原地更新
+        :param page: 用户笔记列表的一页
+        :return: 是否已到达已同步过的笔记（无需继续翻页）
+        """
+        result["pages"] += 1
+        for note in page.get("notes", []):
+            order: tuple = note_order(note.get("note_id", ""))
+            if order > note_order(result["newest"] or ""):
+                result["newest"] = note.get("note_id")
+            if not result["since"] or order > note_order(result["since"]):
+                result["notes"].append(note)
+            elif not (note.get("interact_info") or {}).get("sticky"):
+                result["complete"] = True
+                return True
+        result["complete"] = not page.get("has_more")
+        return False
+
+    @staticmethod
+    def _sync_result(user_id: str, since: Optional[str], state: Optional[SyncState]) -> dict:
+        """
+        初始化增量同步结果
+        :param user_id: 用户ID
+        :param since: 高水位笔记ID
+        :param state: 高水位存储
+        :return:
+        """
+        if since is None and state is not None:
+            since = (state.get(user_id) or {}).get("note_id")
+        return {"user_id": user_id, "since": since, "newest": since, "notes": [], "pages": 0, "reached": False,
+                "complete": False}
+
+    @staticmethod
+    def _sync_finish(result: dict, state: Optional[SyncState]) -> dict:
+        """
+        完成增量同步：新笔记按发布时间从新到旧排序，保存高水位
+        只有到达已同步的笔记或翻完所有页时才保存，因max_pages提前停止时保留原高水位，否则中间未翻到的笔记下次不会再同步
+        :param result: 同步结果
+        :param state: 高水位存储，为空则不保存
+        :return:
+        """
+        result["notes"].sort(key=lambda note: note_order(note.get("note_id", "")), reverse=True)
+        if state is not None and result["newest"]:
+            if result["complete"]:
+                state.set(result["user_id"], result["newest"])
+            else:
+                logger.warning(f"【XhsLogic】增量同步 {result['user_id']} 未翻到上次同步的位置，本次不更新同步位置")
+        logger.info(f"【XhsLogic】增量同步 {result['user_id']}：新笔记 {len(result['notes'])} 篇，"
+                    f"请求 {result['pages']} 页")
+        return result
+
+    def sync_user_notes(self, user_id: str, xsec_token: str, xsec_source: str = "pc_note", since: Optional[str] = None,
+                        state: Optional[SyncState] = None, max_pages: int = 0, use_cache: bool = False) -> dict:
+        """
+        增量同步用户笔记：从第一页开始翻页，遇到已同步过的笔记即停止，请求页数只与新笔记数量有关
+        :param user_id: 用户ID
+        :param xsec_token: xsec_token
+        :param xsec_source: xsec_source
+        :param since: 上次同步到的最新笔记ID，为空则从state读取，都为空则全量获取
+        :param state: 高水位存储，传入则读取并在同步后保存最新笔记ID
+        :param max_pages: 最多请求页数，0为不限
+        :param use_cache: 是否使用响应缓存（同步需要最新数据，默认不使用）
+        :return: {"user_id", "since", "newest": 最新笔记ID, "notes": [新笔记（从新到旧）], "pages": 请求页数,
+                 "reached": 是否到达已同步的笔记, "complete": 是否已同步完整（到达已同步的笔记或翻完所有页）}
+        """
+        result: dict = self._sync_result(user_id, since, state)
+        for page in self.iter_user_notes(user_id, xsec_token, xsec_source, max_pages=max_pages, use_cache=use_cache):
+            if self._sync_page(result, page):
+                result["reached"] = True
+                break
+        return self._sync_finish(result, state)
+
+
+class AsyncXhsLogic(XhsLogic):
+    is_async: bool = True
+
+    def __init__(self, proxy: str = None, cookies_path: str = COOKIES_PATH, pool: AsyncSessionPool = None,
+                 accounts: AccountPool = None, cache: ResponseCache = None, limiter: RateLimiter = None,
+                 cassette: CassetteStore = None, proxies: ProxyPool = None) -> None:
+        """
+        XHS接口封装（异步版），接口方法均需await调用
+        get_user_notes等只拼接参数的方法直接复用父类实现，返回_request_data的协程
+        :param proxy: 代理，示例：http://127.0.0.1:7897，为pool时每次请求从代理池中选择
+        :param cookies_path: Cookie文件路径（账号池为空时使用）
+        :param pool: 异步会话池，为空则使用全局异步会话池
+        :param accounts: 账号池，为空则使用全局账号池
+        :param cache: 响应缓存，为空则使用全局响应缓存
+        :param limiter: 限流器，为空则使用全局限流器
+        :param cassette: 录制/回放存储，为空则使用全局存储
+        :param proxies: 代理池，为空则使用全局代理池
+        """
+        super().__init__(proxy=proxy, cookies_path=cookies_path, accounts=accounts, cache=cache, limiter=limiter,
+                         cassette=cassette, proxies=proxies)
+        self.async_pool: AsyncSessionPool = pool or async_session_pool
+
+    async def _request(self, method: str, uri: str, params: dict = None, data: dict = None, cookies: dict = None,
+                       proxy: str = None, raw: bool = False) -> dict:
+        """
+        内部请求封装
+        :param method: 请求方法GET或POST
+        :param uri: 请求接口
+        :param params: GET查询参数
+        :param data: POST JSON参数
+        :param cookies: 自定义cookie，为空则从账号池中取，账号池为空则使用内置cookie
+        :param proxy: 代理，示例：http://127.0.0.1:7897，为空则使用实例代理
+        :param raw: 透传模式，data保留为原始JSON字节（RawJSON）
+        :return: 返回JSON字典
+        """
+        method = method.upper()
+        if method not in ("GET", "POST"):
+            raise RuntimeError("请求方法错误！")
+        if self.cassette.replaying:
+            return self._replay(method, uri, params, data, raw)
+        account: Optional[dict] = None if cookies else await asyncio.to_thread(self.accounts.acquire)
+        cookies = cookies or (account or {}).get("cookies") or self.cookies
+        proxy = self._pick_proxy(proxy or self.proxy, cookies.get("a1"))
+        limit_keys: list = self.limiter.keys(cookies.get("a1"), proxy)
+        await self.limiter.async_acquire(limit_keys)
+        # 限流等待之后再签名，避免等待期间x-t过期
+        sign_header: dict = await async_sign(cookies=cookies, uri=uri, params=params, data=data, method=method)
+        url, kwargs = self._build_request(method, uri, params, data, cookies, sign_header)
+        start: float = time.perf_counter()
+        try:
+            response: Response = await self.async_pool.session(proxy).request(method, url, **kwargs)
+        except Exception as e:
+            self._record_upstream(uri, start, cookies.get("a1"), proxy, error=e)
+            raise
+        if self.cassette.recording:
+            await asyncio.to_thread(self.cassette.record, method, uri, params, data, url, response.status_code,
+                                    response.content)
+        result_json, ok, error = self._check_response(response, raw)
+        self._record_upstream(uri, start, cookies.get("a1"), proxy, response, result_json)
+        self.limiter.report(limit_keys, is_throttled(response.status_code, result_json))
+        if account:
+            await asyncio.to_thread(self.accounts.report, account["id"], ok, error)
+        if result_json is None:
+            raise RuntimeError(f"响应解析失败：{error}")
+        return result_json
+
+    async def _request_data(self, method: str, uri: str, params: dict = None, data: dict = None,
+                            raw: bool = False) -> dict:
+        """
+        请求并返回data字段
+        :param method: 请求方法GET或POST
+        :param uri: 请求接口
+        :param params: GET查询参数
+        :param data: POST JSON参数
+        :param raw: 透传模式，返回RawJSON（无法拆分时仍为字典）
+        :return: data字典
+        """
+        return (await self._request(method=method, uri=uri, params=params, data=data, raw=raw)).get("data", {})
+
+    async def set_web_session(self) -> None:
+        """
+        请求设置web_session到cookie
+        :return:
+        """
+        await self._request(method="POST", uri="/api/sns/web/v1/login/activate", data={}, cookies=self.cookies)
+        self._save_cookies()
+
+    async def send_phone_code(self, phone: str) -> dict:
+        """
+        发送手机验证码
+        :param phone: 手机号
+        :return:
+        """
+        uri: str = "/api/sns/web/v2/login/send_code"
+        params: dict = {"phone": phone, "zone": "86", "type": "login"}
+        result_json: dict = await self._request(method="GET", uri=uri, params=params, cookies=self.cookies)
+        if not result_json.get("success"):
+            raise RuntimeError(format_json_dict(result_json))
+        return result_json
+
+    async def phone_login(self, phone: str, code: str) -> dict:
+        """
+        手机号登录（会写入cookies.json）
+        :param phone: 手机号
+        :param code: 验证码
+        :return:
+        """
+        # 检查验证码
+        uri: str = "/api/sns/web/v1/login/check_code"
+        params: dict = {"phone": phone, "zone": "86", "code": code}
+        result_json: dict = await self._request(method="GET", uri=uri, params=params, cookies=self.cookies)
+        if not result_json.get("success"):
+            raise RuntimeError(format_json_dict(result_json))
+        # 登录
+        mobile_token: str = result_json.get("data", {}).get("mobile_token", "")
+        uri = "/api/sns/web/v1/login/code"
+        data: dict = {"mobile_token": mobile_token, "zone": "86", "phone": phone}
+        result_json: dict = await self._request(method="POST", uri=uri, data=data, cookies=self.cookies)
+        self._save_cookies()
+        return result_json
+
+    @cached("get_note_by_html")
+    async def get_note_by_html(self, note_id: str, xsec_token: str, xsec_source: str = "pc_feed") -> dict:
+        """
+        获取笔记详情（从HTML中拿，无需Cookie）
+        :param note_id: 笔记ID
+        :param xsec_token: xsec_token
+        :param xsec_source: xsec_source
+        :return:
+        """
+        cassette_args: tuple = self._note_html_cassette_args(note_id, xsec_token, xsec_source)
+        if self.cassette.replaying:
+            return parse_note_html(html=self.cassette.replay(*cassette_args).content)
+        proxy: Optional[str] = self._pick_proxy(self.proxy)
+        limit_keys: list = self.limiter.keys(proxy=proxy)
+        await self.limiter.async_acquire(limit_keys)
+        start: float = time.perf_counter()
+        try:
+            response: Response = await self.async_pool.session(proxy).get(
+                self._note_html_url(note_id, xsec_token, xsec_source), headers=NOTE_HTML_HEADERS
+            )
+        except Exception as e:
+            self._record_upstream(NOTE_HTML_ENDPOINT, start, None, proxy, error=e)
+            raise
+        self._record_upstream(NOTE_HTML_ENDPOINT, start, None, proxy, response)
+        if self.cassette.recording:
+            await asyncio.to_thread(self.cassette.record, *cassette_args, None, response.url, response.status_code,
+                                    response.content)
+        self.limiter.report(limit_keys, is_throttled(response.status_code, url=response.url))
+        with metrics.timer("xhs_stage_seconds", stage="parse_html"):
+            return parse_note_html(html=response.content)
+
+    @staticmethod
+    async def _iter_pages(fetch: Callable, items_key: str, cursor: str = "", max_pages: int = 0,
+                          max_items: int = 0) -> AsyncIterator[dict]:
+        """
+        沿游标逐页请求，消费方取走上一页后才请求下一页
+        :param fetch: 按游标请求一页的函数（返回协程）
+        :param items_key: 每页数据中列表字段名，例：notes、comments
+        :param cursor: 起始游标，首页为""
+        :param max_pages: 最多请求页数，0为不限
+        :param max_items: 最多返回条数，0为不限（超出部分从最后一页截掉）
+        :return: 每页data字典
+        """
+        pages: int = 0
+        items: int = 0
+        while True:
+            page: dict = await fetch(cursor)
+            pages += 1
+            if max_items and items + len(page.get(items_key, [])) >= max_items:
+                page = dict(page, **{items_key: page.get(items_key, [])[:max_items - items]})  # 不修改缓存中的对象
+                yield page
+                return
+            items += len(page.get(items_key, []))
+            yield page
+            next_cursor: str = page.get("cursor", "")
+            if not page.get("has_more") or not next_cursor or next_cursor == cursor or pages == max_pages:
+                return
+            cursor = next_cursor
+
+    async def get_comment_tree(self, note_id: str, xsec_token: str, concurrency: int = 8, max_pages: int = 0,
+                               use_cache: bool = True) -> dict:
+        """
+        获取笔记完整评论树：逐页请求根评论，同时并发翻页补全各根评论的子评论
+        :param note_id: 笔记ID
+        :param xsec_token: xsec_token
+        :param concurrency: 最大并发请求数
+        :param max_pages: 根评论最多请求页数，0为不限
+        :param use_cache: 是否使用响应缓存
+        :return: {"comments": [根评论（sub_comments为全部子评论）], "errors": [...], "elapsed": 耗时秒数, ...}
+        """
+        start: float = time.perf_counter()
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+        comments: list = []
+        errors: list = []
+
+        async def fetch_root(cursor: str) -> dict:
+            async with semaphore:
+                return await self.get_comment_list(note_id, xsec_token, cursor, use_cache=use_cache)
+
+        async def expand(comment: dict) -> int:
+            async def fetch_sub(cursor: str) -> dict:
+                async with semaphore:
+                    return await self.get_sub_comment_list(note_id, comment["id"], xsec_token, cursor,
+                                                           use_cache=use_cache)
+            pages: int = 0
+            try:
+                async for page in self._iter_pages(fetch_sub, "comments", comment.get("sub_comment_cursor", "")):
+                    pages += 1
+                    comment["sub_comments"].extend(page.get("comments", []))
+            except Exception as e:
+                errors.append({"comment_id": comment["id"], "message": str(e)})
+            return pages
+
+        root_pages: int = 0
+        tasks: list[asyncio.Task] = []
+        try:
+            async for page in self._iter_pages(fetch_root, "comments", max_pages=max_pages):
+                root_pages += 1
+                for comment in page.get("comments", []):
+                    comments.append(self._comment_tree_node(comment))
+                    if comment.get("sub_comment_has_more"):
+                        tasks.append(asyncio.create_task(expand(comments[-1])))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        sub_pages: int = sum(await asyncio.gather(*tasks))
+        return self._comment_tree_result(note_id, comments, root_pages, sub_pages, errors, start)
+
+    async def _fetch_batch_note(self, index: int, item: dict, source: str, use_cache: bool) -> dict:
+        """
+        批量获取中的单条笔记（异常不抛出，记录在结果中）
+        :param index: 在请求列表中的位置
+        :param item: {"note_id": ..., "xsec_token": ..., "xsec_source": ...（可选）}
+        :param source: api（接口）或html（手机端HTML）
+        :param use_cache: 是否使用响应缓存
+        :return: {"index": ..., "note_id": ..., "ok": ..., "data": ..., "error": ...}
+        """
+        fetch: Callable = self.get_note_by_html if source == "html" else self.get_note_by_id
+        kwargs: dict = {k: v for k, v in item.items() if k in ("note_id", "xsec_token", "xsec_source") and v}
+        try:
+            data: dict = await fetch(**kwargs, use_cache=use_cache)
+        except Exception as e:
+            return {"index": index, "note_id": item.get("note_id"), "ok": False, "data": None, "error": str(e)}
+        return {"index": index, "note_id": item.get("note_id"), "ok": bool(data), "data": data,
+                "error": "" if data else "返回数据为空"}
+
+    async def iter_notes(self, items: list, source: str = "api", concurrency: int = 8,
+                         use_cache: bool = True) -> AsyncIterator[dict]:
+        """
+        并发批量获取笔记详情，按完成顺序返回（单条失败不影响其他笔记）
+        :param items: [{"note_id": ..., "xsec_token": ..., "xsec_source": ...（可选）}]
+        :param source: api（get_note_by_id）或html（get_note_by_html）
+        :param concurrency: 最大并发数
+        :param use_cache: 是否使用响应缓存
+        :return: 每条笔记的结果，index为在items中的位置
+        """
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(index: int, item: dict) -> dict:
+            async with semaphore:
+                return await self._fetch_batch_note(index, item, source, use_cache)
+
+        tasks: list[asyncio.Task] = [asyncio.create_task(fetch(index, item)) for index, item in enumerate(items)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_notes(self, items: list, source: str = "api", concurrency: int = 8, use_cache: bool = True) -> list:
+        """
+        并发批量获取笔记详情，按items顺序返回
+        :param items: [{"note_id": ..., "xsec_token": ..., "xsec_source": ...（可选）}]
+        :param source: api（get_note_by_id）或html（get_note_by_html）
+        :param concurrency: 最大并发数
+        :param use_cache: 是否使用响应缓存
+        :return: 每条笔记的结果
+        """
+        results: list = [result async for result in self.iter_notes(items, source, concurrency, use_cache)]
+        return sorted(results, key=lambda result: result["index"])
+
+    async def sync_user_notes(self, user_id: str, xsec_token: str, xsec_source: str = "pc_note",
+                              since: Optional[str] = None, state: Optional[SyncState] = None, max_pages: int = 0,
+                              use_cache: bool = False) -> dict:
+        """
+        增量同步用户笔记：从第一页开始翻页，遇到已同步过的笔记即停止，请求页数只与新笔记数量有关
+        :param user_id: 用户ID
+        :param xsec_token: xsec_token
+        :param xsec_source: xsec_source
+        :param since: 上次同步到的最新笔记ID，为空则从state读取，都为空则全量获取
+        :param state: 高水位存储，传入则读取并在同步后保存最新笔记ID
+        :param max_pages: 最多请求页数，0为不限
+        :param use_cache: 是否使用响应缓存（同步需要最新数据，默认不使用）
+        :return: {"user_id", "since", "newest": 最新笔记ID, "notes": [新笔记（从新到旧）], "pages": 请求页数,
+                 "reached": 是否到达已同步的笔记, "complete": 是否已同步完整（到达已同步的笔记或翻完所有页）}
+        """
+        result: dict = self._sync_result(user_id, since, state)
+        pages: AsyncIterator[dict] = self.iter_user_notes(user_id, xsec_token, xsec_source, max_pages=max_pages,
+                                                          use_cache=use_cache)
+        try:
+            async for page in pages:
+                if self._sync_page(result, page):
+                    result["reached"] = True
+                    break
+        finally:
+            await pages.aclose()
+        return self._sync_finish(result, state)
+
+
+class XhsLogicRegistry:
+    def __init__(self, max_size: int = 64) -> None:
+        """
+        按代理缓存XhsLogic对象，超出数量时淘汰最久未使用的
+        :param max_size: 最多缓存的对象数量
+        """
+        self.max_size: int = max_size
+        self._instances: OrderedDict = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, cls: type, proxy: Optional[str] = None) -> XhsLogic:
+        """
+        获取（或创建）XhsLogic对象
+        :param cls: XhsLogic或AsyncXhsLogic
+        :param proxy: 代理
+        :return:
+        """
+        key: tuple = (cls, proxy)
+        with self._lock:
+            instance: Optional[XhsLogic] = self._instances.get(key)
+            if instance is not None:
+                self._instances.move_to_end(key)
+                return instance
+        instance = cls(proxy=proxy)
+        with self._lock:
+            instance = self._instances.setdefault(key, instance)
+            self._instances.move_to_end(key)
+            while len(self._instances) > self.max_size:
+                self._instances.popitem(last=False)
+        return instance
+
+
+xhs_logic_registry: XhsLogicRegistry = XhsLogicRegistry()
+
+
+def get_xhs_logic(proxy: Optional[str] = Query(default=None, description="代理，示例：http://127.0.0.1:7897，"
+                                                                         "pool为使用服务端代理池")) -> XhsLogic:
     """
     获取XhsLogic对象
     :param proxy: GET请求中的proxy参数
     :return:
     """
-    return XhsLogic(proxy=proxy)
+    return xhs_logic_registry.get(XhsLogic, proxy)
+
+
+def get_async_xhs_logic(proxy: Optional[str] = Query(default=None, description="代理，示例：http://127.0.0.1:7897，"
+                                                                               "pool为使用服务端代理池")
+                        ) -> AsyncXhsLogic:
+    """
+    获取AsyncXhsLogic对象
+    :param proxy: GET请求中的proxy参数
+    :return:
+    """
+    return xhs_logic_registry.get(AsyncXhsLogic, proxy)
+
+
+def get_use_cache(cache: bool = Query(default=True, description="是否使用缓存，false则强制请求小红书"),
+                  cache_control: Optional[str] = Header(default=None)) -> bool:
+    """
+    是否使用响应缓存（cache=false或请求头Cache-Control: no-cache/no-store时跳过）
+    :param cache: GET请求中的cache参数
+    :param cache_control: Cache-Control请求头
+    :return:
+    """
+    directives: str = (cache_control or "").lower()
+    return cache and "no-cache" not in directives and "no-store" not in directives
+
+
+def get_projector(fields: Optional[str] = Query(default=None, description="只返回指定字段，逗号分隔，层级用.分隔，"
+                                                                          "列表自动展开，例：cursor,notes.note_id")
+                  ) -> Optional[Callable]:
+    """
+    获取字段投影函数
+    :param fields: GET请求中的fields参数
+    :return: 投影函数，未指定fields为None
+    """
+    return compile_fields(fields) if fields else None
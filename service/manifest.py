@@ -0,0 +1,184 @@
+from service.database import SQLiteStore
+from typing import Iterator, Optional
+from loguru import logger
+import threading
+import hashlib
+import sqlite3
+import shutil
+import time
+import os
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件的SHA-256
+    :param path: 文件路径
+    :param chunk_size: 每次读取的字节数
+    :return: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """
+    用硬链接把已有文件放到新位置（不占用额外空间），不支持硬链接时复制
+    :param src: 已有文件路径
+    :param dst: 目标路径（已存在则替换）
+    :return:
+    """
+    temp_path: str = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, temp_path)
+    except OSError:
+        shutil.copyfile(src, temp_path)
+    os.replace(temp_path, dst)
+
+
+class DownloadManifest(SQLiteStore):
+    schema: tuple = ("""
+        CREATE TABLE IF NOT EXISTS media (
+            note_id TEXT NOT NULL,
+            media_key TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            updated REAL NOT NULL,
+            PRIMARY KEY (note_id, media_key)
+        )
+    """, "CREATE INDEX IF NOT EXISTS media_key_index ON media (media_key)",
+        "CREATE INDEX IF NOT EXISTS media_sha256_index ON media (sha256)")
+
+    def __init__(self, path: str) -> None:
+        """
+        下载清单：记录已下载完成的文件（笔记ID + 媒体键 -> 路径、大小、SHA-256），用于重复运行时跳过和跨笔记去重
+        :param path: SQLite文件路径，清单中的文件路径相对该文件所在目录保存
+        """
+        super().__init__(path)
+        self.root: str = os.path.dirname(os.path.abspath(path))
+        os.makedirs(self.root, exist_ok=True)
+
+    def _to_dict(self, row: Optional[sqlite3.Row]) -> Optional[dict]:
+        """
+        数据库行转为字典（路径转为绝对路径）
+        :param row: 数据库行
+        :return:
+        """
+        if row is None:
+            return None
+        item: dict = dict(row)
+        item["path"] = os.path.join(self.root, item["path"])
+        return item
+
+    @staticmethod
+    def _on_disk(item: Optional[dict]) -> bool:
+        """
+        记录对应的文件是否仍在磁盘上且大小一致
+        :param item: 清单记录
+        :return:
+        """
+        try:
+            return item is not None and os.path.getsize(item["path"]) == item["size"]
+        except OSError:
+            return False
+
+    def get(self, note_id: str, media_key: str) -> Optional[dict]:
+        """
+        获取清单记录
+        :param note_id: 笔记ID
+        :param media_key: 媒体键（图片fileId、视频originVideoKey）
+        :return:
+        """
+        return self._to_dict(self._connect().execute(
+            "SELECT * FROM media WHERE note_id = ? AND media_key = ?", (note_id, media_key)
+        ).fetchone())
+
+    def is_done(self, note_id: str, media_key: str) -> bool:
+        """
+        是否已下载完成（有记录且文件大小一致）
+        :param note_id: 笔记ID
+        :param media_key: 媒体键
+        :return:
+        """
+        return self._on_disk(self.get(note_id, media_key))
+
+    def find_media(self, media_key: str) -> Optional[dict]:
+        """
+        查找其他笔记中已下载的同一媒体
+        :param media_key: 媒体键
+        :return: 仍在磁盘上的记录，没有返回None
+        """
+        rows: list = self._connect().execute("SELECT * FROM media WHERE media_key = ?", (media_key,)).fetchall()
+        return next((item for item in map(self._to_dict, rows) if self._on_disk(item)), None)
+
+    def find_hash(self, sha256: str) -> Optional[dict]:
+        """
+        查找内容相同的已下载文件
+        :param sha256: 文件SHA-256
+        :return: 仍在磁盘上的记录，没有返回None
+        """
+        rows: list = self._connect().execute("SELECT * FROM media WHERE sha256 = ?", (sha256,)).fetchall()
+        return next((item for item in map(self._to_dict, rows) if self._on_disk(item)), None)
+
+    def record(self, note_id: str, media_key: str, path: str, sha256: Optional[str] = None) -> dict:
+        """
+        记录下载完成的文件；内容与已有文件相同时改为硬链接到已有文件（去重）
+        :param note_id: 笔记ID
+        :param media_key: 媒体键
+        :param path: 文件路径
+        :param sha256: 文件SHA-256，为空则计算
+        :return: 清单记录
+        """
+        sha256 = sha256 or hash_file(path)
+        existing: Optional[dict] = self.find_hash(sha256)
+        if existing is not None and not os.path.samefile(existing["path"], path):
+            try:
+                link_or_copy(existing["path"], path)
+            except OSError as e:
+                logger.warning(f"【DownloadManifest】去重失败：{e}")
+        size: int = os.path.getsize(path)
+        self._connect().execute(
+            "INSERT OR REPLACE INTO media (note_id, media_key, path, size, sha256, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (note_id, media_key, os.path.relpath(os.path.abspath(path), self.root), size, sha256, time.time())
+        )
+        return {"note_id": note_id, "media_key": media_key, "path": path, "size": size, "sha256": sha256}
+
+    def entries(self) -> Iterator[dict]:
+        """
+        遍历所有清单记录
+        :return:
+        """
+        for row in self._connect().execute("SELECT * FROM media ORDER BY note_id, media_key").fetchall():
+            yield self._to_dict(row)
+
+    def remove(self, note_id: str, media_key: str) -> None:
+        """
+        删除清单记录（下次运行重新下载）
+        :param note_id: 笔记ID
+        :param media_key: 媒体键
+        :return:
+        """
+        self._connect().execute("DELETE FROM media WHERE note_id = ? AND media_key = ?", (note_id, media_key))
+
+    def verify(self, rehash: bool = False, prune: bool = False) -> dict:
+        """
+        校验磁盘上的文件与清单是否一致
+        :param rehash: 是否重新计算SHA-256（否则只比较大小）
+        :param prune: 是否删除校验失败的记录
+        :return: {"ok": 正常数量, "missing": [缺失的记录], "mismatch": [大小或内容不一致的记录]}
+        """
+        result: dict = {"ok": 0, "missing": [], "mismatch": []}
+        for item in self.entries():
+            if not os.path.exists(item["path"]):
+                result["missing"].append(item)
+            elif os.path.getsize(item["path"]) != item["size"] or (rehash and hash_file(item["path"]) != item["sha256"]):
+                result["mismatch"].append(item)
+            else:
+                result["ok"] += 1
+                continue
+            if prune:
+                self.remove(item["note_id"], item["media_key"])
+        return result
@@ -0,0 +1,247 @@
+from typing import Any, Optional
+from loguru import logger
+import subprocess
+import threading
+import itertools
+import shutil
+import queue
+import json
+import os
+
+# 常驻Worker脚本
+WORKER_SCRIPT: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "node_worker.js")
+
+
+class NodeWorkerError(RuntimeError):
+    """
+    Node进程异常（崩溃、超时、管道断开），需要重启Worker
+    """
+
+
+class NodeWorker:
+    def __init__(self, script_path: str, node_path: str = None, timeout: float = 10) -> None:
+        """
+        常驻Node进程，启动时加载一次脚本，通过stdin/stdout按行收发JSON
+        :param script_path: 要加载的JS脚本路径
+        :param node_path: node可执行文件路径，为空则自动查找
+        :param timeout: 单次调用超时时间（秒）
+        """
+        self.script_path: str = os.path.abspath(script_path)
+        self.node_path: str = node_path or shutil.which("node") or shutil.which("nodejs") or "node"
+        self.timeout: float = timeout
+        self.process: Optional[subprocess.Popen] = None
+        self._responses: queue.Queue = queue.Queue()
+        self._ids = itertools.count(1)
+
+    @property
+    def alive(self) -> bool:
+        """
+        进程是否存活
+        :return:
+        """
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        """
+        启动Node进程
+        :return:
+        """
+        self._responses = queue.Queue()
+        self.process = subprocess.Popen(
+            [self.node_path, WORKER_SCRIPT, self.script_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(self.script_path),
+            encoding="utf-8",
+            bufsize=1
+        )
+        threading.Thread(target=self._read_loop, args=(self.process, self._responses), daemon=True).start()
+        logger.info(f"【NodeWorker】已启动（pid={self.process.pid}）：{os.path.basename(self.script_path)}")
+
+    @staticmethod
+    def _read_loop(process: subprocess.Popen, responses: queue.Queue) -> None:
+        """
+        读取stdout响应（每个进程一个读线程，进程退出时放入None）
+        :param process: Node进程
+        :param responses: 响应队列
+        :return:
+        """
+        for line in process.stdout:
+            if line.strip():
+                responses.put(line)
+        responses.put(None)
+
+    def call(self, fn: str, *args: Any, timeout: float = None, count: int = None) -> Any:
+        """
+        调用脚本中的函数（同一Worker同一时间只能处理一个调用，由NodePool保证）
+        :param fn: 函数名
+        :param args: 参数，需可JSON序列化
+        :param timeout: 超时时间（秒），为空则使用默认值
+        :param count: 批量调用次数，不为空时返回count次调用结果组成的列表
+        :return: 函数返回值
+        """
+        if not self.alive:
+            raise NodeWorkerError("Node进程未运行！")
+        request_id: int = next(self._ids)
+        try:
+            request: dict = {"id": request_id, "fn": fn, "args": args}
+            if count:
+                request["count"] = count
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise NodeWorkerError(f"写入Node进程失败：{e}")
+        while True:
+            try:
+                line: Optional[str] = self._responses.get(timeout=timeout or self.timeout)
+            except queue.Empty:
+                self.close()
+                raise NodeWorkerError(f"Node进程调用超时：{fn}")
+            if line is None:
+                raise NodeWorkerError("Node进程已退出！")
+            response: dict = json.loads(line)
+            # 丢弃之前超时遗留的响应
+            if response.get("id") != request_id:
+                continue
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            return response.get("result")
+
+    def ping(self, timeout: float = 3) -> bool:
+        """
+        健康检查
+        :param timeout: 超时时间（秒）
+        :return: 是否健康
+        """
+        try:
+            return self.call("__ping__", timeout=timeout) == "pong"
+        except Exception:
+            return False
+
+    def restart(self) -> None:
+        """
+        重启Node进程
+        :return:
+        """
+        self.close()
+        self.start()
+
+    def close(self) -> None:
+        """
+        关闭Node进程
+        :return:
+        """
+        if self.process is None:
+            return None
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process = None
+
+
+class NodePool:
+    def __init__(self, script_path: str, size: int = None, node_path: str = None, timeout: float = 10,
+                 health_interval: float = 30) -> None:
+        """
+        常驻Node进程池，替代execjs每次调用都启动新进程
+        :param script_path: 要加载的JS脚本路径
+        :param size: 进程数量，为空则为CPU核数
+        :param node_path: node可执行文件路径，为空则自动查找
+        :param timeout: 单次调用超时时间（秒）
+        :param health_interval: 健康检查间隔（秒），小于等于0则不检查
+        """
+        self.script_path: str = script_path
+        self.size: int = max(1, size or os.cpu_count() or 1)
+        self.node_path: Optional[str] = node_path
+        self.timeout: float = timeout
+        self.health_interval: float = health_interval
+        self.workers: list = []
+        self._idle: queue.Queue = queue.Queue()
+        self._lock: threading.Lock = threading.Lock()
+        self._closed: threading.Event = threading.Event()
+
+    def start(self) -> None:
+        """
+        启动所有Worker（首次调用时自动启动）
+        :return:
+        """
+        with self._lock:
+            if self.workers:
+                return None
+            self._closed.clear()
+            for _ in range(self.size):
+                worker: NodeWorker = NodeWorker(self.script_path, node_path=self.node_path, timeout=self.timeout)
+                worker.start()
+                self.workers.append(worker)
+                self._idle.put(worker)
+            if self.health_interval > 0:
+                threading.Thread(target=self._health_loop, daemon=True).start()
+
+    def call(self, fn: str, *args: Any, count: int = None) -> Any:
+        """
+        从进程池中取一个空闲Worker调用函数，Worker崩溃会自动重启并重试一次
+        :param fn: 函数名
+        :param args: 参数，需可JSON序列化
+        :param count: 批量调用次数，不为空时返回count次调用结果组成的列表
+        :return: 函数返回值
+        """
+        if not self.workers:
+            self.start()
+        worker: NodeWorker = self._idle.get()
+        try:
+            if not worker.alive:
+                logger.warning(f"【NodePool】Worker已退出，正在重启...")
+                worker.restart()
+            try:
+                return worker.call(fn, *args, count=count)
+            except NodeWorkerError as e:
+                logger.warning(f"【NodePool】Worker异常（{e}），重启后重试...")
+                worker.restart()
+                return worker.call(fn, *args, count=count)
+        finally:
+            self._idle.put(worker)
+
+    def health_check(self) -> None:
+        """
+        检查当前空闲的Worker，无响应的自动重启
+        :return:
+        """
+        for _ in range(self.size):
+            try:
+                worker: NodeWorker = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            try:
+                if not worker.ping():
+                    logger.warning(f"【NodePool】Worker健康检查失败，正在重启...")
+                    worker.restart()
+            except Exception as e:
+                logger.error(f"【NodePool】Worker重启失败：{e}")
+            finally:
+                self._idle.put(worker)
+
+    def _health_loop(self) -> None:
+        """
+        定时健康检查
+        :return:
+        """
+        while not self._closed.wait(self.health_interval):
+            self.health_check()
+
+    def close(self) -> None:
+        """
+        关闭所有Worker
+        :return:
+        """
+        with self._lock:
+            self._closed.set()
+            for worker in self.workers:
+                worker.close()
+            self.workers = []
+            self._idle = queue.Queue()
@@ -0,0 +1,47 @@
+from typing import Any, Callable, Optional
+from functools import lru_cache
+
+
+def _compile_tree(tree: Optional[dict]) -> Callable[[Any], Any]:
+    """
+    将字段树编译为投影函数（列表中的每个元素分别投影）
+    :param tree: 字段树，None表示保留整个值
+    :return:
+    """
+    if tree is None:
+        return lambda value: value
+    children: list = [(key, _compile_tree(child)) for key, child in tree.items()]
+
+    def project(value: Any) -> Any:
+        if isinstance(value, list):
+            return [project(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        return {key: child(value[key]) for key, child in children if key in value}
+    return project
+
+
+@lru_cache(maxsize=256)
+def compile_fields(fields: str) -> Callable[[Any], Any]:
+    """
+    编译字段投影（相同的fields只编译一次）
+    :param fields: 逗号分隔的字段路径，层级用.分隔，列表自动展开，例：cursor,notes.note_id,notes.user.nickname
+    :return: 投影函数，返回只包含指定字段的新对象（不修改原对象）
+    """
+    tree: dict = {}
+    for path in fields.split(","):
+        keys: list = [key.strip() for key in path.strip().split(".")]
+        if not any(keys):
+            continue
+        if not all(keys):
+            raise RuntimeError(f"fields格式错误：{path}")
+        node: Optional[dict] = tree
+        for key in keys[:-1]:
+            if node.get(key, {}) is None:  # 已保留整个父字段
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = None
+    if not tree:
+        raise RuntimeError("fields不能为空！")
+    return _compile_tree(tree)
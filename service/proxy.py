@@ -0,0 +1,291 @@
+from concurrent.futures import ThreadPoolExecutor
+from service.metrics import mask_proxy
+from typing import Optional
+from loguru import logger
+import threading
+import random
+import json
+import time
+import os
+
+# proxy参数为该值时从代理池中选择代理
+PROXY_POOL: str = "pool"
+
+
+def is_proxy_failure(status_code: int) -> bool:
+    """
+    响应状态码是否说明代理本身有问题（代理认证失败、网关错误）
+    :param status_code: HTTP状态码
+    :return:
+    """
+    return status_code == 407 or status_code in (502, 503, 504)
+
+
+class ProxyState:
+    def __init__(self, url: str, weight: float = 1, proxy_id: str = "") -> None:
+        """
+        单个代理的状态：滑动平均延迟和错误率、熔断状态
+        :param url: 代理地址，例：http://127.0.0.1:7897
+        :param weight: 基础权重
+        :param proxy_id: 代理编号（统计、指标中代替代理地址区分代理，不含账号密码）
+        """
+        self.url: str = url
+        self.id: str = proxy_id
+        self.weight: float = weight
+        self.latency: Optional[float] = None  # 成功请求延迟的指数滑动平均（秒）
+        self.error_rate: float = 0.0  # 失败率的指数滑动平均
+        self.failures: int = 0  # 连续失败次数
+        self.opens: int = 0  # 连续熔断次数（决定熔断时长）
+        self.open_until: float = 0.0  # 熔断结束时间，0为未熔断
+        self.trial: bool = False  # 半开状态下是否已放行一个试探请求
+        self.requests: int = 0
+        self.errors: int = 0
+
+    def state(self, now: float) -> str:
+        """
+        熔断状态
+        :param now: 当前时间（monotonic）
+        :return: closed：正常；open：熔断中；half_open：熔断到期，等待试探请求的结果
+        """
+        if not self.open_until:
+            return "closed"
+        return "open" if now < self.open_until else "half_open"
+
+
+class ProxyPool:
+    def __init__(self, path: Optional[str] = None, probe_url: str = "https://www.xiaohongshu.com/robots.txt",
+                 probe_interval: float = 60, probe_timeout: float = 10, alpha: float = 0.2,
+                 failure_threshold: int = 3, open_seconds: float = 30, max_open_seconds: float = 600) -> None:
+        """
+        服务端代理池：从配置文件加载代理，定期健康检查，按延迟和错误率加权选择，同一账号固定使用同一代理，
+        连续失败的代理熔断一段时间（到期后放行一个试探请求，成功则恢复，失败则加倍熔断时长）
+        :param path: 配置文件路径，.json为代理地址列表（或{"url", "weight"}列表），其他为每行一个代理（可跟权重），为空则不启用
+        :param probe_url: 健康检查请求的地址
+        :param probe_interval: 健康检查间隔（秒），小于等于0则不检查
+        :param probe_timeout: 健康检查超时（秒）
+        :param alpha: 滑动平均的平滑系数，越大越看重最近的结果
+        :param failure_threshold: 连续失败多少次后熔断
+        :param open_seconds: 首次熔断时长（秒）
+        :param max_open_seconds: 最长熔断时长（秒）
+        """
+        self.path: Optional[str] = path
+        self.probe_url: str = probe_url
+        self.probe_interval: float = probe_interval
+        self.probe_timeout: float = probe_timeout
+        self.alpha: float = alpha
+        self.failure_threshold: int = failure_threshold
+        self.open_seconds: float = open_seconds
+        self.max_open_seconds: float = max_open_seconds
+        self._proxies: dict = {}  # url -> ProxyState
+        self._bindings: dict = {}  # 账号a1 -> 代理地址
+        self._next_id: int = 0
+        self._mtime: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+        self._stopped: threading.Event = threading.Event()
+        self._started: bool = False
+
+    @staticmethod
+    def parse(text: str, is_json: bool = False) -> list:
+        """
+        解析配置文件内容
+        :param text: 文件内容
+        :param is_json: 是否为JSON
+        :return: [(代理地址, 权重)]
+        """
+        if is_json:
+            return [(item, 1.0) if isinstance(item, str) else (item["url"], float(item.get("weight", 1)))
+                    for item in json.loads(text)]
+        proxies: list = []
+        for line in text.splitlines():
+            parts: list = line.split("#", 1)[0].split()
+            if parts:
+                proxies.append((parts[0], float(parts[1]) if len(parts) > 1 else 1.0))
+        return proxies
+
+    def load(self) -> None:
+        """
+        加载（或在配置文件变化后重新加载）代理，已有代理保留统计数据
+        :return:
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        mtime: float = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            proxies: list = self.parse(f.read(), self.path.endswith(".json"))
+        with self._lock:
+            states: dict = {}
+            for url, weight in proxies:
+                if url not in states:  # 已有代理保留编号，新代理按首次加载的顺序编号
+                    states[url] = self._proxies.get(url) or self._new_state(url)
+                states[url].weight = weight
+            self._proxies = states
+            self._bindings = {a1: url for a1, url in self._bindings.items() if url in self._proxies}
+            self._mtime = mtime
+        logger.info(f"【ProxyPool】已加载 {len(proxies)} 个代理：{os.path.abspath(self.path)}")
+
+    def _new_state(self, url: str) -> ProxyState:
+        """
+        创建代理状态并分配编号
+        :param url: 代理地址
+        :return:
+        """
+        self._next_id += 1
+        return ProxyState(url, proxy_id=f"p{self._next_id}")
+
+    def _score(self, proxy: ProxyState, default_latency: float) -> float:
+        """
+        选择权重：基础权重 × 成功率 ÷ 延迟
+        :param proxy: 代理状态
+        :param default_latency: 还没有延迟数据时使用的延迟
+        :return:
+        """
+        latency: float = proxy.latency if proxy.latency is not None else default_latency
+        return proxy.weight * max(1 - proxy.error_rate, 0.01) / max(latency, 0.05)
+
+    def select(self, account: Optional[str] = None) -> str:
+        """
+        选择代理：账号已绑定且代理正常时继续使用，否则在可用代理中加权随机选择并绑定
+        :param account: 账号标识（a1），为空则不绑定
+        :return: 代理地址
+        """
+        if not self._started:
+            self.start()
+        now: float = time.monotonic()
+        with self._lock:
+            bound: Optional[ProxyState] = self._proxies.get(self._bindings.get(account))
+            if bound is not None and bound.state(now) == "closed":
+                return bound.url
+            candidates: list = [proxy for proxy in self._proxies.values() if proxy.state(now) == "closed"]
+            trials: list = [proxy for proxy in self._proxies.values()
+                            if proxy.state(now) == "half_open" and not proxy.trial]
+            if trials:  # 熔断到期的代理优先放行一个试探请求，不绑定账号
+                trials[0].trial = True
+                return trials[0].url
+            if not candidates:
+                raise RuntimeError("代理池中没有可用代理！" if self._proxies else "代理池为空，请检查代理配置文件！")
+            latencies: list = sorted(proxy.latency for proxy in candidates if proxy.latency is not None)
+            default_latency: float = latencies[len(latencies) // 2] if latencies else 1.0
+            proxy: ProxyState = random.choices(candidates, [self._score(p, default_latency) for p in candidates])[0]
+            if account:
+                self._bindings[account] = proxy.url
+            return proxy.url
+
+    def report(self, url: Optional[str], ok: bool, latency: float = 0.0) -> None:
+        """
+        上报请求结果（不在代理池中的代理忽略）
+        :param url: 代理地址
+        :param ok: 是否成功（代理连接失败、超时、网关错误为失败）
+        :param latency: 请求耗时（秒）
+        :return:
+        """
+        with self._lock:
+            proxy: Optional[ProxyState] = self._proxies.get(url)
+            if proxy is None:
+                return None
+            proxy.requests += 1
+            proxy.trial = False
+            proxy.error_rate += self.alpha * ((0.0 if ok else 1.0) - proxy.error_rate)
+            if ok:
+                proxy.latency = latency if proxy.latency is None else proxy.latency + self.alpha * (latency - proxy.latency)
+                if proxy.open_until:
+                    logger.info(f"【ProxyPool】代理已恢复：{mask_proxy(url)}")
+                proxy.failures, proxy.opens, proxy.open_until = 0, 0, 0.0
+                return None
+            proxy.errors += 1
+            proxy.failures += 1
+            half_open: bool = proxy.state(time.monotonic()) == "half_open"
+            if half_open or (not proxy.open_until and proxy.failures >= self.failure_threshold):
+                proxy.opens += 1
+                seconds: float = min(self.open_seconds * 2 ** (proxy.opens - 1), self.max_open_seconds)
+                proxy.open_until = time.monotonic() + seconds
+                self._bindings = {a1: bound for a1, bound in self._bindings.items() if bound != url}
+                logger.warning(f"【ProxyPool】代理连续失败 {proxy.failures} 次，熔断 {seconds:.0f}s：{mask_proxy(url)}")
+
+    def probe(self, url: str) -> bool:
+        """
+        健康检查一个代理
+        :param url: 代理地址
+        :return: 是否正常
+        """
+        from curl_cffi import requests
+        start: float = time.perf_counter()
+        try:
+            ok: bool = not is_proxy_failure(requests.get(self.probe_url, proxy=url, timeout=self.probe_timeout,
+                                                         allow_redirects=False).status_code)
+        except Exception as e:
+            logger.debug(f"【ProxyPool】健康检查失败：{mask_proxy(url)}，{e}")
+            ok = False
+        self.report(url, ok, time.perf_counter() - start)
+        return ok
+
+    def probe_all(self) -> dict:
+        """
+        并发健康检查所有代理（同时重新加载变化的配置文件）
+        :return: {代理地址: 是否正常}
+        """
+        self.load()
+        urls: list = list(self._proxies)
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(16, len(urls))) as executor:
+            return dict(zip(urls, executor.map(self.probe, urls)))
+
+    def start(self) -> None:
+        """
+        加载代理并启动后台健康检查（首次选择代理时自动启动）
+        :return:
+        """
+        with self._lock:
+            if self._started:
+                return None
+            self._started = True
+            self._stopped.clear()
+        self.load()
+        if self.probe_interval <= 0:
+            return None
+
+        def probe_loop() -> None:
+            while True:
+                try:
+                    self.probe_all()
+                except Exception as e:
+                    logger.error(f"【ProxyPool】健康检查异常：{e}")
+                if self._stopped.wait(self.probe_interval):
+                    return None
+
+        threading.Thread(target=probe_loop, daemon=True).start()
+
+    def stats(self) -> dict:
+        """
+        各代理状态（只有账号密码不同的代理隐藏账号密码后地址相同，因此按编号区分）
+        :return: {代理编号: {"proxy": 隐藏账号密码的代理地址, "state", "latency", "error_rate", "requests", "errors",
+                 "accounts", "open_seconds"}}
+        """
+        now: float = time.monotonic()
+        with self._lock:
+            accounts: dict = {}
+            for url in self._bindings.values():
+                accounts[url] = accounts.get(url, 0) + 1
+            return {proxy.id: {"proxy": mask_proxy(url), "state": proxy.state(now), "latency": proxy.latency,
+                               "error_rate": round(proxy.error_rate, 4), "requests": proxy.requests,
+                               "errors": proxy.errors, "accounts": accounts.get(url, 0),
+                               "open_seconds": round(max(proxy.open_until - now, 0), 1)}
+                    for url, proxy in self._proxies.items()}
+
+    def close(self) -> None:
+        """
+        停止后台健康检查
+        :return:
+        """
+        self._stopped.set()
+        self._started = False
+
+
+# 全局代理池（路由、download.py的proxy参数为pool时使用）
+proxy_pool: ProxyPool = ProxyPool(
+    path=os.getenv("XHS_PROXY_FILE", "proxies.txt"),
+    probe_url=os.getenv("XHS_PROXY_PROBE_URL", "https://www.xiaohongshu.com/robots.txt"),
+    probe_interval=float(os.getenv("XHS_PROXY_PROBE_INTERVAL", "60"))
+)
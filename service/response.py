@@ -1,7 +1,10 @@
 from starlette import status
-from typing import Any, Optional
-from fastapi.responses import ORJSONResponse
+from loguru import logger
+from typing import Any, AsyncIterator, Callable, Optional
+from fastapi.responses import ORJSONResponse, StreamingResponse, Response
 from fastapi.encoders import jsonable_encoder
+from service.metrics import metrics
+import orjson
 
 # 状态码
 SUCCESS: tuple[int, str] = (2000, "SUCCESS！")
@@ -10,36 +13,157 @@ NOT_FOUND: tuple[int, str] = (4040, "NOT_FOUND！")
 SERVER_ERROR: tuple[int, str] = (5000, "服务异常，请稍后再试！")
 MISSING_PARAM: tuple[int, str] = (4001, "缺少必填参数！")
 PARAM_ERROR: tuple[int, str] = (4002, "参数格式错误！")
+# 除括号外的所有字节（透传时检查data的括号结构）
+NON_BRACKET_BYTES: bytes = bytes(sorted(set(range(256)) - set(b"{}[]")))
 
 
+class RawJSON(bytes):
+    """
+    已序列化的JSON，ResponseUtil直接拼入响应，不再解析、编码（透传模式）
+    """
+    @classmethod
+    def split(cls, body: bytes, key: str = "data") -> Optional[dict]:
+        """
+        拆分小红书响应：只解析key之前的字段（code、success、msg等），key对应的值保留原始字节
+        要求key为最后一个键，无法确认时返回None，由调用方完整解析
+        :param body: 响应内容
+        :param key: 透传的字段名
+        :return: {"code": ..., "success": ..., key: RawJSON(...)}
+        """
+        marker: bytes = b'"' + key.encode() + b'":'
+        index: int = body.find(marker)
+        if index < 0:
+            return None
+        try:
+            head: dict = orjson.loads(body[:index].rstrip().rstrip(b",") + b"}")
+        except orjson.JSONDecodeError:  # 找到的是嵌套对象中的同名字段
+            return None
+        if not isinstance(head, dict) or "code" not in head or "success" not in head:
+            return None
+        value: bytes = body[index + len(marker):].strip()
+        if not value.endswith(b"}"):
+            return None
+        value = value[:-1].rstrip()
+        if value == b"null":
+            head[key] = None
+        elif cls._is_single_value(value):
+            head[key] = cls(value)
+        else:  # key后面还有其他字段
+            return None
+        return head
+
+    @staticmethod
+    def _is_single_value(value: bytes) -> bool:
+        """
+        是否恰好是一个JSON对象/数组（后面还有其他字段时为False），只检查括号结构，不解析成Python对象：
+        去掉转义字符后按引号切分，偶数段为字符串外的内容，只保留其中的括号，再反复消去相邻的成对括号，
+        最外层括号之间能完全消去说明第一个括号在最后才闭合
+        :param value: JSON字节
+        :return:
+        """
+        if (value[:1], value[-1:]) not in ((b"{", b"}"), (b"[", b"]")):
+            return False
+        if b"\\" in value:  # 反斜杠只出现在字符串中，先去掉转义的反斜杠再去掉转义的引号
+            value = value.replace(b"\\\\", b"").replace(b'\\"', b"")
+        brackets: bytes = b"".join(value.split(b'"')[::2]).translate(None, NON_BRACKET_BYTES)[1:-1]
+        while brackets:
+            reduced: bytes = brackets.replace(b"{}", b"").replace(b"[]", b"")
+            if len(reduced) == len(brackets):
+                return False
+            brackets = reduced
+        return True
+
 
 class ResponseUtil:
     """
     返回Response类
     """
-    def __init__(self, code: int, message: str, data: Optional[Any] = None):
+    def __init__(self, code: int, message: str, data: Optional[Any] = None, projector: Optional[Callable] = None):
         """
         构造方法
         :param code: 状态码
         :param data: 返回数据
         :param message: 返回信息
+        :param projector: 字段投影函数（fields参数），为空则返回全部字段
         """
         self.code: int = code
         self.data: Optional[Any] = data
         self.message: str = message
+        if projector is not None and self.data is not None:
+            self.data = projector(orjson.loads(bytes(self.data)) if isinstance(self.data, RawJSON) else self.data)
 
     def success(self) -> ORJSONResponse:
         """
         成功Response
         :return: Response对象
         """
-        response: dict = dict(code=self.code, data=self.data, message=self.message)
-        return ORJSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder(response))
+        with metrics.timer("xhs_stage_seconds", stage="serialize"):
+            if isinstance(self.data, RawJSON):
+                content: bytes = (b'{"code":' + str(self.code).encode() + b',"data":' + self.data +
+                                  b',"message":' + orjson.dumps(self.message) + b"}")
+                return Response(status_code=status.HTTP_200_OK, content=content, media_type="application/json")
+            response: dict = dict(code=self.code, data=self.data, message=self.message)
+            return ORJSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder(response))
 
-    def fail(self) -> ORJSONResponse:
+    def fail(self, status_code: int = status.HTTP_400_BAD_REQUEST) -> ORJSONResponse:
         """
         失败Response
+        :param status_code: HTTP状态码
         :return: Response对象
         """
         response: dict = dict(code=self.code, data=self.data, message=self.message)
-        return ORJSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=jsonable_encoder(response))
\ No newline at end of file
+        return ORJSONResponse(status_code=status_code, content=jsonable_encoder(response))
+
+    @staticmethod
+    def ndjson(records: AsyncIterator[dict], summary: dict = None, projector: Optional[Callable] = None
+               ) -> StreamingResponse:
+        """
+        流式Response（NDJSON），每行一条记录：
+        {"type": "item", "data": {...}}，最后一行为{"type": "end"或"error", "code": ..., "message": ..., "data": 汇总}
+        :param records: 逐条产出记录的异步生成器
+        :param summary: 汇总字典，生成器可在产出过程中更新，结束时原样输出（自动统计items条数）
+        :param projector: 字段投影函数，对每条记录生效
+        :return: Response对象
+        """
+        summary = summary if summary is not None else {}
+        summary.setdefault("items", 0)
+
+        async def generate() -> AsyncIterator[bytes]:
+            try:
+                async for record in records:
+                    summary["items"] += 1
+                    if projector is not None:
+                        record = projector(record)
+                    yield orjson.dumps({"type": "item", "data": record}) + b"\n"
+            except Exception as e:
+                logger.exception(f"【ResponseUtil】数据流中断：{e}")
+                end: dict = dict(type="error", code=SERVER_ERROR[0], message=str(e), data=summary)
+            else:
+                end = dict(type="end", code=SUCCESS[0], message=SUCCESS[1], data=summary)
+            finally:
+                await records.aclose()
+            yield orjson.dumps(end) + b"\n"
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    @staticmethod
+    def stream(pages: AsyncIterator[dict], items_key: str, projector: Optional[Callable] = None) -> StreamingResponse:
+        """
+        分页数据流式Response（NDJSON），每行一条记录，汇总中含已请求页数和最后的游标（可用于续传）
+        :param pages: 逐页产出data字典的异步生成器
+        :param items_key: 每页数据中列表字段名，例：notes、comments
+        :param projector: 字段投影函数，对每条记录生效
+        :return: Response对象
+        """
+        summary: dict = {"pages": 0, "items": 0, "cursor": "", "has_more": False}
+
+        async def flatten() -> AsyncIterator[dict]:
+            try:
+                async for page in pages:
+                    summary["pages"] += 1
+                    summary["cursor"] = page.get("cursor", "")
+                    summary["has_more"] = bool(page.get("has_more"))
+                    for item in page.get(items_key, []):
+                        yield item
+            finally:
+                await pages.aclose()
+        return ResponseUtil.ndjson(flatten(), summary, projector)
@@ -0,0 +1,207 @@
+from curl_cffi.requests import Session, AsyncSession
+from contextlib import contextmanager
+from service.metrics import mask_proxy
+from typing import Iterator, Optional
+from collections import OrderedDict
+from loguru import logger
+import threading
+import asyncio
+import queue
+import os
+
+
+class SessionPool:
+    def __init__(self, size: int = 10, connect_timeout: float = 5, read_timeout: float = 30,
+                 impersonate: Optional[str] = None, max_proxies: int = 64) -> None:
+        """
+        按代理区分的curl_cffi会话池，复用连接（keep-alive），避免每次请求都重新握手
+        :param size: 每个代理最多创建的会话数量
+        :param connect_timeout: 连接超时（秒）
+        :param read_timeout: 读取超时（秒）
+        :param impersonate: curl_cffi浏览器指纹，例：chrome，为空则不模拟（HTTPS默认通过ALPN协商HTTP/2）
+        :param max_proxies: 最多保留多少个代理的会话，超出时关闭最久未使用（且没有借出会话）的代理的会话
+        """
+        self.size: int = size
+        self.timeout: tuple = (connect_timeout, read_timeout)
+        self.impersonate: Optional[str] = impersonate
+        self.max_proxies: int = max_proxies
+        self._idle: OrderedDict = OrderedDict()  # proxy -> 空闲会话队列，按最近使用排序
+        self._slots: dict = {}  # proxy -> 可创建会话数量
+        self._borrowed: dict = {}  # proxy -> 借出（含等待归还）的数量，借出和归还都在锁内计数
+        self._sessions: list = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def _create(self, proxy: Optional[str]) -> Session:
+        """
+        创建会话
+        :param proxy: 代理
+        :return:
+        """
+        session: Session = Session(proxy=proxy, timeout=self.timeout, impersonate=self.impersonate,
+                                   discard_cookies=True)
+        with self._lock:
+            self._sessions.append(session)
+        logger.debug(f"【SessionPool】新建会话，代理：{mask_proxy(proxy)}")
+        return session
+
+    def _evict(self) -> list:
+        """
+        淘汰最久未使用的代理（只淘汰没有借出会话的代理，其队列和信号量不会再被使用，调用方持有锁）
+        :return: 需要关闭的会话
+        """
+        evicted: list = []
+        for proxy in list(self._idle):
+            if len(self._idle) <= self.max_proxies:
+                break
+            if self._borrowed.get(proxy):  # 还有会话在使用中或有线程在等待
+                continue
+            idle: queue.LifoQueue = self._idle.pop(proxy)
+            self._slots.pop(proxy, None)
+            while not idle.empty():
+                evicted.append(idle.get_nowait())
+        for session in evicted:
+            self._sessions.remove(session)
+        return evicted
+
+    @staticmethod
+    def _close_sessions(sessions: list) -> None:
+        """
+        关闭会话
+        :param sessions: 会话列表
+        :return:
+        """
+        for session in sessions:
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"【SessionPool】关闭会话失败：{e}")
+
+    @contextmanager
+    def session(self, proxy: Optional[str] = None) -> Iterator[Session]:
+        """
+        借出一个会话，用完自动归还；该代理的会话都在使用中时等待归还
+        :param proxy: 代理，示例：http://127.0.0.1:7897
+        :return:
+        """
+        with self._lock:
+            idle: queue.LifoQueue = self._idle.setdefault(proxy, queue.LifoQueue())
+            self._idle.move_to_end(proxy)
+            slots: threading.Semaphore = self._slots.setdefault(proxy, threading.Semaphore(self.size))
+            self._borrowed[proxy] = self._borrowed.get(proxy, 0) + 1
+            evicted: list = self._evict() if len(self._idle) > self.max_proxies else []
+        if evicted:
+            self._close_sessions(evicted)
+            logger.debug(f"【SessionPool】代理数量超过 {self.max_proxies}，已关闭 {len(evicted)} 个最久未使用的会话")
+        session: Optional[Session] = None
+        try:
+            try:
+                session = idle.get_nowait()
+            except queue.Empty:
+                session = self._create(proxy) if slots.acquire(blocking=False) else idle.get()
+            yield session
+        finally:
+            with self._lock:
+                self._borrowed[proxy] -= 1
+                if not self._borrowed[proxy]:
+                    del self._borrowed[proxy]
+                if session is not None and self._idle.get(proxy) is idle:  # 会话池已关闭（会话已被关闭）时不再归还
+                    idle.put(session)
+
+    def close(self) -> None:
+        """
+        关闭所有会话
+        :return:
+        """
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+            self._idle, self._slots = OrderedDict(), {}
+        self._close_sessions(sessions)
+        if sessions:
+            logger.info(f"【SessionPool】已关闭 {len(sessions)} 个会话")
+
+
+class AsyncSessionPool:
+    def __init__(self, size: int = 10, connect_timeout: float = 5, read_timeout: float = 30,
+                 impersonate: Optional[str] = None, max_proxies: int = 64) -> None:
+        """
+        按代理区分的curl_cffi异步会话池，AsyncSession本身支持并发，每个代理（每个事件循环）只创建一个
+        :param size: 每个代理的最大并发连接数
+        :param connect_timeout: 连接超时（秒）
+        :param read_timeout: 读取超时（秒）
+        :param impersonate: curl_cffi浏览器指纹，例：chrome，为空则不模拟
+        :param max_proxies: 每个事件循环最多保留多少个代理的会话，超出时关闭最久未使用的
+        """
+        self.size: int = size
+        self.timeout: tuple = (connect_timeout, read_timeout)
+        self.impersonate: Optional[str] = impersonate
+        self.max_proxies: int = max_proxies
+        self._sessions: OrderedDict = OrderedDict()  # (事件循环, proxy) -> AsyncSession，按最近使用排序
+        self._closing: dict = {}  # 延迟关闭的任务 -> 被淘汰的会话
+
+    def session(self, proxy: Optional[str] = None) -> AsyncSession:
+        """
+        获取当前事件循环中该代理的会话（需在协程中调用）
+        :param proxy: 代理，示例：http://127.0.0.1:7897
+        :return:
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        key: tuple = (loop, proxy)
+        session: Optional[AsyncSession] = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+            return session
+        session = AsyncSession(proxy=proxy, timeout=self.timeout, impersonate=self.impersonate,
+                               max_clients=self.size, discard_cookies=True)
+        self._sessions[key] = session
+        logger.debug(f"【AsyncSessionPool】新建会话，代理：{mask_proxy(proxy)}")
+        keys: list = [key for key in self._sessions if key[0] is loop]
+        for evicted in keys[:max(len(keys) - self.max_proxies, 0)]:
+            evicted_session: AsyncSession = self._sessions.pop(evicted)
+            task: asyncio.Task = loop.create_task(self._close_later(evicted_session))
+            self._closing[task] = evicted_session
+            task.add_done_callback(lambda done: self._closing.pop(done, None))
+        return session
+
+    async def _close_later(self, session: AsyncSession) -> None:
+        """
+        关闭被淘汰的会话：淘汰前发出的请求可能还在进行，等到这些请求超时后再关闭
+        :param session: 会话
+        :return:
+        """
+        await asyncio.sleep(sum(self.timeout))
+        try:
+            await session.close()
+        except Exception as e:
+            logger.warning(f"【AsyncSessionPool】关闭会话失败：{e}")
+
+    async def close(self) -> None:
+        """
+        关闭当前事件循环中的所有会话
+        :return:
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        closing: dict = {task: session for task, session in self._closing.items() if task.get_loop() is loop}
+        for task in closing:  # 被淘汰的会话不再等待，立即关闭
+            task.cancel()
+        await asyncio.gather(*closing, return_exceptions=True)
+        keys: list = [key for key in self._sessions if key[0] is loop]
+        sessions: list = [self._sessions.pop(key) for key in keys] + list(closing.values())
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception as e:
+                logger.warning(f"【AsyncSessionPool】关闭会话失败：{e}")
+        if sessions:
+            logger.info(f"【AsyncSessionPool】已关闭 {len(sessions)} 个会话")
+
+
+# 全局会话池，所有XhsLogic共享
+session_options: dict = dict(
+    size=int(os.getenv("XHS_POOL_SIZE", "10")),
+    connect_timeout=float(os.getenv("XHS_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("XHS_READ_TIMEOUT", "30")),
+    impersonate=os.getenv("XHS_IMPERSONATE") or None,
+    max_proxies=int(os.getenv("XHS_POOL_PROXIES", "64"))
+)
+session_pool: SessionPool = SessionPool(**session_options)
+async_session_pool: AsyncSessionPool = AsyncSessionPool(**session_options)
@@ -0,0 +1,241 @@
+"""
+x-s / x-s-common 签名的纯Python实现（与 static/xhs_xs_xsc_56.js 逐字节一致）
+"""
+from typing import Any, Callable, Optional
+import hashlib
+import base64
+import json
+import time
+import zlib
+import os
+
+STANDARD_BASE64_ALPHABET: bytes = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+CUSTOM_BASE64_ALPHABET: bytes = b"ZmserbBoHQtNP+wOcza/LpngG8yJq42KWYj0DSfdikx3VT16IlUAFM97hECvuRX5"
+X3_BASE64_ALPHABET: bytes = b"MfgqrsbcyzPQRStuvC7mn501HIJBo2DEFTKdeNOwxWXYZap89+/A4UVLhijkl63G"
+CUSTOM_BASE64_TABLE: bytes = bytes.maketrans(STANDARD_BASE64_ALPHABET, CUSTOM_BASE64_ALPHABET)
+X3_BASE64_TABLE: bytes = bytes.maketrans(STANDARD_BASE64_ALPHABET, X3_BASE64_ALPHABET)
+HEX_KEY_BYTES: bytes = bytes.fromhex(
+    "71a302257793271ddd273bcee3e4b98d9d7935e1da33f5765e2ea8afb6dc77a51a499d23b67c20660025860cbf13d4540d92497f58686c"
+    "574e508f46e1956344f39139bf4faf22a3eef120b79258145b2feb5193b6478669961298e79bedca646e1a693a926154a5a7a1bd1cf0de"
+    "db742f917a747a1e388b234f2277"
+)
+VERSION_BYTES: bytes = bytes([119, 104, 96, 41])
+ENV_FINGERPRINT_XOR_KEY: int = 41
+SEQUENCE_VALUE_MIN, SEQUENCE_VALUE_MAX = 15, 50
+WINDOW_PROPS_LENGTH_MIN, WINDOW_PROPS_LENGTH_MAX = 900, 1200
+ENV_FINGERPRINT_TIME_OFFSET_MIN, ENV_FINGERPRINT_TIME_OFFSET_MAX = 10, 50
+CHECKSUM_VERSION: int = 1
+CHECKSUM_XOR_KEY: int = 115
+CHECKSUM_FIXED_TAIL: bytes = bytes([249, 65, 103, 103, 201, 181, 131, 99, 94, 7, 68, 250, 132, 21])
+X3_PREFIX: str = "mns0301_"
+XYS_PREFIX: str = "XYS_"
+XS_COMMON_FINGERPRINT: str = (
+    "I38rHdgsjopgIvesdVwgIC+oIELmBZ5e3VwXLgFTIxS3bqwErFeexd0ekncAzMFYnqthIhJeSnMDKutRI3KsYorWHPtGrbV0P9WfIi/eWc6eYqt"
+    "yQApPI37ekmR6QL+5Ii6sdneeSfqYHqwl2qt5B0DBIx++GDi/sVtkIxdsxuwr4qtiIhuaIE3e3LV0I3VTIC7e0utl2ADmsLveDSKsSPw5IEvsiV"
+    "tJOqw8BuwfPpdeTFWOIx4TIiu6ZPwbPut5IvlaLbgs3qtxIxes1VwHIkumIkIyejgsY/WTge7eSqte/D7sDcpipedeYrDtIC6eDVw2IENsSqtln"
+    "lSuNjVtIvoekqt3cZ7sVo4gIESyIhE4NnquIxhnqz8gIkIfoqwkICZW8g3sdlOeVPw3IvAe0fged0YyIi5s3Mc52utAIiKsidvekZNeTPt4nAOe"
+    "WPwEIvSzaAdeSVwXpnesDqwmI3TrIxE5Luwwaqw+rekhZANe1MNe0Pw9ICNsVLoeSbIFIkosSr7sVnFiIkgsVVtMIiudqqw+tqtWI30e3PwIIho"
+    "e3ut1IiOsjut3wutnsPwXICclI3Ir27lk2I5e1utCIES/IEJs0PtnpYIAO0JeYfD1IErPOPtKoqw3I3OexqtWQL5eiz0sVSEyIEJekd/skPtsnP"
+    "wqICJeSPwiIh5eVAuLIv5eYo/e0PtSICKsVqwV4omqI3RIIkge0e0sYZ0si/7eiuwSIvTeIhqmGuwCIkrPIx0edUzbzbveTPw5IxI0yVwImZeed"
+    "M0eWVwmeqt2IiM9IhhQLqwJPqtbIxZ="
+)
+XS_TEMPLATE: dict = {"x0": "4.2.6", "x1": "xhs-pc-web", "x2": "Windows"}
+
+
+def _dumps(data: Any) -> str:
+    """
+    与JS中JSON.stringify一致的紧凑序列化
+    :param data: 数据
+    :return:
+    """
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _js_str(value: Any) -> str:
+    """
+    与JS中String(value)一致的字符串转换（仅覆盖请求参数中会出现的类型）
+    :param value: 参数值
+    :return:
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def build_content_string(method: str, uri: str, payload: Any = None) -> str:
+    """
+    拼接参与签名的内容
+    :param method: 请求方式
+    :param uri: 请求路由（GET请求可已拼接好查询参数）
+    :param payload: POST请求JSON或GET请求参数
+    :return:
+    """
+    payload = payload or {}
+    if method == "POST":
+        return uri + _dumps(payload)
+    if not payload:
+        return uri
+    parts: list = []
+    for key, value in payload.items():
+        if isinstance(value, list):
+            value_str: str = ",".join(_js_str(v) for v in value)
+        else:
+            value_str: str = _js_str(value)
+        parts.append(f"{key}={value_str.replace('=', '%3D')}")
+    return uri + "?" + "&".join(parts)
+
+
+def _rand32(random_bytes: Callable[[int], bytes]) -> int:
+    """
+    生成32位无符号随机数
+    :param random_bytes: 随机字节生成函数
+    :return:
+    """
+    return int.from_bytes(random_bytes(4), "little")
+
+
+def _rand_range(random_bytes: Callable[[int], bytes], minimum: int, maximum: int) -> int:
+    """
+    生成[minimum, maximum]区间的随机数
+    :param random_bytes: 随机字节生成函数
+    :param minimum: 最小值
+    :param maximum: 最大值
+    :return:
+    """
+    return minimum + _rand32(random_bytes) % (maximum - minimum + 1)
+
+
+def _env_fingerprint_a(timestamp: int) -> bytes:
+    """
+    环境指纹A：小端时间戳，首字节为校验位，整体异或
+    :param timestamp: 毫秒时间戳
+    :return:
+    """
+    data: bytearray = bytearray(timestamp.to_bytes(8, "little"))
+    data[0] = ((sum(data[1:5]) & 0xFF) + sum(data[5:8])) & 0xFF
+    return bytes(b ^ ENV_FINGERPRINT_XOR_KEY for b in data)
+
+
+def _padded(value: str, length: int) -> bytes:
+    """
+    UTF-8编码后截断或补零到固定长度
+    :param value: 字符串
+    :param length: 长度
+    :return:
+    """
+    return value.encode("utf-8")[:length].ljust(length, b"\x00")
+
+
+def build_payload(md5_hex: str, a1: str, app_id: str, content: str, timestamp: int,
+                  random_bytes: Callable[[int], bytes]) -> bytes:
+    """
+    构造x3载荷
+    :param md5_hex: 签名内容的MD5
+    :param a1: cookie中的a1
+    :param app_id: 应用ID
+    :param content: 签名内容
+    :param timestamp: 毫秒时间戳
+    :param random_bytes: 随机字节生成函数
+    :return:
+    """
+    seed_bytes: bytes = _rand32(random_bytes).to_bytes(4, "little")
+    seed_byte0: int = seed_bytes[0]
+    time_offset: int = _rand_range(random_bytes, ENV_FINGERPRINT_TIME_OFFSET_MIN, ENV_FINGERPRINT_TIME_OFFSET_MAX)
+    sequence_value: int = _rand_range(random_bytes, SEQUENCE_VALUE_MIN, SEQUENCE_VALUE_MAX)
+    window_props_length: int = _rand_range(random_bytes, WINDOW_PROPS_LENGTH_MIN, WINDOW_PROPS_LENGTH_MAX)
+    return b"".join((
+        VERSION_BYTES,
+        seed_bytes,
+        _env_fingerprint_a(timestamp),
+        (timestamp - time_offset).to_bytes(8, "little"),
+        sequence_value.to_bytes(4, "little"),
+        window_props_length.to_bytes(4, "little"),
+        len(content.encode("utf-8")).to_bytes(4, "little"),
+        bytes(b ^ seed_byte0 for b in bytes.fromhex(md5_hex)[:8]),
+        b"\x34", _padded(a1, 52),
+        b"\x0a", _padded(app_id, 10),
+        bytes([1, CHECKSUM_VERSION, seed_byte0 ^ CHECKSUM_XOR_KEY]),
+        CHECKSUM_FIXED_TAIL
+    ))
+
+
+def sign_xs(method: str, uri: str, a1: str, app_id: str = "xhs-pc-web", payload: Any = None,
+            timestamp: int = None, random_bytes: Callable[[int], bytes] = os.urandom) -> str:
+    """
+    生成x-s（对应JS中的signXs）
+    :param method: 请求方式
+    :param uri: 请求路由
+    :param a1: cookie中的a1
+    :param app_id: 应用ID
+    :param payload: POST请求JSON或GET请求参数
+    :param timestamp: 毫秒时间戳，为空则取当前时间
+    :param random_bytes: 随机字节生成函数，测试时可固定
+    :return:
+    """
+    method = method.upper()
+    content: str = build_content_string(method, uri, payload)
+    md5_hex: str = hashlib.md5(content.encode("utf-8")).hexdigest()
+    timestamp = int(time.time() * 1000) if timestamp is None else timestamp
+    payload_bytes: bytes = build_payload(md5_hex, a1.strip(), app_id.strip(), content, timestamp, random_bytes)
+    xor_bytes: bytes = bytes(b ^ k for b, k in zip(payload_bytes[:124], HEX_KEY_BYTES))
+    x3: str = X3_PREFIX + base64.b64encode(xor_bytes).translate(X3_BASE64_TABLE).decode()
+    json_compact: str = _dumps({**XS_TEMPLATE, "x3": x3, "x4": ""})
+    return XYS_PREFIX + base64.b64encode(json_compact.encode("utf-8")).translate(CUSTOM_BASE64_TABLE).decode()
+
+
+def _crc32_signed(value: str) -> int:
+    """
+    与JS中gens9一致的CRC32变体（返回有符号32位整数）
+    :param value: ASCII字符串
+    :return:
+    """
+    result: int = zlib.crc32(value.encode("latin-1")) ^ 0xEDB88320
+    return result - 0x100000000 if result & 0x80000000 else result
+
+
+def xs_common(a1: str, xs: str, xt: int) -> str:
+    """
+    生成x-s-common（对应JS中的XsCommon）
+    :param a1: cookie中的a1
+    :param xs: x-s
+    :param xt: x-t
+    :return:
+    """
+    data: dict = {
+        "s0": 5,
+        "s1": "",
+        "x0": "1",
+        "x1": "4.2.6",
+        "x2": "Windows",
+        "x3": "xhs-pc-web",
+        "x4": "4.84.1",
+        "x5": a1,
+        "x6": xt,
+        "x7": xs,
+        "x8": XS_COMMON_FINGERPRINT,
+        "x9": _crc32_signed(str(xt) + xs + XS_COMMON_FINGERPRINT),
+        "x10": 0,
+        "x11": "normal"
+    }
+    return base64.b64encode(_dumps(data).encode("utf-8")).translate(CUSTOM_BASE64_TABLE).decode()
+
+
+def get_request_headers_params(api: str, data: Any, a1: str, method: str = "POST", timestamp: Optional[int] = None,
+                               random_bytes: Callable[[int], bytes] = os.urandom) -> dict:
+    """
+    生成签名请求头参数（对应JS中的get_request_headers_params）
+    :param api: 请求路由（GET请求已拼接查询参数）
+    :param data: POST请求JSON
+    :param a1: cookie中的a1
+    :param method: 请求方式
+    :param timestamp: 毫秒时间戳，为空则取当前时间
+    :param random_bytes: 随机字节生成函数，测试时可固定
+    :return: {"xs": ..., "xt": ..., "xs_common": ...}
+    """
+    xt: int = int(time.time() * 1000) if timestamp is None else timestamp
+    xs: str = sign_xs(method, api, a1, "xhs-pc-web", data, timestamp=xt, random_bytes=random_bytes)
+    return {"xs": xs, "xt": xt, "xs_common": xs_common(a1, xs, xt)}
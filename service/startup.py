@@ -0,0 +1,111 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Callable, Optional
+from loguru import logger
+import threading
+import time
+import os
+
+
+class Startup:
+    def __init__(self, retry_interval: float = 5) -> None:
+        """
+        启动过程跟踪：导入耗时、后台预热耗时、从导入到第一个请求完成的耗时（time-to-first-request）
+        :param retry_interval: 预热失败后重试间隔（秒）
+        """
+        self.retry_interval: float = retry_interval
+        self.created: float = time.perf_counter()
+        self.ready: threading.Event = threading.Event()
+        self._stopped: threading.Event = threading.Event()
+        self._served: bool = False
+        self.stats: dict = {"import_seconds": 0.0, "warmup_seconds": 0.0, "first_request_seconds": 0.0,
+                            "warmup_failures": 0}
+
+    def imported(self) -> None:
+        """
+        记录导入完成（service/__init__.py末尾调用）
+        :return:
+        """
+        self.stats["import_seconds"] = time.perf_counter() - self.created
+        logger.info(f"【Startup】导入完成（pid={os.getpid()}），耗时 {self.stats['import_seconds']:.2f}s")
+
+    def start_warm_up(self, warm_up: Callable[[], None]) -> None:
+        """
+        后台预热（不阻塞启动），完成后标记为就绪；失败时按间隔重试
+        :param warm_up: 预热函数
+        :return:
+        """
+        def warm_up_loop() -> None:
+            start: float = time.perf_counter()
+            while not self._stopped.is_set():
+                try:
+                    warm_up()
+                except Exception as e:
+                    self.stats["warmup_failures"] += 1
+                    logger.error(f"【Startup】预热失败，{self.retry_interval:.0f}s后重试：{e}")
+                    self._stopped.wait(self.retry_interval)
+                    continue
+                self.stats["warmup_seconds"] = time.perf_counter() - start
+                self.ready.set()
+                logger.info(f"【Startup】预热完成，耗时 {self.stats['warmup_seconds']:.2f}s，"
+                            f"距导入 {time.perf_counter() - self.created:.2f}s")
+                return None
+
+        self._stopped.clear()
+        threading.Thread(target=warm_up_loop, daemon=True).start()
+
+    @property
+    def served(self) -> bool:
+        """
+        是否已完成过请求
+        :return:
+        """
+        return self._served
+
+    def request_served(self) -> None:
+        """
+        记录第一个请求完成的时间
+        :return:
+        """
+        if self._served:
+            return None
+        self._served = True
+        self.stats["first_request_seconds"] = time.perf_counter() - self.created
+        logger.info(f"【Startup】首个请求完成（pid={os.getpid()}），距导入 {self.stats['first_request_seconds']:.2f}s"
+                    f"（导入 {self.stats['import_seconds']:.2f}s，预热{'已完成' if self.ready.is_set() else '未完成'}）")
+
+    def status(self) -> dict:
+        """
+        启动状态
+        :return:
+        """
+        return dict(self.stats, ready=self.ready.is_set(), uptime=time.perf_counter() - self.created, pid=os.getpid())
+
+    def close(self) -> None:
+        """
+        停止预热重试
+        :return:
+        """
+        self._stopped.set()
+
+
+class FirstRequestMiddleware:
+    def __init__(self, app: ASGIApp, startup: Optional[Startup] = None) -> None:
+        """
+        记录第一个HTTP请求完成的时间（之后只多一次布尔判断）
+        :param app: ASGI应用
+        :param startup: 启动过程跟踪，为空则使用全局实例
+        """
+        self.app: ASGIApp = app
+        self.startup: Startup = startup or startup_tracker
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.startup.served:
+            return await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.startup.request_served()
+
+
+# 全局启动跟踪（service/__init__.py最先导入，创建时间即开始导入的时间）
+startup_tracker: Startup = Startup()
@@ -0,0 +1,76 @@
+from service.database import SQLiteStore
+from typing import Optional
+import sqlite3
+import time
+
+
+def note_timestamp(note_id: str) -> int:
+    """
+    笔记ID前8位是十六进制的发布时间戳（秒）
+    :param note_id: 笔记ID，例：64565216000000002702b26b
+    :return: 时间戳，ID格式不对返回0
+    """
+    try:
+        return int(note_id[:8], 16)
+    except (TypeError, ValueError):
+        return 0
+
+
+def note_order(note_id: str) -> tuple:
+    """
+    笔记先后顺序的排序键（发布时间，ID）
+    :param note_id: 笔记ID
+    :return:
+    """
+    return note_timestamp(note_id), note_id or ""
+
+
+class SyncState(SQLiteStore):
+    schema: tuple = ("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            user_id TEXT PRIMARY KEY,
+            note_id TEXT NOT NULL,
+            note_time INTEGER NOT NULL,
+            synced_at REAL NOT NULL
+        )
+    """,)
+
+    def __init__(self, path: str = "sync.db") -> None:
+        """
+        增量同步的高水位：每个用户已同步到的最新笔记ID和发布时间
+        :param path: SQLite文件路径
+        """
+        super().__init__(path)
+
+    def get(self, user_id: str) -> Optional[dict]:
+        """
+        获取用户的高水位
+        :param user_id: 用户ID
+        :return: {"user_id", "note_id", "note_time", "synced_at"}，未同步过返回None
+        """
+        row: Optional[sqlite3.Row] = self._connect().execute(
+            "SELECT * FROM sync_state WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def set(self, user_id: str, note_id: str) -> None:
+        """
+        更新用户的高水位（只会前进，不会回退）
+        :param user_id: 用户ID
+        :param note_id: 最新笔记ID
+        :return:
+        """
+        current: Optional[dict] = self.get(user_id)
+        if current is not None and note_order(current["note_id"]) >= note_order(note_id):
+            note_id = current["note_id"]
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sync_state (user_id, note_id, note_time, synced_at) VALUES (?, ?, ?, ?)",
+            (user_id, note_id, note_timestamp(note_id), time.time())
+        )
+
+    def list(self) -> list:
+        """
+        所有用户的高水位
+        :return:
+        """
+        return [dict(row) for row in self._connect().execute("SELECT * FROM sync_state ORDER BY user_id").fetchall()]
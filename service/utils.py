@@ -1,12 +1,16 @@
 from service.encryption import generate_headers, splice_str
-from DrissionPage import Chromium, ChromiumOptions
-from typing import Optional
+from service import encryption
+from service.metrics import metrics
+from typing import Optional, Union
 from loguru import logger
-from pathlib import Path
-import platform
+import threading
+import tempfile
+import asyncio
+import orjson
 import json
-import os
+import time
 import re
+import os
 
 
 def format_json_dict(data: dict) -> str:
@@ -46,39 +50,100 @@ def read_cookie(path: str = "cookies.json") -> Optional[dict]:
     return json.loads(json_str)
 
 
+def write_cookie(cookies: dict, path: str = "cookies.json") -> None:
+    """
+    原子写入Cookie（先写临时文件再替换），读取方不会读到写了一半的文件
+    :param cookies: cookie字典
+    :param path: Cookie文件路径
+    :return:
+    """
+    directory: str = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".cookies-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(format_json_dict(cookies))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class CookieStore:
+    def __init__(self, path: str = "cookies.json", check_interval: float = 1) -> None:
+        """
+        内存中的Cookie，文件修改时间或大小变化时才重新读取
+        :param path: Cookie文件路径
+        :param check_interval: 检查文件变化的最小间隔（秒）
+        """
+        self.path: str = path
+        self.check_interval: float = check_interval
+        self._cookies: Optional[dict] = None
+        self._signature: Optional[tuple] = None
+        self._checked_at: float = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self) -> Optional[dict]:
+        """
+        获取Cookie
+        :return: cookie字典，文件不存在或为空返回None
+        """
+        now: float = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._cookies
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat: os.stat_result = os.stat(self.path)
+                signature: Optional[tuple] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                signature = None
+            if signature != self._signature:
+                self._cookies = read_cookie(self.path) if signature else None
+                self._signature = signature
+                logger.debug(f"【CookieStore】已重新读取：{os.path.abspath(self.path)}")
+        return self._cookies
+
+    def save(self, cookies: dict) -> None:
+        """
+        原子写入Cookie并更新内存
+        :param cookies: cookie字典
+        :return:
+        """
+        with self._lock:
+            write_cookie(cookies, self.path)
+            stat: os.stat_result = os.stat(self.path)
+            self._cookies = cookies
+            self._signature = (stat.st_mtime_ns, stat.st_size)
+            self._checked_at = time.monotonic()
+
+
+_cookie_stores: dict = {}
+_cookie_stores_lock: threading.Lock = threading.Lock()
+
+
+def get_cookie_store(path: str = "cookies.json") -> CookieStore:
+    """
+    获取Cookie文件对应的CookieStore（同一文件共用一个）
+    :param path: Cookie文件路径
+    :return:
+    """
+    key: str = os.path.abspath(path)
+    with _cookie_stores_lock:
+        if key not in _cookie_stores:
+            _cookie_stores[key] = CookieStore(path)
+        return _cookie_stores[key]
+
+
 def refresh_cookie(proxy: str = None, cookies_path: str = "cookies.json", browser_path: str = None) -> dict:
     """
-    使用无头浏览器获取新的Cookie（会替换cookies.json中的cookie）
+    使用常驻无头浏览器获取新的Cookie（会替换cookies.json中的cookie），并发调用只会刷新一次
     :param proxy: 代理，示例：http://127.0.0.1:7897
     :param cookies_path: cookies.json文件路径
     :param browser_path: 浏览器执行路径，为空则自动查找
     :return: cookie字典
     """
-    options: ChromiumOptions = ChromiumOptions()
-    options.set_browser_path(browser_path)
-    options.headless(True)
-    if proxy:
-        logger.warning("【DrissionPage】注意已使用代理：{proxy}")
-        options.set_proxy(proxy)
-    logger.info("【DrissionPage】启动无头浏览器...")
-    try:
-        browse = Chromium(options)
-    except Exception:  # 找不到chrome，尝试使用brave-browser
-        logger.warning("【DrissionPage】未找到Chrome浏览器，尝试使用Brave浏览器...")
-        if platform.system() == "Linux":
-            options.set_browser_path("brave-browser")
-        elif platform.system() == "Windows":
-            options.set_browser_path(f"{str(Path.home())}/AppData/Local/BraveSoftware/Brave-Browser/Application/brave.exe")
-        browse = Chromium(options)
-    tab = browse.latest_tab
-    logger.info("【DrissionPage】访问小红书主页，获取Cookie...")
-    tab.get("https://www.xiaohongshu.com")
-    cookies: dict = parse_cookie(tab.cookies())
-    logger.info(f"【DrissionPage】Cookie获取成功：{cookies}")
-    with open(cookies_path, "w", encoding="utf-8") as f:
-        f.write(format_json_dict(cookies))
-        logger.info(f"【DrissionPage】Cookie已写入文件：{os.path.abspath(cookies_path)}")
-    return cookies
+    from service.browser import cookie_minter
+    return cookie_minter.mint(proxy=proxy, cookies_path=cookies_path, browser_path=browser_path)
 
 
 def sign(uri: str, cookies: dict, data: dict = None, params: dict = None, method: str = "POST") -> dict:
@@ -91,24 +156,89 @@ def sign(uri: str, cookies: dict, data: dict = None, params: dict = None, method
     :param method: 请求方式
     :return:
     """
-    if method == "GET":
-        headers, _ = generate_headers(a1=cookies.get("a1"), api=splice_str(api=uri, params=params), method=method)
-    elif method == "POST":
-        headers, _ = generate_headers(a1=cookies.get("a1"), api=uri, data=data, method=method)
-    else:
-        raise Exception("请求方式错误")
+    with metrics.timer("xhs_stage_seconds", stage="sign"):
+        if method == "GET":
+            headers, _ = generate_headers(a1=cookies.get("a1"), api=splice_str(api=uri, params=params), method=method)
+        elif method == "POST":
+            headers, _ = generate_headers(a1=cookies.get("a1"), api=uri, data=data, method=method)
+        else:
+            raise Exception("请求方式错误")
     return headers
 
 
-def parse_note_html(html: str) -> Optional[dict]:
+async def async_sign(uri: str, cookies: dict, data: dict = None, params: dict = None, method: str = "POST") -> dict:
     """
-    解析HTML帖子详情
-    :param html: 帖子HTML源码
+    参数签名（异步）：纯Python签名耗时为微秒级，直接在事件循环中执行，其余引擎放到线程中执行
+    :param uri: 请求路由
+    :param data: 请求JSON（POST请求）
+    :param params: 请求参数（GET请求）
+    :param cookies: cookies字典
+    :param method: 请求方式
+    :return:
+    """
+    if encryption.SIGN_ENGINE == "native":
+        return sign(uri=uri, cookies=cookies, data=data, params=params, method=method)
+    return await asyncio.to_thread(sign, uri=uri, cookies=cookies, data=data, params=params, method=method)
+
+
+# 手机端笔记页面中的数据位置
+NOTE_STATE_MARKER: str = "window.__SETUP_SERVER_STATE__"
+NOTE_DATA_KEY: str = '"LAUNCHER_SSR_STORE_PAGE_DATA"'
+# 页面数据是JS字面量，可能含有JSON不支持的undefined（字符串整体匹配后原样保留，不替换字符串内容中的undefined）
+JS_UNDEFINED: re.Pattern = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|\bundefined\b')
+JS_UNDEFINED_BYTES: re.Pattern = re.compile(JS_UNDEFINED.pattern.encode())
+json_decoder: json.JSONDecoder = json.JSONDecoder()
+
+
+def sanitize_js_literal(text: Union[str, bytes]) -> Union[str, bytes]:
+    """
+    将JS字面量中的undefined替换为null
+    :param text: JS对象字面量（str或bytes）
+    :return:
+    """
+    is_bytes: bool = isinstance(text, (bytes, bytearray))
+    if (b"undefined" if is_bytes else "undefined") not in text:
+        return text
+    if is_bytes:
+        return JS_UNDEFINED_BYTES.sub(lambda match: match.group(1) or b"null", text)
+    return JS_UNDEFINED.sub(lambda match: match.group(1) or "null", text)
+
+
+def parse_note_html(html: Union[str, bytes]) -> Optional[dict]:
+    """
+    解析HTML帖子详情：定位页面数据所在的<script>，只解析LAUNCHER_SSR_STORE_PAGE_DATA部分
+    :param html: 帖子HTML源码（也可直接传响应的bytes，无需解码整个页面）
     :return:
     """
-    match = re.search(r"window\.__SETUP_SERVER_STATE__\s*=\s*(.*?)</script>", html, re.DOTALL | re.IGNORECASE)
-    if match:
-        return json.loads(match.group(1)).get("LAUNCHER_SSR_STORE_PAGE_DATA", {})
-    else:
+    is_bytes: bool = isinstance(html, (bytes, bytearray))
+    marker, key, script_end = (NOTE_STATE_MARKER, NOTE_DATA_KEY, "</script>")
+    if is_bytes:
+        marker, key, script_end = marker.encode(), key.encode(), script_end.encode()
+    start: int = html.find(marker)
+    if start < 0:
         logger.warning("HTML中未找到帖子信息！")
         return None
+    end: int = html.find(script_end, start)
+    state: Union[str, bytes] = html[start + len(marker):end if end >= 0 else len(html)]
+    key_start: int = state.find(key)
+    if key_start < 0:
+        state = sanitize_js_literal(state.decode("utf-8") if is_bytes else state)
+        return json_decoder.raw_decode(state, state.index("{"))[0].get("LAUNCHER_SSR_STORE_PAGE_DATA", {})
+    value: Union[str, bytes] = state[state.index(b":" if is_bytes else ":", key_start + len(key)) + 1:]
+    value = value.strip().rstrip(b";" if is_bytes else ";").rstrip()
+    try:  # 其他键中的undefined不影响只解析所需部分，笔记数据本身含有undefined时才需要替换
+        return decode_note_data(value)
+    except ValueError:
+        return decode_note_data(sanitize_js_literal(value))
+
+
+def decode_note_data(value: Union[str, bytes]) -> dict:
+    """
+    解析LAUNCHER_SSR_STORE_PAGE_DATA的值
+    :param value: 从该键的值开始到页面数据结束的部分
+    :return:
+    """
+    try:  # 通常是最后一个键：去掉外层的右括号即为所需部分
+        return orjson.loads(value[:-1])
+    except orjson.JSONDecodeError:  # 后面还有其他键，只解析到所需部分结束
+        return json_decoder.raw_decode(value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else value)[0]
@@ -0,0 +1,105 @@
+from service.node_pool import NodePool
+from collections import deque
+from loguru import logger
+import threading
+import time
+import os
+
+# xray脚本会require约4MB的webpack分包，只在常驻进程中加载一次
+xray_pool: NodePool = NodePool(
+    script_path=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "xhs_xray.js"),
+    size=1,
+    timeout=30
+)
+
+
+class TraceIdBuffer:
+    def __init__(self, pool: NodePool, batch_size: int = 1000, low_watermark: int = 200, max_age: float = 60) -> None:
+        """
+        x-xray-traceid缓冲区：批量生成、低水位后台补充
+        :param pool: 加载了xhs_xray.js的Node进程池
+        :param batch_size: 每次批量生成数量
+        :param low_watermark: 剩余数量低于该值时后台补充
+        :param max_age: traceid包含生成时间，超过该秒数的批次丢弃
+        """
+        self.pool: NodePool = pool
+        self.batch_size: int = batch_size
+        self.low_watermark: int = low_watermark
+        self.max_age: float = max_age
+        self._buffer: deque = deque()  # (生成时间, traceid)
+        self._lock: threading.Lock = threading.Lock()
+        self._refill_lock: threading.Lock = threading.Lock()
+        self._refilling: bool = False
+        self._stats: dict = {"hits": 0, "misses": 0, "refills": 0, "generated": 0, "expired": 0}
+
+    def get(self) -> str:
+        """
+        取一个traceid，缓冲区为空时同步补充
+        :return:
+        """
+        while True:
+            with self._lock:
+                trace_id: str = self._pop()
+                if trace_id:
+                    self._stats["hits"] += 1
+                    if len(self._buffer) < self.low_watermark and not self._refilling:
+                        self._refilling = True
+                        threading.Thread(target=self._background_refill, daemon=True).start()
+                    return trace_id
+                self._stats["misses"] += 1
+            self.refill()
+
+    def _pop(self) -> str:
+        """
+        弹出一个未过期的traceid（调用方需持有锁）
+        :return: traceid，缓冲区为空返回空字符串
+        """
+        deadline: float = time.monotonic() - self.max_age
+        while self._buffer:
+            created, trace_id = self._buffer.popleft()
+            if created >= deadline:
+                return trace_id
+            self._stats["expired"] += 1
+        return ""
+
+    def refill(self) -> None:
+        """
+        批量生成traceid放入缓冲区（同一时间只有一个补充在执行）
+        :return:
+        """
+        with self._refill_lock:
+            with self._lock:
+                if len(self._buffer) >= self.low_watermark:  # 等锁期间已被其他线程补充
+                    return None
+            start: float = time.perf_counter()
+            trace_ids: list = self.pool.call("traceId", count=self.batch_size)
+            created: float = time.monotonic()
+            with self._lock:
+                self._buffer.extend((created, trace_id) for trace_id in trace_ids)
+                self._stats["refills"] += 1
+                self._stats["generated"] += len(trace_ids)
+            logger.debug(f"【XRay】已补充 {len(trace_ids)} 个traceid，耗时 {time.perf_counter() - start:.3f}s")
+
+    def _background_refill(self) -> None:
+        """
+        后台补充
+        :return:
+        """
+        try:
+            self.refill()
+        except Exception as e:
+            logger.error(f"【XRay】后台补充traceid失败：{e}")
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def stats(self) -> dict:
+        """
+        缓冲区统计信息
+        :return: 命中、未命中、补充次数等
+        """
+        with self._lock:
+            return dict(self._stats, buffered=len(self._buffer))
+
+
+trace_id_buffer: TraceIdBuffer = TraceIdBuffer(xray_pool)
@@ -0,0 +1,56 @@
+// 常驻Node进程：启动时加载一次签名脚本，之后按行读取stdin中的JSON请求并调用脚本中的函数
+// 用法：node node_worker.js <脚本路径>
+// 请求：{"id": 1, "fn": "get_request_headers_params", "args": [...]}
+// 批量：{"id": 1, "fn": "traceId", "args": [], "count": 1000}，result为count次调用结果组成的数组
+// 响应：{"id": 1, "result": ...} 或 {"id": 1, "error": "..."}
+
+const path = require("path");
+const readline = require("readline");
+
+// stdout专用于通信协议，脚本中的console.log统一转到stderr
+const write = process.stdout.write.bind(process.stdout);
+console.log = console.info = console.debug = (...args) => console.error(...args);
+
+const scriptPath = path.resolve(process.argv[2]);
+const script = require(scriptPath);
+
+function lookup(fn) {
+  if (script && typeof script[fn] === "function") return script[fn];
+  if (typeof global[fn] === "function") return global[fn];
+  throw new Error(`function not found: ${fn}`);
+}
+
+function reply(message) {
+  write(JSON.stringify(message) + "\n");
+}
+
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+rl.on("line", (line) => {
+  if (!line.trim()) return;
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch (e) {
+    reply({ id: null, error: `bad request: ${e.message}` });
+    return;
+  }
+  try {
+    if (request.fn === "__ping__") {
+      reply({ id: request.id, result: "pong" });
+      return;
+    }
+    const fn = lookup(request.fn);
+    const args = request.args || [];
+    let result;
+    if (request.count) {
+      result = [];
+      for (let i = 0; i < request.count; i++) result.push(fn(...args));
+    } else {
+      result = fn(...args);
+    }
+    reply({ id: request.id, result: result === undefined ? null : result });
+  } catch (e) {
+    reply({ id: request.id, error: String((e && e.stack) || e) });
+  }
+});
+rl.on("close", () => process.exit(0));